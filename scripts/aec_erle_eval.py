@@ -0,0 +1,182 @@
+"""回声消除ERLE离线评估.
+
+对录制的回声对（麦克风录音 + 同步的扬声器参考信号）逐10ms帧运行回声消除，
+统计回声返回损耗增强（ERLE）和每帧处理耗时。ERLE只在参考信号有声音的帧上
+统计，并跳过开头的收敛时间。
+
+对比的处理器：
+    numpy-aec     NumPy实现，只做回声消除
+    numpy-aec+ns  NumPy实现，回声消除+噪声抑制（WebRTCProcessor默认配置）
+    webrtc        WebRTC APM库（当前平台可加载时）
+
+输入为16kHz单声道16位WAV：
+    --mic/--ref 指定一对文件，或 --dir 指定目录，目录中按 NAME_mic.wav / NAME_ref.wav 配对；
+    都不指定时使用合成的回声对（带延迟和混响的房间冲激响应）。
+
+用法:
+    python scripts/aec_erle_eval.py [--dir pairs/] [--mic a.wav --ref b.wav] [--skip 2]
+"""
+
+import argparse
+import os
+import sys
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.audio_processing.numpy_apm import NumpyAudioProcessor  # noqa: E402
+from src.audio_processing.webrtc_processing import (  # noqa: E402
+    WebRTCProcessor,
+    apm_lib,
+)
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 160
+
+
+def load_wav(path):
+    with wave.open(str(path), "rb") as wav:
+        if wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: 采样率必须为16kHz")
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: 必须为16位单声道")
+        return np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+
+def synthetic_pair(seconds=12, seed=0):
+    """
+    合成回声对：开关调制的有色噪声经过延迟20ms、尾长约100ms的房间冲激响应.
+    """
+    rng = np.random.default_rng(seed)
+    total = seconds * SAMPLE_RATE
+    ref = np.convolve(rng.normal(0, 1, total), [1, 0.8, 0.5], "same")
+    envelope = np.sin(2 * np.pi * 0.7 * np.arange(total) / SAMPLE_RATE) > -0.3
+    ref = ref * envelope * 3000
+
+    delay = SAMPLE_RATE * 20 // 1000
+    tail = np.arange(SAMPLE_RATE // 10)
+    impulse = np.zeros(delay + len(tail))
+    impulse[delay] = 0.6
+    impulse[delay:] += rng.normal(0, 0.1, len(tail)) * np.exp(-tail / 300)
+    mic = np.convolve(ref, impulse)[:total] + rng.normal(0, 30, total)
+
+    return (
+        np.clip(mic, -32768, 32767).astype(np.int16),
+        np.clip(ref, -32768, 32767).astype(np.int16),
+    )
+
+
+def load_pairs(args):
+    if args.mic and args.ref:
+        return [(Path(args.mic).stem, load_wav(args.mic), load_wav(args.ref))]
+    if args.dir:
+        pairs = []
+        for mic_path in sorted(Path(args.dir).glob("*_mic.wav")):
+            ref_path = mic_path.with_name(mic_path.name.replace("_mic.wav", "_ref.wav"))
+            if ref_path.exists():
+                name = mic_path.stem[: -len("_mic")]
+                pairs.append((name, load_wav(mic_path), load_wav(ref_path)))
+        return pairs
+    mic, ref = synthetic_pair()
+    return [("synthetic", mic, ref)]
+
+
+def make_processors():
+    processors = {
+        "numpy-aec": lambda: NumpyAudioProcessor(
+            SAMPLE_RATE, FRAME_SIZE, enable_ns=False
+        ),
+        "numpy-aec+ns": lambda: NumpyAudioProcessor(SAMPLE_RATE, FRAME_SIZE),
+    }
+    if apm_lib is not None:
+        processors["webrtc"] = lambda: WebRTCProcessor(
+            SAMPLE_RATE, 1, FRAME_SIZE, backend="webrtc"
+        )
+    return processors
+
+
+def run(processor, mic, ref):
+    """
+    逐帧处理，返回输出和每帧耗时（微秒）.
+    """
+    frames = min(len(mic), len(ref)) // FRAME_SIZE
+    output = np.zeros(frames * FRAME_SIZE, dtype=np.int16)
+    timings = np.zeros(frames)
+    for index in range(frames):
+        section = slice(index * FRAME_SIZE, (index + 1) * FRAME_SIZE)
+        started = time.perf_counter()
+        if isinstance(processor, WebRTCProcessor):
+            result = np.frombuffer(
+                processor.process_capture_stream(
+                    mic[section].tobytes(), ref[section].tobytes()
+                ),
+                dtype=np.int16,
+            )
+        else:
+            result = processor.process(mic[section], ref[section])
+        timings[index] = (time.perf_counter() - started) * 1e6
+        output[section] = result
+    return output, timings
+
+
+def erle_db(mic, output, ref, skip_seconds, delay=0):
+    """
+    在参考信号有声音的帧上计算ERLE（dB）.
+    """
+    frames = len(output) // FRAME_SIZE
+    start = int(skip_seconds * SAMPLE_RATE) // FRAME_SIZE
+    mic_energy = 0.0
+    out_energy = 0.0
+    ref_threshold = 1e4 * FRAME_SIZE
+    for index in range(start, frames):
+        section = slice(index * FRAME_SIZE, (index + 1) * FRAME_SIZE)
+        r = ref[section].astype(np.float64)
+        if np.dot(r, r) < ref_threshold:
+            continue
+        d = mic[section].astype(np.float64)
+        # 噪声抑制带来一帧延迟，输出按延迟对齐
+        out_section = slice(section.start + delay, section.stop + delay)
+        e = output[out_section].astype(np.float64)
+        if len(e) < FRAME_SIZE:
+            break
+        mic_energy += np.dot(d, d)
+        out_energy += np.dot(e, e)
+    if out_energy == 0:
+        return float("inf")
+    return 10 * np.log10(mic_energy / out_energy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回声消除ERLE离线评估")
+    parser.add_argument("--dir", help="回声对目录（NAME_mic.wav / NAME_ref.wav）")
+    parser.add_argument("--mic", help="麦克风录音WAV")
+    parser.add_argument("--ref", help="扬声器参考WAV")
+    parser.add_argument("--skip", type=float, default=2.0, help="跳过的收敛时间（秒）")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args)
+    if not pairs:
+        print("没有找到回声对")
+        return
+
+    print(f"{'回声对':<16}{'处理器':<14}{'ERLE(dB)':>10}{'平均(us)':>10}{'p99(us)':>10}")
+    for name, mic, ref in pairs:
+        for label, factory in make_processors().items():
+            processor = factory()
+            output, timings = run(processor, mic, ref)
+            delay = FRAME_SIZE if label == "numpy-aec+ns" else 0
+            erle = erle_db(mic, output, ref, args.skip, delay)
+            print(
+                f"{name:<16}{label:<14}{erle:>10.1f}"
+                f"{timings.mean():>10.1f}{np.percentile(timings, 99):>10.1f}"
+            )
+            if isinstance(processor, WebRTCProcessor):
+                processor.close()
+
+
+if __name__ == "__main__":
+    main()
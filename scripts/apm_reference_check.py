@@ -0,0 +1,82 @@
+"""回声消除参考信号覆盖检查.
+
+PlaybackReference按10ms插值，EchoAligner分别按10ms和流水线帧长构造，
+把20ms和60ms的录音帧送入ApmStage，检查每个10ms子帧都拿到了完整长度的
+参考信号。任一子帧缺少参考信号时以非零状态退出。
+
+用法:
+    python scripts/apm_reference_check.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.audio_codecs.audio_pipeline import ApmStage  # noqa: E402
+from src.audio_processing.echo_reference import (  # noqa: E402
+    EchoAligner,
+    PlaybackReference,
+)
+from src.audio_processing.webrtc_processing import WebRTCProcessor  # noqa: E402
+
+OUTPUT_RATE = 24000
+INPUT_RATE = 16000
+SUBFRAME = INPUT_RATE // 100
+
+
+class RecordingProcessor(WebRTCProcessor):
+    """
+    记录每个子帧收到的参考信号长度（字节）.
+    """
+
+    def __init__(self):
+        super().__init__(INPUT_RATE, 1, SUBFRAME, backend="numpy")
+        self.reference_lengths = []
+
+    def process_capture_stream(self, input_data, reference_data=None):
+        self.reference_lengths.append(len(reference_data or b""))
+        return super().process_capture_stream(input_data, reference_data)
+
+
+def check(frame_ms, aligner_size):
+    frame_size = INPUT_RATE * frame_ms // 1000
+    reference = PlaybackReference(OUTPUT_RATE, INPUT_RATE, SUBFRAME)
+    aligner = EchoAligner(reference, aligner_size, INPUT_RATE)
+    processor = RecordingProcessor()
+    frame_time = 10.0
+    stage = ApmStage(processor, aligner=aligner, clock=lambda: frame_time)
+
+    # 覆盖录音帧前后的播放数据
+    rng = np.random.default_rng(0)
+    play = (rng.normal(0, 3000, OUTPUT_RATE)).astype(np.int16)
+    reference.write(play, frame_time - 0.5)
+
+    frame = (rng.normal(0, 1000, frame_size)).astype(np.int16)
+    stage.process(frame)
+    processor.close()
+
+    lengths = [length // 2 for length in processor.reference_lengths]
+    ok = len(lengths) == frame_size // SUBFRAME and all(
+        length == SUBFRAME for length in lengths
+    )
+    print(
+        f"{frame_ms}ms帧 对齐器帧长{aligner_size} 子帧参考长度: {lengths} "
+        f"{'OK' if ok else '失败'}"
+    )
+    return ok
+
+
+def main():
+    results = [
+        check(frame_ms, aligner_size)
+        for frame_ms in (20, 60)
+        for aligner_size in (SUBFRAME, INPUT_RATE * frame_ms // 1000)
+    ]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""录音帧拼装微基准.
+
+对比旧版deque逐采样点拼帧与FrameAssembler预分配切片两种方式，
+在44.1kHz和48kHz设备采样率下统计每帧CPU耗时(µs)。
+
+用法:
+    python scripts/audio_frame_benchmark.py [--seconds 30] [--frame-ms 60]
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.audio_codecs.audio_buffers import FrameAssembler  # noqa: E402
+
+TARGET_RATE = 16000
+
+
+def make_chunks(device_rate, frame_ms, seconds):
+    """
+    生成重采样器输出块，优先使用soxr，未安装时按比例模拟块长.
+    """
+    device_block = int(device_rate * frame_ms / 1000)
+    blocks = int(seconds * 1000 / frame_ms)
+    rng = np.random.default_rng(0)
+    source = rng.integers(-3000, 3000, device_block * blocks, dtype=np.int16)
+
+    try:
+        import soxr
+
+        resampler = soxr.ResampleStream(
+            device_rate, TARGET_RATE, 1, dtype="int16", quality="QQ"
+        )
+        chunks = [
+            resampler.resample_chunk(source[i : i + device_block], last=False)
+            for i in range(0, len(source), device_block)
+        ]
+        return chunks, "soxr"
+    except ImportError:
+        chunks = []
+        produced = 0
+        for i in range(blocks):
+            expected = int((i + 1) * device_block * TARGET_RATE / device_rate)
+            chunks.append(source[produced:expected].copy())
+            produced = expected
+        return chunks, "simulated"
+
+
+def run_deque(chunks, frame_size):
+    """
+    旧实现：deque.extend + popleft逐点取帧.
+    """
+    buffer = deque()
+    frames = 0
+    start = time.process_time()
+    for chunk in chunks:
+        buffer.extend(chunk.astype(np.int16))
+        if len(buffer) < frame_size:
+            continue
+        frame_data = []
+        for _ in range(frame_size):
+            frame_data.append(buffer.popleft())
+        np.array(frame_data, dtype=np.int16)
+        frames += 1
+    return time.process_time() - start, frames
+
+
+def run_assembler(chunks, frame_size):
+    """
+    新实现：预分配数组 + 视图切片，一次可取多帧.
+    """
+    assembler = FrameAssembler(frame_size)
+    frames = 0
+    start = time.process_time()
+    for chunk in chunks:
+        assembler.push(chunk)
+        while assembler.pop_frame() is not None:
+            frames += 1
+    return time.process_time() - start, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录音帧拼装微基准")
+    parser.add_argument("--seconds", type=float, default=30.0, help="模拟录音时长")
+    parser.add_argument("--frame-ms", type=int, default=60, help="帧长(毫秒)")
+    args = parser.parse_args()
+
+    frame_size = int(TARGET_RATE * args.frame_ms / 1000)
+    print(f"帧长: {args.frame_ms}ms ({frame_size} 采样点 @ {TARGET_RATE}Hz)")
+
+    for device_rate in (44100, 48000):
+        chunks, source = make_chunks(device_rate, args.frame_ms, args.seconds)
+        print(f"\n设备采样率 {device_rate}Hz (重采样数据来源: {source})")
+        for name, runner in (("deque", run_deque), ("assembler", run_assembler)):
+            elapsed, frames = runner(chunks, frame_size)
+            per_frame = elapsed * 1e6 / max(frames, 1)
+            print(f"  {name:<10} 帧数: {frames:>6}  CPU: {per_frame:8.2f} µs/帧")
+
+
+if __name__ == "__main__":
+    main()
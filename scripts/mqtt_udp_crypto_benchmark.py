@@ -0,0 +1,100 @@
+"""MQTT UDP音频包加解密微基准.
+
+对比旧版逐包十六进制转换+新建Cipher的实现与AesCtrPacketCipher，
+统计单核每秒可处理的加密/解密包数。
+
+用法:
+    python scripts/mqtt_udp_crypto_benchmark.py [--packets 20000] [--payload 120]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.protocols.udp_crypto import AesCtrPacketCipher  # noqa: E402
+
+AES_KEY = os.urandom(16).hex()
+AES_NONCE = os.urandom(16).hex()
+
+
+def legacy_encrypt(sequence, audio_data):
+    """
+    旧实现：逐包拼接十六进制nonce并新建Cipher.
+    """
+    new_nonce = (
+        AES_NONCE[:4]
+        + format(len(audio_data), "04x")
+        + AES_NONCE[8:24]
+        + format(sequence, "08x")
+    )
+    cipher = Cipher(
+        algorithms.AES(bytes.fromhex(AES_KEY)),
+        modes.CTR(bytes.fromhex(new_nonce)),
+        backend=default_backend(),
+    )
+    encryptor = cipher.encryptor()
+    encrypted = encryptor.update(bytes(audio_data)) + encryptor.finalize()
+    return bytes.fromhex(new_nonce) + encrypted
+
+
+def legacy_decrypt(packet):
+    """
+    旧实现：逐包解析密钥并新建Cipher.
+    """
+    cipher = Cipher(
+        algorithms.AES(bytes.fromhex(AES_KEY)),
+        modes.CTR(packet[:16]),
+        backend=default_backend(),
+    )
+    decryptor = cipher.decryptor()
+    return decryptor.update(packet[16:]) + decryptor.finalize()
+
+
+def measure(func, items):
+    start = time.process_time()
+    for item in items:
+        func(item)
+    elapsed = time.process_time() - start
+    return len(items) / elapsed if elapsed else float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT UDP音频包加解密微基准")
+    parser.add_argument("--packets", type=int, default=20000, help="每项测试的包数")
+    parser.add_argument("--payload", type=int, default=120, help="Opus包大小(字节)")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.payload)
+    sequences = list(range(1, args.packets + 1))
+    cipher = AesCtrPacketCipher(AES_KEY, AES_NONCE)
+
+    # 两种实现生成的数据包必须一致
+    assert legacy_encrypt(1, payload) == bytes(cipher.encrypt_packet(1, payload))
+
+    packets = [legacy_encrypt(seq, payload) for seq in sequences]
+    assert cipher.decrypt(packets[0][:16], packets[0][16:]) == payload
+
+    results = {
+        "legacy encrypt": measure(lambda seq: legacy_encrypt(seq, payload), sequences),
+        "cached encrypt": measure(
+            lambda seq: cipher.encrypt_packet(seq, payload), sequences
+        ),
+        "legacy decrypt": measure(legacy_decrypt, packets),
+        "cached decrypt": measure(
+            lambda packet: cipher.decrypt(packet[:16], packet[16:]), packets
+        ),
+    }
+
+    print(f"包数: {args.packets}  负载: {args.payload} 字节")
+    for name, rate in results.items():
+        print(f"  {name:<16} {rate:>12,.0f} 包/秒/核  {1e6 / rate:8.2f} µs/包")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""唤醒词语音门控评估.
+
+用录音测试集分别在关闭门控、能量门控和webrtcvad门控下离线运行
+WakeWordDetector的识别流程，对比召回率、误唤醒次数、被门控的帧比例
+和识别CPU耗时，确认门控不降低检出率。
+
+测试集目录结构（16kHz单声道16位WAV）:
+    DATASET/positive/*.wav   包含唤醒词的录音
+    DATASET/negative/*.wav   不含唤醒词的录音（可选，用于统计误唤醒）
+
+使用config.json中配置的唤醒词模型和门控参数。
+
+用法:
+    python scripts/wake_word_gate_eval.py DATASET [--silence-ms 1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.audio_processing.speech_gate import (  # noqa: E402
+    GATE_ENERGY,
+    GATE_OFF,
+    GATE_WEBRTCVAD,
+    SpeechGate,
+    webrtcvad,
+)
+from src.audio_processing.wake_word_detect import WakeWordDetector  # noqa: E402
+from src.constants.constants import AudioConfig  # noqa: E402
+
+
+def load_frames(wav_path, silence_ms):
+    """
+    读取WAV并在首尾补静音，切分为输入帧.
+    """
+    with wave.open(str(wav_path), "rb") as wav:
+        if wav.getframerate() != AudioConfig.INPUT_SAMPLE_RATE:
+            raise ValueError(f"{wav_path}: 采样率必须为16kHz")
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError(f"{wav_path}: 必须为16位单声道")
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+    padding = np.zeros(AudioConfig.INPUT_SAMPLE_RATE * silence_ms // 1000, np.int16)
+    pcm = np.concatenate([padding, pcm, padding])
+    frame_size = AudioConfig.INPUT_FRAME_SIZE
+    return [
+        pcm[i : i + frame_size]
+        for i in range(0, len(pcm) - frame_size + 1, frame_size)
+    ]
+
+
+def run_file(detector, frames):
+    """
+    按识别块把一条录音送入检测器，返回检测到的唤醒词列表.
+    """
+    detections = []
+    detector.reset_state()
+    detector._post_detection = lambda wake_word, text: detections.append(wake_word)
+    for start in range(0, len(frames), detector.chunk_frames):
+        detector.process_frames(frames[start : start + detector.chunk_frames])
+    return detections
+
+
+def evaluate(detector, gate, dataset):
+    detector._speech_gate = gate
+    hits = 0
+    false_accepts = 0
+    started = time.process_time()
+    for frames in dataset["positive"]:
+        hits += bool(run_file(detector, frames))
+    for frames in dataset["negative"]:
+        false_accepts += len(run_file(detector, frames))
+    cpu_s = time.process_time() - started
+    return hits, false_accepts, cpu_s, gate.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="唤醒词语音门控评估")
+    parser.add_argument("dataset", help="测试集目录")
+    parser.add_argument(
+        "--silence-ms", type=int, default=1000, help="每条录音首尾补的静音时长"
+    )
+    args = parser.parse_args()
+
+    detector = WakeWordDetector()
+    if not detector.enabled:
+        print("唤醒词检测未启用或模型加载失败，请检查config.json")
+        return
+
+    root = Path(args.dataset)
+    dataset = {
+        label: [
+            load_frames(path, args.silence_ms)
+            for path in sorted((root / label).glob("*.wav"))
+        ]
+        for label in ("positive", "negative")
+    }
+    if not dataset["positive"]:
+        print(f"{root / 'positive'} 中没有WAV文件")
+        return
+
+    template = detector._speech_gate
+    modes = [GATE_OFF, GATE_ENERGY]
+    if webrtcvad is not None:
+        modes.append(GATE_WEBRTCVAD)
+
+    total_frames = sum(len(f) for files in dataset.values() for f in files)
+    print(
+        f"正样本 {len(dataset['positive'])} 条，负样本 {len(dataset['negative'])} 条，"
+        f"共 {total_frames} 帧 × {AudioConfig.FRAME_DURATION}ms"
+    )
+    print(f"{'门控':<12}{'召回率':>10}{'误唤醒':>8}{'门控比例':>10}{'CPU(s)':>10}")
+    for mode in modes:
+        gate = SpeechGate(
+            detector.sample_rate,
+            AudioConfig.FRAME_DURATION,
+            mode=mode,
+            margin_db=template.margin_db,
+            min_db=template.min_db,
+            pre_roll_ms=template._pre_roll.maxlen * AudioConfig.FRAME_DURATION,
+            hangover_ms=template.hangover_frames * AudioConfig.FRAME_DURATION,
+        )
+        hits, false_accepts, cpu_s, stats = evaluate(detector, gate, dataset)
+        recall = hits / len(dataset["positive"])
+        print(
+            f"{mode:<12}{recall:>10.1%}{false_accepts:>8}"
+            f"{stats['gated_fraction']:>10.1%}{cpu_s:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
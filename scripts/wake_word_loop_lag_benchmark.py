@@ -0,0 +1,159 @@
+"""唤醒词检测事件循环延迟基准.
+
+按实时速率向检测器输入音频，同时用定时任务测量事件循环的调度延迟，
+对比三种情况：
+    disabled  不启用唤醒词检测
+    inline    在事件循环中直接调用Vosk识别（旧实现）
+    thread    WakeWordDetector识别线程（当前实现）
+
+使用config.json中配置的唤醒词模型。
+
+用法:
+    python scripts/wake_word_loop_lag_benchmark.py [--seconds 20] [--wav sample.wav]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.audio_codecs.audio_buffers import FrameQueue  # noqa: E402
+from src.audio_processing.wake_word_detect import WakeWordDetector  # noqa: E402
+from src.constants.constants import AudioConfig  # noqa: E402
+
+TICK_MS = 5
+
+
+def load_frames(wav_path, seconds):
+    """
+    读取16kHz单声道WAV，未指定时生成带噪声的合成语音.
+    """
+    frame_size = AudioConfig.INPUT_FRAME_SIZE
+    total = int(AudioConfig.INPUT_SAMPLE_RATE * seconds)
+
+    if wav_path:
+        with wave.open(wav_path, "rb") as wav:
+            if wav.getframerate() != AudioConfig.INPUT_SAMPLE_RATE:
+                raise ValueError("WAV采样率必须为16kHz")
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise ValueError("WAV必须为16位单声道")
+            pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        pcm = np.resize(pcm, total)
+    else:
+        rng = np.random.default_rng(0)
+        t = np.arange(total) / AudioConfig.INPUT_SAMPLE_RATE
+        voiced = (np.sin(2 * np.pi * 0.5 * t) > 0).astype(np.float32)
+        tone = np.sin(2 * np.pi * 220 * t) * 3000 * voiced
+        pcm = (tone + rng.normal(0, 300, total)).astype(np.int16)
+
+    return [
+        pcm[i : i + frame_size].copy()
+        for i in range(0, total - frame_size + 1, frame_size)
+    ]
+
+
+class FrameFeeder:
+    """
+    提供与AudioCodec相同的唤醒词帧队列接口.
+    """
+
+    def __init__(self):
+        self.wakeword_queue = FrameQueue(max_frames=100)
+
+
+async def feed_realtime(frames, sink):
+    frame_s = AudioConfig.FRAME_DURATION / 1000
+    start = time.perf_counter()
+    for index, frame in enumerate(frames):
+        await sink(frame)
+        delay = start + (index + 1) * frame_s - time.perf_counter()
+        await asyncio.sleep(max(0.0, delay))
+
+
+async def measure_lag(stop_event):
+    lags = []
+    interval = TICK_MS / 1000
+    expected = time.perf_counter() + interval
+    while not stop_event.is_set():
+        await asyncio.sleep(max(0.0, expected - time.perf_counter()))
+        now = time.perf_counter()
+        lags.append((now - expected) * 1000)
+        expected = max(expected + interval, now)
+    return lags
+
+
+async def run_mode(mode, detector, frames):
+    stop_event = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(stop_event))
+
+    if mode == "thread":
+        feeder = FrameFeeder()
+        await detector.start(feeder)
+
+        async def sink(frame):
+            feeder.wakeword_queue.put(frame)
+
+    elif mode == "inline":
+        counter = 0
+
+        async def sink(frame):
+            nonlocal counter
+            detector.recognizer.AcceptWaveform(frame.tobytes())
+            counter += 1
+            if counter % 3 == 0:
+                detector.recognizer.PartialResult()
+
+    else:
+
+        async def sink(frame):
+            pass
+
+    await feed_realtime(frames, sink)
+    stop_event.set()
+    lags = await lag_task
+
+    if mode == "thread":
+        await detector.stop()
+    detector.recognizer.Reset()
+    return np.array(lags)
+
+
+async def main_async(args):
+    detector = WakeWordDetector()
+    if not detector.enabled:
+        print("唤醒词检测未启用或模型加载失败，请检查config.json")
+        return
+    # 基准中不触发回调
+    detector.on_detected(lambda *_: None)
+
+    frames = load_frames(args.wav, args.seconds)
+    print(
+        f"音频: {len(frames)} 帧 × {AudioConfig.FRAME_DURATION}ms，"
+        f"采样间隔 {TICK_MS}ms"
+    )
+    print(f"{'模式':<10}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}{'>20ms':>8}")
+    for mode in ("disabled", "inline", "thread"):
+        lags = await run_mode(mode, detector, frames)
+        print(
+            f"{mode:<10}{np.percentile(lags, 50):>10.2f}"
+            f"{np.percentile(lags, 99):>10.2f}{lags.max():>10.2f}"
+            f"{int((lags > 20).sum()):>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="唤醒词检测事件循环延迟基准")
+    parser.add_argument("--seconds", type=float, default=20.0, help="每种模式的时长")
+    parser.add_argument("--wav", help="16kHz单声道16位WAV文件")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""唤醒词匹配器基准.
+
+在一组识别器输出文本上对比逐个唤醒词计算相似度的旧实现与预编译的
+WakeWordMatcher，分别使用5个和50个唤醒词，并校验两者的匹配结果一致。
+
+语料文件每行一条识别文本（Vosk的text或partial），未指定时使用内置的
+合成语料（常见口语短句、唤醒词及其错字变体）。
+
+用法:
+    python scripts/wake_word_matcher_benchmark.py [--corpus texts.txt] [--repeat 20]
+"""
+
+import argparse
+import difflib
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.audio_processing.wake_word_matcher import (  # noqa: E402
+    VARIANT_STYLES,
+    WakeWordMatcher,
+    build_pinyin_variants,
+)
+
+BASE_WAKE_WORDS = ["你好小明", "你好小智", "你好小天", "小爱同学", "贾维斯"]
+NAME_CHARS = "明智天乐美安宁华强伟芳娜静丽军磊洋勇艳杰涛斌超秀霞平刚桂英"
+PHRASES = [
+    "今天天气怎么样",
+    "帮我放一首歌",
+    "明天早上七点叫我起床",
+    "现在几点了",
+    "把灯关掉",
+    "小明你在干什么",
+    "你好",
+    "我想听新闻",
+    "打开空调",
+    "晚安",
+]
+
+
+def build_wake_words(count):
+    words = list(BASE_WAKE_WORDS)
+    index = 0
+    while len(words) < count:
+        first = NAME_CHARS[index % len(NAME_CHARS)]
+        second = NAME_CHARS[index // len(NAME_CHARS)]
+        words.append(f"你好小{first}{second}")
+        index += 1
+    return words[:count]
+
+
+def build_corpus(size):
+    rng = random.Random(0)
+    corpus = []
+    for _ in range(size):
+        text = rng.choice(PHRASES + BASE_WAKE_WORDS)
+        if rng.random() < 0.3:
+            # 模拟识别错字
+            chars = list(text)
+            chars[rng.randrange(len(chars))] = rng.choice(NAME_CHARS)
+            text = "".join(chars)
+        if rng.random() < 0.3:
+            text = rng.choice(PHRASES) + text
+        corpus.append(text)
+    return corpus
+
+
+class LegacyMatcher:
+    """
+    旧实现：逐个唤醒词、逐个拼音变体计算相似度.
+    """
+
+    def __init__(self, wake_words, similarity_threshold=0.85, max_edit_distance=1):
+        self.similarity_threshold = similarity_threshold
+        self.max_edit_distance = max_edit_distance
+        self.patterns = {word: build_pinyin_variants(word) for word in wake_words}
+
+    def _levenshtein_distance(self, s1, s2):
+        if len(s1) < len(s2):
+            return self._levenshtein_distance(s2, s1)
+        if len(s2) == 0:
+            return len(s1)
+        previous_row = list(range(len(s2) + 1))
+        for i, c1 in enumerate(s1):
+            current_row = [i + 1]
+            for j, c2 in enumerate(s2):
+                insertions = previous_row[j + 1] + 1
+                deletions = current_row[j] + 1
+                substitutions = previous_row[j] + (c1 != c2)
+                current_row.append(min(insertions, deletions, substitutions))
+            previous_row = current_row
+        return previous_row[-1]
+
+    def _is_subsequence(self, pattern, text):
+        i = 0
+        for char in text:
+            if i < len(pattern) and char == pattern[i]:
+                i += 1
+        return i == len(pattern)
+
+    def _calculate_similarity(self, text_variants, pattern):
+        max_similarity = 0.0
+        for variant_type in VARIANT_STYLES:
+            text_variant = text_variants.get(variant_type, "")
+            pattern_variant = pattern.get(variant_type, "")
+            if not text_variant or not pattern_variant:
+                continue
+            if pattern_variant in text_variant:
+                return 1.0
+            similarity = difflib.SequenceMatcher(
+                None, text_variant, pattern_variant
+            ).ratio()
+            if len(pattern_variant) <= 10:
+                edit_distance = self._levenshtein_distance(
+                    text_variant, pattern_variant
+                )
+                max_allowed_distance = min(
+                    self.max_edit_distance, len(pattern_variant) // 2
+                )
+                if edit_distance <= max_allowed_distance:
+                    edit_similarity = 1.0 - (edit_distance / len(pattern_variant))
+                    similarity = max(similarity, edit_similarity)
+            if variant_type == "initials" and len(pattern_variant) >= 2:
+                if self._is_subsequence(pattern_variant, text_variant):
+                    similarity = max(similarity, 0.80)
+            max_similarity = max(max_similarity, similarity)
+        return max_similarity
+
+    def match(self, text_variants):
+        best_match = None
+        best_similarity = 0.0
+        for wake_word, pattern in self.patterns.items():
+            similarity = self._calculate_similarity(text_variants, pattern)
+            if similarity > best_similarity and similarity >= self.similarity_threshold:
+                best_similarity = similarity
+                best_match = wake_word
+        return best_match, best_similarity
+
+
+def run(matcher_fn, variants, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text_variants in variants:
+            matcher_fn(text_variants)
+    return (time.perf_counter() - started) / (repeat * len(variants)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="唤醒词匹配器基准")
+    parser.add_argument("--corpus", help="识别文本语料，每行一条")
+    parser.add_argument("--repeat", type=int, default=20, help="语料重复次数")
+    parser.add_argument("--threshold", type=float, default=0.85, help="相似度阈值")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    else:
+        corpus = build_corpus(500)
+    variants = [
+        build_pinyin_variants(re.sub(r"[^\u4e00-\u9fff\w]", "", text))
+        for text in corpus
+    ]
+
+    print(f"语料 {len(corpus)} 条，重复 {args.repeat} 次，阈值 {args.threshold}")
+    print(f"{'唤醒词数':<10}{'旧实现(us)':>12}{'预编译(us)':>12}{'加速比':>8}{'不一致':>8}")
+    for count in (5, 50):
+        wake_words = build_wake_words(count)
+        legacy = LegacyMatcher(wake_words, args.threshold)
+        compiled = WakeWordMatcher(wake_words, args.threshold)
+
+        mismatches = 0
+        for text_variants in variants:
+            expected, expected_similarity = legacy.match(text_variants)
+            result = compiled.match(text_variants)
+            if expected != (result.wake_word if result else None) or (
+                result and abs(result.similarity - expected_similarity) > 1e-9
+            ):
+                mismatches += 1
+
+        legacy_us = run(legacy.match, variants, args.repeat)
+        compiled_us = run(compiled.match, variants, args.repeat)
+        print(
+            f"{count:<10}{legacy_us:>12.1f}{compiled_us:>12.1f}"
+            f"{legacy_us / compiled_us:>8.1f}{mismatches:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
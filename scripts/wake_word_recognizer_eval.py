@@ -0,0 +1,91 @@
+"""唤醒词识别模式评估.
+
+在同一测试集上分别用开放词表识别（open）和受限语法识别（grammar）离线运行
+WakeWordDetector，对比识别CPU耗时、实时率、召回率和误唤醒率。
+为单独比较识别器本身，评估时关闭语音门控。
+
+测试集目录结构与 wake_word_gate_eval.py 相同（16kHz单声道16位WAV）:
+    DATASET/positive/*.wav   包含唤醒词的录音
+    DATASET/negative/*.wav   不含唤醒词的录音（用于统计误唤醒）
+
+用法:
+    python scripts/wake_word_recognizer_eval.py DATASET [--silence-ms 1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.wake_word_gate_eval import load_frames, run_file  # noqa: E402
+from src.audio_processing.speech_gate import GATE_OFF, SpeechGate  # noqa: E402
+from src.audio_processing.wake_word_detect import WakeWordDetector  # noqa: E402
+from src.constants.constants import AudioConfig  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="唤醒词识别模式评估")
+    parser.add_argument("dataset", help="测试集目录")
+    parser.add_argument(
+        "--silence-ms", type=int, default=1000, help="每条录音首尾补的静音时长"
+    )
+    args = parser.parse_args()
+
+    detector = WakeWordDetector()
+    if not detector.enabled:
+        print("唤醒词检测未启用或模型加载失败，请检查config.json")
+        return
+    detector._speech_gate = SpeechGate(
+        detector.sample_rate, AudioConfig.FRAME_DURATION, mode=GATE_OFF
+    )
+
+    root = Path(args.dataset)
+    dataset = {
+        label: [
+            load_frames(path, args.silence_ms)
+            for path in sorted((root / label).glob("*.wav"))
+        ]
+        for label in ("positive", "negative")
+    }
+    if not dataset["positive"]:
+        print(f"{root / 'positive'} 中没有WAV文件")
+        return
+
+    frame_s = AudioConfig.FRAME_DURATION / 1000
+    audio_s = sum(len(f) for files in dataset.values() for f in files) * frame_s
+    negative_h = sum(len(f) for f in dataset["negative"]) * frame_s / 3600
+
+    print(
+        f"正样本 {len(dataset['positive'])} 条，负样本 {len(dataset['negative'])} 条，"
+        f"音频共 {audio_s:.0f}s"
+    )
+    print(
+        f"{'模式':<10}{'CPU(s)':>10}{'实时率':>10}{'召回率':>10}"
+        f"{'误唤醒':>8}{'误唤醒/小时':>12}"
+    )
+    for mode in ("open", "grammar"):
+        detector.set_recognizer_mode(mode)
+        if detector.recognizer_mode != mode:
+            print(f"{mode:<10}模型不支持该模式，跳过")
+            continue
+
+        started = time.process_time()
+        hits = sum(bool(run_file(detector, frames)) for frames in dataset["positive"])
+        false_accepts = sum(
+            len(run_file(detector, frames)) for frames in dataset["negative"]
+        )
+        cpu_s = time.process_time() - started
+
+        recall = hits / len(dataset["positive"])
+        fa_rate = f"{false_accepts / negative_h:.2f}" if negative_h else "-"
+        print(
+            f"{mode:<10}{cpu_s:>10.2f}{cpu_s / audio_s:>10.3f}{recall:>10.1%}"
+            f"{false_accepts:>8}{fa_rate:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
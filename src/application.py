@@ -3,9 +3,17 @@ import json
 import signal
 import sys
 import threading
-from typing import Set
+import time
+from collections import deque
+from typing import List, Set
 
 from src.constants.constants import AbortReason, DeviceState, ListeningMode
+from src.core.command_scheduler import (
+    LANE_CONTROL,
+    LANE_SPEECH,
+    LANE_TOOLS,
+    CommandScheduler,
+)
 # from src.display import gui_display
 from src.mcp.mcp_server import McpServer
 from src.protocols.mqtt_protocol import MqttProtocol
@@ -14,6 +22,7 @@ from src.utils.common_utils import handle_verification_code
 from src.utils.config_manager import ConfigManager
 from src.utils.resource_finder import resource_finder
 from src.utils.logging_config import get_logger
+from src.utils.metrics import MetricsExporter, MetricsRegistry
 from src.utils.opus_loader import setup_opus
 from src.mcp.tools.robot.service import RLWalkService
 
@@ -88,18 +97,31 @@ class Application:
         self.voice_detected = False
         self.keep_listening = False
         self.aborted = False
+        # 每次中止语音输出加一，用于识别等待播放期间发生的打断
+        self._abort_generation = 0
 
         # 异步组件
         self.audio_codec = None
         self.protocol = None
         self.display = None
         self.wake_word_detector = None
+        self.vad_detector = None
         # 任务管理
         self.running = False
         self._main_tasks: Set[asyncio.Task] = set()
+        # 短生命周期的后台任务（显示更新、消息处理等），保留引用防止被回收
+        self._background_tasks: Set[asyncio.Task] = set()
 
-        # 命令队列 - 延迟到事件循环运行时初始化
-        self.command_queue: asyncio.Queue = None
+        # 运行指标：事件循环延迟、任务计数、消息处理耗时、音频回调耗时
+        self.metrics = MetricsRegistry.get_instance()
+        self._metrics_exporter = None
+
+        # 命令调度器（按优先级通道执行） - 延迟到事件循环运行时初始化
+        self.command_scheduler: CommandScheduler = None
+
+        # 上行音频发送队列，由单个常驻发送协程消费（约3秒音频）
+        self._audio_send_queue: deque = deque(maxlen=50)
+        self._audio_send_event: asyncio.Event = None
 
         # 任务取消事件 - 延迟到事件循环运行时初始化
         self._shutdown_event = None
@@ -118,9 +140,20 @@ class Application:
             "iot": self._handle_iot_message,
             "mcp": self._handle_mcp_message,
         }
+        # 各类消息进入的命令通道，未列出的类型进入speech通道
+        self._message_lanes = {
+            "tts": LANE_SPEECH,
+            "stt": LANE_SPEECH,
+            "llm": LANE_SPEECH,
+            "iot": LANE_TOOLS,
+            "mcp": LANE_TOOLS,
+        }
 
         # 并发控制锁
         self._state_lock = asyncio.Lock()
+        # control通道命令与TTS开始/结束处理分属不同通道、可能同时执行，
+        # 二者改变设备状态的部分通过该锁互斥，保持原单队列的先后顺序
+        self._transition_lock = asyncio.Lock()
         self._abort_lock = asyncio.Lock()
 
         logger.debug("Application实例初始化完成")
@@ -217,8 +250,27 @@ class Application:
         初始化异步对象 - 必须在事件循环运行后调用.
         """
         logger.debug("初始化异步对象")
-        self.command_queue = asyncio.Queue()
+        queue_size = self.config.get_config("SYSTEM_OPTIONS.SCHEDULER.MAX_QUEUE", 100)
+        self.command_scheduler = CommandScheduler(
+            [
+                # 状态切换和对话消息必须按顺序完整执行，不限队列长度；
+                # 只有工具调用允许并发，积压时丢弃最旧的调用
+                (LANE_CONTROL, 1, None),
+                (LANE_SPEECH, 1, None),
+                (
+                    LANE_TOOLS,
+                    self.config.get_config(
+                        "SYSTEM_OPTIONS.SCHEDULER.TOOLS_CONCURRENCY", 4
+                    ),
+                    queue_size,
+                ),
+            ],
+            max_total=self.config.get_config(
+                "SYSTEM_OPTIONS.SCHEDULER.MAX_CONCURRENCY", 6
+            ),
+        )
         self._shutdown_event = asyncio.Event()
+        self._audio_send_event = asyncio.Event()
 
     async def _run_application_core(self, protocol: str, mode: str):
         """
@@ -292,9 +344,16 @@ class Application:
         # 初始化唤醒词检测
         await self._initialize_wake_word_detector()
 
+        # 初始化说话时的语音打断检测
+        await self._initialize_vad_detector()
+
         # 设置协议回调
         self._setup_protocol_callbacks()
 
+        # 启用预热时提前建立连接
+        if isinstance(self.protocol, WebsocketProtocol):
+            self.protocol.schedule_prewarm()
+
         # 启动日程提醒服务
         await self._start_calendar_reminder_service()
 
@@ -385,11 +444,11 @@ class Application:
             # 确保初始化失败时audio_codec为None
             self.audio_codec = None
 
-    def _on_encoded_audio(self, encoded_data: bytes):
+    def _on_encoded_audio(self, encoded_packets: List[bytes]):
         """
         处理编码后的音频数据回调.
         
-        注意：这个回调在音频驱动线程中被调用，需要线程安全地调度到主事件循环。
+        注意：这个回调在编码线程中被调用，每批数据只调度一次到主事件循环。
         """
         try:
             # 只在监听状态且音频通道打开时发送数据
@@ -401,27 +460,45 @@ class Application:
                 # 线程安全地调度到主事件循环
                 if self._main_loop and not self._main_loop.is_closed():
                     self._main_loop.call_soon_threadsafe(
-                        self._schedule_audio_send, encoded_data
+                        self._enqueue_audio_packets, encoded_packets
                     )
                 
         except Exception as e:
             logger.error(f"处理编码音频数据回调失败: {e}")
 
-    def _schedule_audio_send(self, encoded_data: bytes):
+    def _enqueue_audio_packets(self, encoded_packets: List[bytes]):
         """
-        在主事件循环中调度音频发送任务.
+        在主事件循环中将一批音频数据放入发送队列.
         """
-        try:
-            # 再次检查状态（可能在调度期间状态已改变）
-            if (self.device_state == DeviceState.LISTENING 
-                    and self.protocol 
-                    and self.protocol.is_audio_channel_opened()):
-                
-                # 创建异步任务发送音频数据
-                asyncio.create_task(self.protocol.send_audio(encoded_data))
-                
-        except Exception as e:
-            logger.error(f"调度音频发送失败: {e}")
+        if self._audio_send_event is None:
+            return
+
+        # 队列满时deque自动丢弃最旧的数据
+        self._audio_send_queue.extend(encoded_packets)
+        self._audio_send_event.set()
+
+    async def _audio_sender(self):
+        """
+        常驻音频发送协程，按顺序发送队列中的音频数据.
+        """
+        while self.running:
+            try:
+                await self._audio_send_event.wait()
+                self._audio_send_event.clear()
+
+                while self._audio_send_queue:
+                    encoded_data = self._audio_send_queue.popleft()
+
+                    # 再次检查状态（可能在排队期间状态已改变）
+                    if (self.device_state == DeviceState.LISTENING 
+                            and self.protocol 
+                            and self.protocol.is_audio_channel_opened()):
+                        await self.protocol.send_audio(encoded_data)
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"发送音频数据失败: {e}")
 
     def _set_protocol_type(self, protocol_type: str):
         """
@@ -453,7 +530,8 @@ class Application:
         """
         创建异步回调函数的辅助方法.
         """
-        return lambda: asyncio.create_task(coro_func(*args))
+        name = getattr(coro_func, "__name__", "callback")
+        return lambda: self._spawn(coro_func(*args), name)
 
     def _setup_gui_callbacks(self):
         """
@@ -492,6 +570,8 @@ class Application:
         """
         self.protocol.on_network_error(self._on_network_error)
         self.protocol.on_incoming_audio(self._on_incoming_audio)
+        self.protocol.on_incoming_audio_batch(self._on_incoming_audio_batch)
+        self.protocol.on_incoming_audio_lost(self._on_incoming_audio_lost)
         self.protocol.on_incoming_json(self._on_incoming_json)
         self.protocol.on_audio_channel_opened(self._on_audio_channel_opened)
         self.protocol.on_audio_channel_closed(self._on_audio_channel_closed)
@@ -502,8 +582,57 @@ class Application:
         """
         logger.debug("启动核心任务")
 
-        # 命令处理任务
-        self._create_task(self._command_processor(), "命令处理")
+        # 音频发送任务
+        self._create_task(self._audio_sender(), "音频发送")
+
+        # 运行指标
+        await self._start_metrics()
+
+    async def _start_metrics(self):
+        """
+        启动运行指标采集和导出.
+        """
+        if not self.config.get_config("SYSTEM_OPTIONS.METRICS.ENABLED", True):
+            return
+
+        if self.audio_codec:
+            self.metrics.register_histogram(
+                "audio.input_callback", self.audio_codec.input_callback_timing
+            )
+            self.metrics.register_histogram(
+                "audio.output_callback", self.audio_codec.output_callback_timing
+            )
+            self.metrics.register_source(
+                "audio.callbacks", self.audio_codec.get_callback_stats
+            )
+            self.metrics.register_source(
+                "audio.playback", self.audio_codec.get_playback_stats
+            )
+            self.metrics.register_source(
+                "audio.pipeline", self.audio_codec.get_pipeline_stats
+            )
+        if self.command_scheduler is not None:
+            self.metrics.register_source(
+                "commands", self.command_scheduler.get_stats
+            )
+        if self.mcp_server is not None:
+            self.metrics.register_source("mcp", self.mcp_server.get_stats)
+        if self.protocol and hasattr(self.protocol, "get_send_queue_stats"):
+            self.metrics.register_source(
+                "protocol.send_queue", self.protocol.get_send_queue_stats
+            )
+
+        self._metrics_exporter = MetricsExporter(
+            self.metrics,
+            log_interval_s=self.config.get_config(
+                "SYSTEM_OPTIONS.METRICS.LOG_INTERVAL_S", 60
+            ),
+            http_host=self.config.get_config(
+                "SYSTEM_OPTIONS.METRICS.HTTP_HOST", "127.0.0.1"
+            ),
+            http_port=self.config.get_config("SYSTEM_OPTIONS.METRICS.HTTP_PORT", 0),
+        )
+        await self._metrics_exporter.start()
 
     def _create_task(self, coro, name: str) -> asyncio.Task:
         """
@@ -511,6 +640,7 @@ class Application:
         """
         task = asyncio.create_task(coro, name=name)
         self._main_tasks.add(task)
+        self.metrics.tasks.track(task, name)
 
         def done_callback(t):
             # 任务完成后从集合中移除，防止内存泄漏
@@ -522,41 +652,23 @@ class Application:
         task.add_done_callback(done_callback)
         return task
 
-    async def _command_processor(self):
+    def _spawn(self, coro, name: str) -> asyncio.Task:
         """
-        命令处理器.
+        创建短生命周期的后台任务，按名称计数并记录异常.
         """
-        while self.running:
-            try:
-                # 检查队列是否已初始化
-                if self.command_queue is None:
-                    await asyncio.sleep(0.1)
-                    continue
-                    
-                # 等待命令，超时后继续循环检查running状态
-                try:
-                    command = await asyncio.wait_for(
-                        self.command_queue.get(), timeout=0.1
-                    )
-                    # 检查命令是否有效
-                    if command is None:
-                        logger.warning("收到空命令，跳过执行")
-                        continue
-                    if not callable(command):
-                        logger.warning(f"收到非可调用命令: {type(command)}, 跳过执行")
-                        continue
-
-                    # 执行命令
-                    result = command()
-                    if asyncio.iscoroutine(result):
-                        await result
-                except asyncio.TimeoutError:
-                    continue
+        task = asyncio.create_task(coro, name=name)
+        self._background_tasks.add(task)
+        self.metrics.tasks.track(task, name)
+        task.add_done_callback(self._on_background_task_done)
+        return task
 
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"命令处理错误: {e}", exc_info=True)
+    def _on_background_task_done(self, task: asyncio.Task):
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(
+                f"后台任务 {task.get_name()} 异常: {task.exception()}",
+                exc_info=task.exception(),
+            )
 
     async def _start_gui_display(self):
         """
@@ -574,27 +686,35 @@ class Application:
         """
         self._create_task(self.display.start(), "CLI显示")
 
-    async def schedule_command(self, command):
+    async def schedule_command(self, command, lane: str = LANE_CONTROL):
         """
-        调度命令到命令队列.
+        调度命令到命令通道.
+        """
+        self.submit_command(command, lane)
+
+    def submit_command(self, command, lane: str = LANE_CONTROL) -> bool:
+        """
+        提交命令到指定通道（同步，可在协议回调中直接调用）.
+        """
+        if self.command_scheduler is None:
+            logger.warning("命令调度器未初始化，丢弃命令")
+            return False
+        if lane == LANE_CONTROL:
+            command = self._with_transition_lock(command)
+        return self.command_scheduler.submit(command, lane)
+
+    def _with_transition_lock(self, command):
+        """
+        包装control通道命令，执行期间持有状态转换锁.
         """
-        # 检查队列是否已初始化
-        if self.command_queue is None:
-            logger.warning("命令队列未初始化，丢弃命令")
-            return
-            
-        try:
-            # 使用 put_nowait 避免阻塞，如果队列满则记录警告
-            self.command_queue.put_nowait(command)
-        except asyncio.QueueFull:
-            logger.warning("命令队列已满，丢弃命令")
-            # 可选：清理一些旧命令
-            try:
-                self.command_queue.get_nowait()
-                self.command_queue.put_nowait(command)
-                logger.info("清理旧命令后重新添加")
-            except asyncio.QueueEmpty:
-                pass
+
+        async def run():
+            async with self._transition_lock:
+                result = command()
+                if asyncio.iscoroutine(result):
+                    await result
+
+        return run
 
     async def _start_listening_common(self, listening_mode, keep_listening_flag):
         """
@@ -678,6 +798,7 @@ class Application:
 
         logger.info(f"中止语音输出，原因: {reason}")
         self.aborted = True
+        self._abort_generation += 1
         if self.audio_codec:
             await self.audio_codec.clear_audio_queue()
 
@@ -707,7 +828,7 @@ class Application:
         异步更新显示的辅助方法.
         """
         if self.display:
-            asyncio.create_task(update_func(*args))
+            self._spawn(update_func(*args), "display_update")
 
     async def _set_device_state_impl(self, state):
         """
@@ -782,7 +903,7 @@ class Application:
         if error_message:
             logger.error(error_message)
 
-        asyncio.create_task(self.schedule_command(self._handle_network_error))
+        self.submit_command(self._handle_network_error)
 
     async def _handle_network_error(self):
         """
@@ -799,32 +920,35 @@ class Application:
         接收音频数据回调.
         """
         if self.device_state == DeviceState.SPEAKING and self.audio_codec:
-            try:
-                # 音频数据处理需要实时性，直接创建任务但添加异常处理
-                task = asyncio.create_task(self.audio_codec.write_audio(data))
-                task.add_done_callback(
-                    lambda t: (
-                        logger.error(
-                            f"音频写入任务异常: {t.exception()}", exc_info=True
-                        )
-                        if not t.cancelled() and t.exception()
-                        else None
-                    )
-                )
-            except RuntimeError as e:
-                logger.error(f"无法创建音频写入任务: {e}")
-            except Exception as e:
-                logger.error(f"创建音频写入任务失败: {e}", exc_info=True)
+            # 写入和解码不需要等待，直接在协议回调中同步执行，保证帧的顺序
+            self.audio_codec.write_audio_nowait(data)
+
+    def _on_incoming_audio_batch(self, packets):
+        """
+        批量接收音频数据回调.
+        """
+        if self.device_state == DeviceState.SPEAKING and self.audio_codec:
+            self.audio_codec.write_audio_batch_nowait(packets)
+
+    def _on_incoming_audio_lost(self, count):
+        """
+        接收音频丢帧回调.
+        """
+        if self.device_state == DeviceState.SPEAKING and self.audio_codec:
+            self.audio_codec.conceal_lost_audio(count)
 
     def _on_incoming_json(self, json_data):
         """
         接收JSON数据回调.
         """
-        asyncio.create_task(
-            self.schedule_command(lambda: self._handle_incoming_json(json_data))
+        received_at = time.perf_counter()
+        msg_type = json_data.get("type", "") if isinstance(json_data, dict) else ""
+        self.submit_command(
+            lambda: self._handle_incoming_json(json_data, received_at),
+            self._message_lanes.get(msg_type, LANE_SPEECH),
         )
 
-    async def _handle_incoming_json(self, json_data):
+    async def _handle_incoming_json(self, json_data, received_at=None):
         """
         处理JSON消息.
         """
@@ -840,7 +964,18 @@ class Application:
 
             handler = self._message_handlers.get(msg_type)
             if handler:
-                await handler(data)
+                started = time.perf_counter()
+                if received_at is not None:
+                    # 收到消息到开始处理之间的排队时间
+                    self.metrics.histogram("json.dispatch_delay").observe(
+                        (started - received_at) * 1000
+                    )
+                try:
+                    await handler(data)
+                finally:
+                    self.metrics.histogram(f"handler.{msg_type}").observe(
+                        (time.perf_counter() - started) * 1000
+                    )
             else:
                 logger.warning(f"收到未知类型的消息: {msg_type}")
 
@@ -874,17 +1009,19 @@ class Application:
         """
         logger.info(f"TTS开始，当前状态: {self.device_state}")
 
-        async with self._abort_lock:
-            self.aborted = False
+        async with self._transition_lock:
+            async with self._abort_lock:
+                self.aborted = False
 
-        if self.device_state in [DeviceState.IDLE, DeviceState.LISTENING]:
-            await self._set_device_state(DeviceState.SPEAKING)
+            if self.device_state in [DeviceState.IDLE, DeviceState.LISTENING]:
+                await self._set_device_state(DeviceState.SPEAKING)
 
     async def _handle_tts_stop(self):
         """
         处理TTS停止事件.
         """
         if self.device_state == DeviceState.SPEAKING:
+            abort_generation = self._abort_generation
             # 等待音频播放完成（改进：增加等待时间并移除过早的清空操作）
             if self.audio_codec:
                 logger.debug("等待TTS音频播放完成...")
@@ -895,12 +1032,21 @@ class Application:
             if not self.aborted:
                 await asyncio.sleep(0.2)  # 额外200ms确保尾音播放完整
 
-            # 状态转换
-            if self.keep_listening:
-                await self.protocol.send_start_listening(ListeningMode.AUTO_STOP)
-                await self._set_device_state(DeviceState.LISTENING)
-            else:
-                await self._set_device_state(DeviceState.IDLE)
+            # 等待播放期间不持有状态转换锁，用户打断等control命令可以执行；
+            # 取得锁后重新检查状态，已被打断或切换的不再转换
+            async with self._transition_lock:
+                if (
+                    self.device_state != DeviceState.SPEAKING
+                    or self._abort_generation != abort_generation
+                ):
+                    logger.debug("TTS播放期间状态已改变，跳过状态转换")
+                    return
+
+                if self.keep_listening:
+                    await self.protocol.send_start_listening(ListeningMode.AUTO_STOP)
+                    await self._set_device_state(DeviceState.LISTENING)
+                else:
+                    await self._set_device_state(DeviceState.IDLE)
 
     async def _handle_stt_message(self, data):
         """
@@ -941,6 +1087,8 @@ class Application:
         音频通道关闭回调.
         """
         logger.info("音频通道已关闭")
+        # 会话结束，执行中的工具调用已无法回复
+        self.mcp_server.cancel_all("会话已关闭")
         await self._set_device_state(DeviceState.IDLE)
         self.keep_listening = False
 
@@ -968,6 +1116,28 @@ class Application:
             logger.error(f"初始化唤醒词检测器失败: {e}")
             self.wake_word_detector = None
 
+    async def _initialize_vad_detector(self):
+        """
+        初始化语音打断检测器，复用音频编解码器已采集的录音帧.
+        """
+        if not self.config.get_config("AUDIO_OPTIONS.BARGE_IN", False):
+            return
+        if not self.audio_codec:
+            logger.warning("音频设备不可用，跳过语音打断检测")
+            return
+
+        try:
+            from src.audio_processing.vad_detector import VADDetector
+
+            self.vad_detector = VADDetector(
+                self.audio_codec, self.protocol, self, asyncio.get_running_loop()
+            )
+            await self.vad_detector.start()
+            logger.info("语音打断检测器初始化成功")
+        except Exception as e:
+            logger.error(f"初始化语音打断检测器失败: {e}")
+            self.vad_detector = None
+
     async def _on_wake_word_detected(self, wake_word, full_text):
         """
         唤醒词检测回调.
@@ -975,6 +1145,7 @@ class Application:
         logger.info(f"检测到唤醒词: {wake_word}")
 
         if self.device_state == DeviceState.IDLE:
+            self.protocol.mark_wake_time()
             await self._set_device_state(DeviceState.CONNECTING)
             await self._connect_and_start_listening(wake_word)
         elif self.device_state == DeviceState.SPEAKING:
@@ -1108,6 +1279,11 @@ class Application:
             self._shutdown_event.set()
 
         try:
+            # 停止运行指标导出
+            if self._metrics_exporter is not None:
+                await self._metrics_exporter.stop()
+                self._metrics_exporter = None
+
             # 停止RLWalk服务（如果在运行）
             try:
                 msg = RLWalkService.get_instance().stop()
@@ -1119,6 +1295,9 @@ class Application:
             await self._safe_close_resource(
                 self.wake_word_detector, "唤醒词检测器", "stop"
             )
+            await self._safe_close_resource(
+                self.vad_detector, "语音打断检测器", "stop"
+            )
 
             # 3. 取消所有长期任务
             if self._main_tasks:
@@ -1140,6 +1319,8 @@ class Application:
 
             # 4. 关闭协议连接
             if self.protocol:
+                if isinstance(self.protocol, WebsocketProtocol):
+                    self.protocol.enable_prewarm(False)
                 try:
                     await self.protocol.close_audio_channel()
                     logger.info("协议连接已关闭")
@@ -1152,19 +1333,13 @@ class Application:
             # 6. 关闭MCP服务器
             await self._safe_close_resource(self.mcp_server, "MCP服务器")
 
-            # 7. 清理队列
-            try:
-                for q in [
-                    self.command_queue,
-                ]:
-                    while not q.empty():
-                        try:
-                            q.get_nowait()
-                        except asyncio.QueueEmpty:
-                            break
-                logger.info("队列已清空")
-            except Exception as e:
-                logger.error(f"清空队列失败: {e}")
+            # 7. 停止命令调度，丢弃排队的命令
+            if self.command_scheduler is not None:
+                try:
+                    await self.command_scheduler.close()
+                    logger.info("命令调度器已停止")
+                except Exception as e:
+                    logger.error(f"停止命令调度器失败: {e}")
 
             # 8. 最后停止UI显示
             await self._safe_close_resource(self.display, "显示界面")
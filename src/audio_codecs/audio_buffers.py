@@ -0,0 +1,372 @@
+"""音频缓冲区工具.
+
+提供实时音频路径上使用的预分配缓冲结构，避免在声卡回调中
+产生Python对象分配和跨线程的asyncio队列操作。
+"""
+
+import threading
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """单生产者/单消费者的int16环形缓冲区.
+
+    写指针只由生产者线程更新，读指针只由消费者线程更新，
+    在CPython下无需加锁即可跨线程使用。读写均按采样点进行，
+    不完整的帧会自然地跨越多次回调读取。
+    """
+
+    def __init__(self, capacity: int):
+        """初始化环形缓冲区.
+
+        Args:
+            capacity: 缓冲区容量（采样点数）
+        """
+        if capacity <= 0:
+            raise ValueError(f"缓冲区容量必须大于0: {capacity}")
+
+        self._capacity = int(capacity)
+        self._buffer = np.zeros(self._capacity, dtype=np.int16)
+
+        # 单调递增的读写位置，取模后得到实际下标
+        self._write_pos = 0
+        self._read_pos = 0
+        # 由生产者发起的清空请求，消费者读取时生效
+        self._flush_pos = 0
+
+        # 统计信息
+        self.overflow_samples = 0
+        self.underrun_count = 0
+
+    @classmethod
+    def from_duration(cls, sample_rate: int, duration_ms: int, channels: int = 1):
+        """
+        按时长创建缓冲区.
+        """
+        return cls(int(sample_rate * duration_ms / 1000) * channels)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def _effective_read_pos(self) -> int:
+        return max(self._read_pos, self._flush_pos)
+
+    @property
+    def write_position(self) -> int:
+        """
+        累计写入的采样点数（单调递增）.
+        """
+        return self._write_pos
+
+    @property
+    def read_position(self) -> int:
+        """
+        累计读取（含清空跳过）的采样点数（单调递增）.
+        """
+        return self._effective_read_pos()
+
+    def available(self) -> int:
+        """
+        可读取的采样点数.
+        """
+        return self._write_pos - self._effective_read_pos()
+
+    def free_space(self) -> int:
+        """
+        可写入的采样点数.
+        """
+        return self._capacity - self.available()
+
+    def write(self, samples: np.ndarray) -> int:
+        """写入采样点（生产者调用）.
+
+        Args:
+            samples: int16音频数据
+
+        Returns:
+            int: 实际写入的采样点数，空间不足时多余部分被丢弃
+        """
+        samples = np.asarray(samples, dtype=np.int16).reshape(-1)
+        write_pos = self._write_pos
+        free = self._capacity - (write_pos - self._effective_read_pos())
+        count = min(len(samples), free)
+
+        if count < len(samples):
+            self.overflow_samples += len(samples) - count
+
+        if count > 0:
+            start = write_pos % self._capacity
+            first = min(count, self._capacity - start)
+            self._buffer[start : start + first] = samples[:first]
+            if count > first:
+                self._buffer[: count - first] = samples[first:count]
+
+        # 数据拷贝完成后再发布写指针
+        self._write_pos = write_pos + count
+        return count
+
+    def read_into(self, out: np.ndarray) -> int:
+        """读取采样点到目标数组（消费者调用）.
+
+        数据不足时剩余部分填充静音，不会分配新数组。
+
+        Args:
+            out: 一维int16目标数组
+
+        Returns:
+            int: 实际读取的采样点数
+        """
+        read_pos = self._effective_read_pos()
+        wanted = len(out)
+        count = min(wanted, self._write_pos - read_pos)
+
+        if count > 0:
+            start = read_pos % self._capacity
+            first = min(count, self._capacity - start)
+            out[:first] = self._buffer[start : start + first]
+            if count > first:
+                out[first:count] = self._buffer[: count - first]
+            if count < wanted:
+                self.underrun_count += 1
+
+        if count < wanted:
+            out[count:] = 0
+
+        self._read_pos = read_pos + count
+        return count
+
+    def clear(self) -> int:
+        """清空缓冲区.
+
+        只记录清空位置，由消费者在下一次读取时跳过，
+        避免多个线程同时修改读指针。
+
+        Returns:
+            int: 被丢弃的采样点数
+        """
+        discarded = self.available()
+        self._flush_pos = self._write_pos
+        return discarded
+
+
+class StreamClock:
+    """采样位置与时间的对应关系.
+
+    声卡回调每次记录"某个采样位置在何时被采集/播放"，其他线程据此按标称
+    采样率把任意采样位置换算为时间。两组锚点交替写入，读取方总能拿到
+    一组完整的锚点，回调中无需加锁。
+    """
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self._positions = [0, 0]
+        self._times = [0.0, 0.0]
+        self._current = -1
+
+    @property
+    def ready(self) -> bool:
+        return self._current >= 0
+
+    def mark(self, position: int, timestamp: float):
+        """
+        记录采样位置对应的时间（生产者调用）.
+        """
+        slot = (self._current + 1) & 1
+        self._positions[slot] = position
+        self._times[slot] = timestamp
+        # 锚点写完后再切换
+        self._current = slot
+
+    def time_at(self, position: float) -> Optional[float]:
+        """
+        采样位置换算为时间，尚无锚点时返回None.
+        """
+        slot = self._current
+        if slot < 0:
+            return None
+        return self._times[slot] + (position - self._positions[slot]) / self.sample_rate
+
+    def position_at(self, timestamp: float) -> Optional[float]:
+        """
+        时间换算为采样位置，尚无锚点时返回None.
+        """
+        slot = self._current
+        if slot < 0:
+            return None
+        offset = (timestamp - self._times[slot]) * self.sample_rate
+        return self._positions[slot] + offset
+
+    def reset(self):
+        self._current = -1
+
+
+class FrameAssembler:
+    """定长帧拼装器.
+
+    将任意长度的采样块累积到预分配数组中，按固定帧长切出视图。
+    一次推入的数据足够多时可以连续取出多帧。
+    """
+
+    def __init__(self, frame_size: int, capacity_frames: int = 4):
+        """初始化帧拼装器.
+
+        Args:
+            frame_size: 每帧采样点数
+            capacity_frames: 预分配容量（帧数）
+        """
+        if frame_size <= 0:
+            raise ValueError(f"帧大小必须大于0: {frame_size}")
+
+        self.frame_size = int(frame_size)
+        self._buffer = np.zeros(self.frame_size * max(capacity_frames, 2), np.int16)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def push(self, samples: np.ndarray):
+        """追加采样点.
+
+        之前通过pop_frame取得的视图在下一次push后失效，
+        需要保留的帧应由调用方自行复制。
+        """
+        samples = np.asarray(samples, dtype=np.int16).reshape(-1)
+        count = len(samples)
+        if count == 0:
+            return
+
+        pending = self._end - self._start
+        if self._end + count > len(self._buffer):
+            # 未取走的尾部数据移到开头
+            if pending + count > len(self._buffer):
+                new_size = max(len(self._buffer) * 2, pending + count)
+                new_buffer = np.zeros(new_size, dtype=np.int16)
+                new_buffer[:pending] = self._buffer[self._start : self._end]
+                self._buffer = new_buffer
+            elif pending:
+                self._buffer[:pending] = self._buffer[self._start : self._end]
+            self._start = 0
+            self._end = pending
+
+        self._buffer[self._end : self._end + count] = samples
+        self._end += count
+
+    def pop_frame(self):
+        """
+        取出一帧完整数据的视图，数据不足时返回None.
+        """
+        if self._end - self._start < self.frame_size:
+            return None
+
+        frame = self._buffer[self._start : self._start + self.frame_size]
+        self._start += self.frame_size
+        if self._start == self._end:
+            self._start = self._end = 0
+        return frame
+
+    def clear(self) -> int:
+        """
+        丢弃未成帧的数据，返回丢弃的采样点数.
+        """
+        discarded = self._end - self._start
+        self._start = self._end = 0
+        return discarded
+
+
+class FrameQueue:
+    """线程安全的有界帧队列.
+
+    生产者（声卡回调）放入帧时从不阻塞，队列满时丢弃最旧的帧并计数；
+    消费者线程阻塞等待，一次取出所有积压的帧以便批量处理。
+    """
+
+    def __init__(self, max_frames: int):
+        """初始化帧队列.
+
+        Args:
+            max_frames: 最多缓存的帧数
+        """
+        if max_frames <= 0:
+            raise ValueError(f"队列容量必须大于0: {max_frames}")
+
+        self.max_frames = int(max_frames)
+        self._frames = deque()
+        self._cond = threading.Condition(threading.Lock())
+        # 消费者等待的最少帧数，未等待时为0，用于避免无谓的唤醒
+        self._wanted = 0
+        self._wakeups = 0
+
+        # 统计信息
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def put(self, frame) -> bool:
+        """放入一帧.
+
+        Args:
+            frame: 音频帧，调用方需保证之后不再修改
+
+        Returns:
+            bool: 是否未丢弃数据
+        """
+        with self._cond:
+            kept = True
+            if len(self._frames) >= self.max_frames:
+                self._frames.popleft()
+                self.dropped += 1
+                kept = False
+            self._frames.append(frame)
+            if self._wanted and len(self._frames) >= self._wanted:
+                self._cond.notify()
+        return kept
+
+    def drain(self, min_frames: int = 1, timeout: float = None) -> list:
+        """取出所有积压的帧.
+
+        Args:
+            min_frames: 至少积累到的帧数（不超过队列容量），不足时阻塞等待
+            timeout: 最长等待时间（秒），超时或被wakeup唤醒时返回已有的帧
+
+        Returns:
+            list: 按到达顺序排列的帧
+        """
+        min_frames = min(max(1, min_frames), self.max_frames)
+        with self._cond:
+            if len(self._frames) < min_frames:
+                wakeups = self._wakeups
+                self._wanted = min_frames
+                try:
+                    self._cond.wait_for(
+                        lambda: len(self._frames) >= min_frames
+                        or self._wakeups != wakeups,
+                        timeout,
+                    )
+                finally:
+                    self._wanted = 0
+            frames = list(self._frames)
+            self._frames.clear()
+        return frames
+
+    def wakeup(self):
+        """
+        唤醒正在等待的消费者（例如停止时）.
+        """
+        with self._cond:
+            self._wakeups += 1
+            self._cond.notify_all()
+
+    def clear(self) -> int:
+        """
+        丢弃所有积压的帧，返回丢弃的帧数.
+        """
+        with self._cond:
+            discarded = len(self._frames)
+            self._frames.clear()
+        return discarded
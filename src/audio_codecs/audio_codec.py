@@ -1,19 +1,33 @@
 import asyncio
 import gc
+import threading
 import time
-from collections import deque
-from typing import Optional
 
 import numpy as np
 import opuslib
 import sounddevice as sd
 import soxr
 
+from src.audio_codecs.audio_buffers import AudioRingBuffer, FrameQueue, StreamClock
+from src.audio_codecs.audio_pipeline import (
+    AgcStage,
+    ApmStage,
+    AudioPipeline,
+    EncodeStage,
+    ResampleStage,
+    TeeStage,
+)
+from src.audio_codecs.jitter_buffer import FRAME_CONCEAL, JitterBuffer
 from src.constants.constants import AudioConfig
+from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
+from src.utils.metrics import LatencyHistogram
 
 logger = get_logger(__name__)
 
+# 声卡回调耗时分桶（毫秒），回调只做缓冲区拷贝，正常应远小于0.1ms
+CALLBACK_BOUNDS_MS = (0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10)
+
 
 class AudioCodec:
     """
@@ -31,8 +45,14 @@ class AudioCodec:
         # 输入重采样器
         self.input_resampler = None
 
-        # 重采样缓冲区，用deque提高性能
-        self._resample_input_buffer = deque()
+        # 输出重采样器：设备默认采样率与解码采样率不同时，解码后先重采样再写入
+        # 播放缓冲区，播放流按设备采样率打开，避免依赖驱动的隐式重采样
+        self.output_resampler = None
+        self._output_sample_rate = AudioConfig.OUTPUT_SAMPLE_RATE
+        self._output_frame_size = AudioConfig.OUTPUT_FRAME_SIZE
+
+        # 录音处理流水线：重采样 → AEC/NS → AGC → 分发 → 编码，在录音线程外执行
+        self._input_pipeline = None
 
         # 输入帧大小缓存
         self._device_input_frame_size = None
@@ -44,13 +64,62 @@ class AudioCodec:
         self.input_stream = None
         self.output_stream = None
 
-        # 音频数据队列
-        self._wakeword_buffer = asyncio.Queue(maxsize=100)  # 唤醒词检测
-        self._output_buffer = asyncio.Queue(maxsize=500)  # 音频播放
+        # 录音帧分发：每个消费者（唤醒词检测、打断检测等）持有一个帧队列，
+        # 声卡回调线程写入，消费者线程批量取出。元组整体替换，回调中无需加锁
+        self._input_taps = ()
+        self._input_taps_lock = threading.Lock()
+        self._wakeword_buffer = self.create_input_tap(max_frames=100)
+
+        # 播放环形缓冲区（播放流采样率的PCM），写入方为事件循环，读取方为声卡回调
+        config = ConfigManager.get_instance()
+        self._playback_buffer_ms = config.get_config(
+            "AUDIO_OPTIONS.PLAYBACK_BUFFER_MS", 10000
+        )
+        self._playback_buffer = AudioRingBuffer.from_duration(
+            AudioConfig.OUTPUT_SAMPLE_RATE,
+            self._playback_buffer_ms,
+            AudioConfig.CHANNELS,
+        )
         
+        # 下行抖动缓冲区：预缓冲到目标延迟，缺帧时用FEC/PLC补偿
+        self._jitter_buffer = JitterBuffer(
+            AudioConfig.FRAME_DURATION,
+            target_delay_ms=config.get_config("AUDIO_OPTIONS.JITTER_TARGET_MS", 120),
+            min_delay_ms=config.get_config("AUDIO_OPTIONS.JITTER_MIN_MS", 60),
+            max_delay_ms=config.get_config("AUDIO_OPTIONS.JITTER_MAX_MS", 600),
+            max_hold_ms=config.get_config("AUDIO_OPTIONS.JITTER_HOLD_MS", 120),
+        )
+        self._playout_task = None
+        self._playout_wakeup = asyncio.Event()
+
         # 实时编码回调
         self._encoded_audio_callback = None
 
+        # 录音处理线程：录音回调只把设备原始数据写入有界SPSC缓冲区，
+        # 流水线在独立线程中执行；设备采样率确定后按实际采样率重建缓冲区
+        self._capture_buffer_ms = config.get_config(
+            "AUDIO_OPTIONS.CAPTURE_BUFFER_MS", 1000
+        )
+        self._capture_buffer = AudioRingBuffer.from_duration(
+            AudioConfig.INPUT_SAMPLE_RATE, self._capture_buffer_ms, AudioConfig.CHANNELS
+        )
+        self._capture_event = threading.Event()
+        self._capture_thread = None
+
+        # 回声消除参考：录音采样位置的采集时间、播放参考缓冲区（启用APM时创建）
+        # 以及两个流报告的缓冲延迟，用于换算采样实际被采集/播放的时间
+        self._capture_clock = None
+        self._playback_reference = None
+        self._echo_aligner = None
+        self._input_latency = 0.0
+        self._output_latency = 0.0
+
+        # 声卡回调耗时和溢出/欠载计数
+        self.input_callback_timing = LatencyHistogram(CALLBACK_BOUNDS_MS)
+        self.output_callback_timing = LatencyHistogram(CALLBACK_BOUNDS_MS)
+        self._input_overflows = 0
+        self._output_underflows = 0
+
     async def initialize(self):
         """
         初始化音频设备和编解码器
@@ -71,9 +140,27 @@ class AudioCodec:
                 self.device_input_sample_rate * frame_duration_sec
             )
 
+            self._capture_buffer = AudioRingBuffer.from_duration(
+                self.device_input_sample_rate,
+                self._capture_buffer_ms,
+                AudioConfig.CHANNELS,
+            )
+            self._capture_clock = StreamClock(self.device_input_sample_rate)
+
+            # 播放流采样率：设备默认采样率不同且允许重采样时使用设备采样率
+            self._output_sample_rate = self._select_output_sample_rate()
+            self._output_frame_size = int(
+                self._output_sample_rate * frame_duration_sec
+            )
+            self._playback_buffer = AudioRingBuffer.from_duration(
+                self._output_sample_rate,
+                self._playback_buffer_ms,
+                AudioConfig.CHANNELS,
+            )
+
             logger.info(f"设备输入采样率: {self.device_input_sample_rate}Hz")
             logger.info(f"设备输出采样率: {self.device_output_sample_rate}Hz")
-            logger.info(f"音频输出将使用固定24kHz采样率")
+            logger.info(f"音频输出使用 {self._output_sample_rate}Hz 采样率")
 
             # 创建重采样器
             await self._create_resamplers()
@@ -98,16 +185,49 @@ class AudioCodec:
                 AudioConfig.OUTPUT_SAMPLE_RATE, AudioConfig.CHANNELS
             )
 
+            # 构建录音处理流水线并启动处理线程
+            self._input_pipeline = self._build_input_pipeline()
+            self._start_capture_worker()
+
+            # 启动播放调度任务
+            self._playout_task = asyncio.create_task(self._playout_loop())
+
             logger.info("音频设备和编解码器初始化成功")
         except Exception as e:
             logger.error(f"初始化音频设备失败: {e}")
             await self.close()
             raise
 
+    @staticmethod
+    def _output_resample_quality():
+        """
+        输出重采样质量档位（QQ/LQ/MQ/HQ/VHQ），配置为OFF时返回None
+        """
+        quality = ConfigManager.get_instance().get_config(
+            "AUDIO_OPTIONS.OUTPUT_RESAMPLE_QUALITY", "HQ"
+        )
+        quality = str(quality or "OFF").upper()
+        if quality == "OFF":
+            return None
+        if quality not in ("QQ", "LQ", "MQ", "HQ", "VHQ"):
+            logger.warning(f"未知的输出重采样质量 {quality}，使用HQ")
+            return "HQ"
+        return quality
+
+    def _select_output_sample_rate(self) -> int:
+        """
+        选择播放流采样率，关闭输出重采样时沿用解码采样率
+        """
+        if self._output_resample_quality() is None:
+            return AudioConfig.OUTPUT_SAMPLE_RATE
+        if not self.device_output_sample_rate:
+            return AudioConfig.OUTPUT_SAMPLE_RATE
+        return self.device_output_sample_rate
+
     async def _create_resamplers(self):
         """
-        创建输入重采样器，转换设备采样率到16kHz
-        输出固定24kHz，不需要重采样
+        创建重采样器：输入从设备采样率转换到16kHz，
+        输出从解码采样率转换到播放流采样率（两者相同时不创建）
         """
         if self.device_input_sample_rate != AudioConfig.INPUT_SAMPLE_RATE:
             self.input_resampler = soxr.ResampleStream(
@@ -122,12 +242,26 @@ class AudioCodec:
                 f"{AudioConfig.INPUT_SAMPLE_RATE}Hz"
             )
 
-        logger.info(f"输出使用24kHz固定采样率")
+        if self._output_sample_rate != AudioConfig.OUTPUT_SAMPLE_RATE:
+            # 质量档位：QQ/LQ延迟低于1ms，MQ/HQ/VHQ约40ms，CPU开销都很小，
+            # 见 scripts/output_resample_benchmark.py
+            quality = self._output_resample_quality()
+            self.output_resampler = soxr.ResampleStream(
+                AudioConfig.OUTPUT_SAMPLE_RATE,
+                self._output_sample_rate,
+                AudioConfig.CHANNELS,
+                dtype="int16",
+                quality=quality,
+            )
+            logger.info(
+                f"创建输出重采样器: {AudioConfig.OUTPUT_SAMPLE_RATE}Hz -> "
+                f"{self._output_sample_rate}Hz (质量 {quality})"
+            )
 
     async def _create_streams(self):
         """
         创建音频输入输出流
-        输入流使用设备原生采样率，输出流固定24kHz
+        输入流使用设备原生采样率，输出流使用选定的播放采样率
         """
         try:
             # 录音流
@@ -143,10 +277,10 @@ class AudioCodec:
 
             # 播放流
             self.output_stream = sd.OutputStream(
-                samplerate=AudioConfig.OUTPUT_SAMPLE_RATE,
+                samplerate=self._output_sample_rate,
                 channels=AudioConfig.CHANNELS,
                 dtype=np.int16,
-                blocksize=AudioConfig.OUTPUT_FRAME_SIZE,
+                blocksize=self._output_frame_size,
                 callback=self._output_callback,
                 finished_callback=self._output_finished_callback,
                 latency="low",
@@ -155,119 +289,239 @@ class AudioCodec:
             # 启动音频流
             self.input_stream.start()
             self.output_stream.start()
+            self._update_stream_latency()
 
         except Exception as e:
             logger.error(f"创建音频流失败: {e}")
             raise
 
+    def _update_stream_latency(self):
+        """
+        记录输入输出流的缓冲延迟（秒）
+        """
+        if self.input_stream is not None:
+            self._input_latency = float(self.input_stream.latency)
+        if self.output_stream is not None:
+            self._output_latency = float(self.output_stream.latency)
+
     def _input_callback(self, indata, frames, time_info, status):
         """
         录音回调函数
-        处理录音数据，重采样到16kHz并进行Opus编码
+        只把设备原始数据写入缓冲区并唤醒处理线程，重采样和编码都不在回调中执行
         """
-        if status and "overflow" not in str(status).lower():
-            logger.warning(f"输入流状态: {status}")
+        started = time.perf_counter()
+        if status:
+            if "overflow" in str(status).lower():
+                self._input_overflows += 1
+            else:
+                logger.warning(f"输入流状态: {status}")
 
         if self._is_closing:
             return
 
         try:
-            audio_data = indata.copy().flatten()
+            audio_data = indata.reshape(-1)
+            if self._capture_buffer.write(audio_data) < len(audio_data):
+                logger.debug("录音处理缓冲区已满，丢弃部分数据")
+            clock = self._capture_clock
+            if clock is not None:
+                # 块中最后一个采样约在回调前一个输入延迟时被采集
+                clock.mark(
+                    self._capture_buffer.write_position,
+                    time.monotonic() - self._input_latency,
+                )
+            self._capture_event.set()
+        except Exception as e:
+            logger.error(f"输入回调错误: {e}")
+        self.input_callback_timing.observe((time.perf_counter() - started) * 1000)
+
+    def _build_input_pipeline(self) -> AudioPipeline:
+        """
+        按配置构建录音处理流水线
+        """
+        config = ConfigManager.get_instance()
+        stages = []
+
+        # 回声消除/降噪（可选），参考信号按采集时间从播放参考缓冲区对齐取出
+        if config.get_config("AUDIO_OPTIONS.ENABLE_APM", False):
+            processor = self._create_apm_processor()
+            if processor is not None:
+                self._echo_aligner = self._create_echo_aligner()
+                stages.append(
+                    ApmStage(
+                        processor,
+                        aligner=self._echo_aligner,
+                        clock=lambda: pipeline.frame_time,
+                    )
+                )
 
-            # 重采样处理
-            if self.input_resampler is not None:
-                audio_data = self._process_input_resampling(audio_data)
-                if audio_data is None:
-                    return
+        # 自动增益（可选）
+        if config.get_config("AUDIO_OPTIONS.ENABLE_AGC", False):
+            stages.append(
+                AgcStage(
+                    AudioConfig.INPUT_FRAME_SIZE,
+                    target_dbfs=config.get_config(
+                        "AUDIO_OPTIONS.AGC_TARGET_DBFS", -18.0
+                    ),
+                    max_gain_db=config.get_config(
+                        "AUDIO_OPTIONS.AGC_MAX_GAIN_DB", 20.0
+                    ),
+                )
+            )
 
-            # 实时编码录音数据
-            if self._encoded_audio_callback and len(audio_data) == AudioConfig.INPUT_FRAME_SIZE:
-                try:
-                    pcm_data = audio_data.astype(np.int16).tobytes()
-                    encoded_data = self.opus_encoder.encode(pcm_data, AudioConfig.INPUT_FRAME_SIZE)
-                    
-                    if encoded_data:
-                        self._encoded_audio_callback(encoded_data)
-                        
-                except Exception as e:
-                    logger.warning(f"实时录音编码失败: {e}")
+        stages.append(TeeStage(self._fan_out_input_frame))
+        stages.append(
+            EncodeStage(
+                self.opus_encoder,
+                AudioConfig.INPUT_FRAME_SIZE,
+                lambda: self._encoded_audio_callback,
+            )
+        )
 
-            # 提供数据给唤醒词检测
-            self._put_audio_data_safe(self._wakeword_buffer, audio_data.copy())
+        resampler = None
+        if self.input_resampler is not None:
+            resampler = ResampleStage(self.input_resampler)
 
-        except Exception as e:
-            logger.error(f"输入回调错误: {e}")
+        pipeline = AudioPipeline(
+            AudioConfig.INPUT_FRAME_SIZE,
+            resampler=resampler,
+            stages=stages,
+            sample_rate=AudioConfig.INPUT_SAMPLE_RATE,
+        )
+        logger.info(f"录音处理流水线: {' → '.join(pipeline.stage_names)}")
+        return pipeline
 
-    def _process_input_resampling(self, audio_data):
+    def _create_apm_processor(self):
         """
-        输入音频重采样处理
-        将设备采样率转换为16kHz
+        创建回声消除/降噪处理器，不可用时返回None
         """
         try:
-            resampled_data = self.input_resampler.resample_chunk(audio_data, last=False)
-            if len(resampled_data) > 0:
-                # 添加到缓冲区
-                self._resample_input_buffer.extend(resampled_data.astype(np.int16))
-
-            # 检查是否有足够数据组成完整帧
-            expected_frame_size = AudioConfig.INPUT_FRAME_SIZE
-            if len(self._resample_input_buffer) < expected_frame_size:
-                return None
-
-            # 取出一帧数据
-            frame_data = []
-            for _ in range(expected_frame_size):
-                frame_data.append(self._resample_input_buffer.popleft())
-
-            return np.array(frame_data, dtype=np.int16)
+            from src.audio_processing.webrtc_processing import WebRTCProcessor
 
+            config = ConfigManager.get_instance()
+            processor = WebRTCProcessor(
+                sample_rate=AudioConfig.INPUT_SAMPLE_RATE,
+                channels=AudioConfig.CHANNELS,
+                frame_size=AudioConfig.INPUT_SAMPLE_RATE // 100,
+                backend=config.get_config("AUDIO_OPTIONS.APM_BACKEND", "auto"),
+            )
         except Exception as e:
-            logger.error(f"输入重采样失败: {e}")
+            logger.warning(f"回声消除/降噪不可用: {e}")
+            return None
+
+        if not processor._initialized:
+            logger.warning("回声消除/降噪处理器初始化失败，跳过该阶段")
             return None
+        return processor
 
-    def _put_audio_data_safe(self, queue, audio_data):
+    def _create_echo_aligner(self):
         """
-        安全地将音频数据放入队列
+        创建播放参考缓冲区和回声延迟对齐器
         """
-        try:
-            queue.put_nowait(audio_data)
-        except asyncio.QueueFull:
-            # 队列满时移除最旧数据
-            try:
-                queue.get_nowait()
-                queue.put_nowait(audio_data)
-            except asyncio.QueueEmpty:
-                queue.put_nowait(audio_data)
+        from src.audio_processing.echo_reference import (
+            DelayEstimator,
+            EchoAligner,
+            PlaybackReference,
+        )
+
+        config = ConfigManager.get_instance()
+        # 参考缓冲区按10ms插值，对齐器按流水线帧长输出，每个APM子帧都有参考信号
+        interp_size = AudioConfig.INPUT_SAMPLE_RATE // 100
+        frame_size = AudioConfig.INPUT_FRAME_SIZE
+        estimator = None
+        if config.get_config("AUDIO_OPTIONS.AEC_DELAY_ESTIMATION", True):
+            estimator = DelayEstimator(
+                AudioConfig.INPUT_SAMPLE_RATE,
+                max_delay_ms=config.get_config("AUDIO_OPTIONS.AEC_MAX_DELAY_MS", 250),
+            )
+
+        self._playback_reference = PlaybackReference(
+            self._output_sample_rate, AudioConfig.INPUT_SAMPLE_RATE, interp_size
+        )
+        return EchoAligner(
+            self._playback_reference,
+            frame_size,
+            AudioConfig.INPUT_SAMPLE_RATE,
+            estimator=estimator,
+        )
+
+    def _fan_out_input_frame(self, frame):
+        """
+        把处理后的16kHz帧分发给各个录音消费者（处理线程）
+        """
+        # 共享同一份拷贝（消费者不得原地修改）
+        taps = self._input_taps
+        if taps:
+            frame = frame.copy()
+            for tap in taps:
+                tap.put(frame)
+
+    def _start_capture_worker(self):
+        """
+        启动录音处理线程
+        """
+        if self._capture_thread and self._capture_thread.is_alive():
+            return
+
+        self._capture_thread = threading.Thread(
+            target=self._capture_worker, name="AudioPipeline", daemon=True
+        )
+        self._capture_thread.start()
+
+    def _capture_worker(self):
+        """
+        录音处理线程：按设备块取出缓冲区中的原始数据，送入处理流水线
+        """
+        block = np.zeros(self._device_input_frame_size, dtype=np.int16)
+
+        while not self._is_closing:
+            self._capture_event.wait(timeout=0.5)
+            # 先清除事件再取数据，避免丢失取数期间的唤醒
+            self._capture_event.clear()
+
+            pipeline = self._input_pipeline
+            while (
+                pipeline is not None
+                and self._capture_buffer.available() >= len(block)
+            ):
+                self._capture_buffer.read_into(block)
+                end_time = None
+                if self._capture_clock is not None:
+                    end_time = self._capture_clock.time_at(
+                        self._capture_buffer.read_position
+                    )
+                try:
+                    pipeline.process_block(block, end_time)
+                except Exception as e:
+                    logger.error(f"录音处理流水线出错: {e}")
+
+        logger.info("录音处理线程已停止")
 
     def _output_callback(self, outdata: np.ndarray, frames: int, time_info, status):
         """
         播放回调函数
-        从缓冲区取出24kHz音频数据进行播放
+        从环形缓冲区按采样点读取播放采样率的音频数据进行播放
         """
+        started = time.perf_counter()
         if status:
-            if "underflow" not in str(status).lower():
+            if "underflow" in str(status).lower():
+                self._output_underflows += 1
+            else:
                 logger.warning(f"输出流状态: {status}")
 
         try:
-            try:
-                # 从输出缓冲区获取音频数据
-                audio_data = self._output_buffer.get_nowait()
-
-                # 写入音频数据
-                if len(audio_data) >= frames:
-                    outdata[:] = audio_data[:frames].reshape(-1, AudioConfig.CHANNELS)
-                else:
-                    outdata[: len(audio_data)] = audio_data.reshape(-1, AudioConfig.CHANNELS)
-                    outdata[len(audio_data) :] = 0
-
-            except asyncio.QueueEmpty:
-                # 无数据时输出静音
-                outdata.fill(0)
-
+            # 不足部分由缓冲区填充静音，剩余数据留给下一次回调
+            samples = outdata.reshape(-1)
+            self._playback_buffer.read_into(samples)
+
+            # 实际播放的数据写入回声消除参考缓冲区
+            reference = self._playback_reference
+            if reference is not None:
+                reference.write(samples, time.monotonic() + self._output_latency)
         except Exception as e:
             logger.error(f"输出回调错误: {e}")
             outdata.fill(0)
-
+        self.output_callback_timing.observe((time.perf_counter() - started) * 1000)
 
     def _input_finished_callback(self):
         """
@@ -305,6 +559,7 @@ class AudioCodec:
                     latency="low",
                 )
                 self.input_stream.start()
+                self._update_stream_latency()
                 logger.info("输入流重新初始化成功")
                 return True
             else:
@@ -314,15 +569,16 @@ class AudioCodec:
                     self.output_stream.close()
 
                 self.output_stream = sd.OutputStream(
-                    samplerate=AudioConfig.OUTPUT_SAMPLE_RATE,
+                    samplerate=self._output_sample_rate,
                     channels=AudioConfig.CHANNELS,
                     dtype=np.int16,
-                    blocksize=AudioConfig.OUTPUT_FRAME_SIZE,
+                    blocksize=self._output_frame_size,
                     callback=self._output_callback,
                     finished_callback=self._output_finished_callback,
                     latency="low",
                 )
                 self.output_stream.start()
+                self._update_stream_latency()
                 logger.info("输出流重新初始化成功")
                 return None
         except Exception as e:
@@ -333,63 +589,143 @@ class AudioCodec:
             else:
                 raise
 
-    async def get_raw_audio_for_detection(self) -> Optional[bytes]:
+    @property
+    def wakeword_queue(self) -> FrameQueue:
         """
-        获取唤醒词检测用的原始音频数据
-        
-        从专用队列获取数据，与录音编码独立运行，
-        避免数据竞争问题。
+        唤醒词检测用的原始音频帧队列（16kHz int16）
 
-        Returns:
-            Optional[bytes]: PCM格式音频数据，无数据时返回None
+        与录音编码独立，消费者线程通过drain批量取出。
         """
-        try:
-            if self._wakeword_buffer.empty():
-                return None
+        return self._wakeword_buffer
 
-            audio_data = self._wakeword_buffer.get_nowait()
+    def create_input_tap(self, max_frames: int = 50) -> FrameQueue:
+        """
+        注册一个录音帧消费者，返回接收16kHz int16帧的队列
 
-            # 转换为bytes格式
-            if hasattr(audio_data, "tobytes"):
-                return audio_data.tobytes()
-            elif hasattr(audio_data, "astype"):
-                return audio_data.astype("int16").tobytes()
-            else:
-                return audio_data
+        复用已有的录音流，不再单独打开麦克风。队列满时丢弃最旧的帧。
+        """
+        tap = FrameQueue(max_frames=max_frames)
+        with self._input_taps_lock:
+            self._input_taps = self._input_taps + (tap,)
+        return tap
 
-        except asyncio.QueueEmpty:
-            return None
-        except Exception as e:
-            logger.error(f"获取唤醒词音频数据失败: {e}")
-            return None
+    def remove_input_tap(self, tap: FrameQueue):
+        """
+        注销录音帧消费者
+        """
+        with self._input_taps_lock:
+            self._input_taps = tuple(t for t in self._input_taps if t is not tap)
+        tap.wakeup()
 
     def set_encoded_audio_callback(self, callback):
         """
         设置编码后音频数据的回调函数
         
-        启用实时编码模式，录音回调中直接编码并传递，
-        消除轮询延迟，提升录音实时性。
+        启用实时编码模式，录音回调将PCM数据写入缓冲区，
+        由处理线程经流水线编码后按批次传递，回调在处理线程中执行。
         
         Args:
-            callback: 回调函数，接收编码数据参数，None时禁用实时编码
+            callback: 回调函数，接收编码数据列表参数，None时禁用实时编码
         """
         self._encoded_audio_callback = callback
         
         if callback:
-            logger.info("✓ 启用实时录音编码模式 - 录音回调直接编码传递")
+            logger.info("✓ 启用实时录音编码模式 - 处理线程批量传递")
         else:
             logger.info("✓ 禁用录音编码回调")
 
-    async def write_audio(self, opus_data: bytes):
+    def write_audio_nowait(self, opus_data: bytes):
         """
-        解码Opus音频数据并放入播放队列
-        输出24kHz PCM数据，直接用于播放
+        将Opus音频数据放入抖动缓冲区，并解码可播放的帧（事件循环线程同步调用）
+        解码后按需重采样到播放采样率
         """
         try:
-            # Opus解码为24kHz PCM数据
-            pcm_data = self.opus_decoder.decode(
-                opus_data, AudioConfig.OUTPUT_FRAME_SIZE
+            now = time.monotonic()
+            self._jitter_buffer.put(opus_data, now)
+            self._feed_playback(now)
+            self._playout_wakeup.set()
+        except Exception as e:
+            logger.warning(f"音频写入失败，丢弃此帧: {e}")
+
+    def write_audio_batch_nowait(self, packets):
+        """
+        批量写入按序到达的多个Opus数据包，全部入队后统一解码一次
+        """
+        try:
+            now = time.monotonic()
+            for opus_data in packets:
+                self._jitter_buffer.put(opus_data, now)
+            self._feed_playback(now)
+            self._playout_wakeup.set()
+        except Exception as e:
+            logger.warning(f"批量音频写入失败: {e}")
+
+    async def write_audio(self, opus_data: bytes):
+        """
+        write_audio_nowait的协程版本，保留给需要await的调用方
+        """
+        self.write_audio_nowait(opus_data)
+
+    def conceal_lost_audio(self, count: int):
+        """
+        记录网络层确认丢失的帧，播放到该位置时用FEC/PLC补偿
+        """
+        self._jitter_buffer.put_lost(count)
+
+    def _feed_playback(self, now=None):
+        """
+        从抖动缓冲区取出可播放的帧，解码后写入播放缓冲区
+        """
+        if self.opus_decoder is None:
+            return
+
+        if now is None:
+            now = time.monotonic()
+        while True:
+            buffered_ms = (
+                self._playback_buffer.available() * 1000 / self._output_sample_rate
             )
+            frame = self._jitter_buffer.next_frame(buffered_ms, now)
+            if frame is None:
+                return
+
+            kind, opus_data = frame
+            audio_array = self._decode_frame(opus_data, conceal=kind == FRAME_CONCEAL)
+            if audio_array is None:
+                continue
+
+            # 按帧流式重采样到播放流采样率
+            if self.output_resampler is not None:
+                audio_array = self.output_resampler.resample_chunk(audio_array)
+                if len(audio_array) == 0:
+                    continue
+
+            # 写入播放环形缓冲区
+            written = self._playback_buffer.write(audio_array)
+            if written < len(audio_array):
+                logger.warning(
+                    f"播放缓冲区已满({self._playback_buffer_ms}ms)，"
+                    f"丢弃 {len(audio_array) - written} 个采样点"
+                )
+                return
+
+    def _decode_frame(self, opus_data, conceal=False):
+        """
+        解码一帧Opus数据，conceal为True时使用下一包的FEC信息或PLC补偿
+        """
+        try:
+            if conceal:
+                # 有后续包时用其内嵌FEC恢复，否则空包触发PLC
+                pcm_data = self.opus_decoder.decode(
+                    opus_data or b"",
+                    AudioConfig.OUTPUT_FRAME_SIZE,
+                    decode_fec=opus_data is not None,
+                )
+            else:
+                # Opus解码为24kHz PCM数据
+                pcm_data = self.opus_decoder.decode(
+                    opus_data, AudioConfig.OUTPUT_FRAME_SIZE
+                )
 
             audio_array = np.frombuffer(pcm_data, dtype=np.int16)
 
@@ -397,15 +733,68 @@ class AudioCodec:
             expected_length = AudioConfig.OUTPUT_FRAME_SIZE * AudioConfig.CHANNELS
             if len(audio_array) != expected_length:
                 logger.warning(f"解码音频长度异常: {len(audio_array)}, 期望: {expected_length}")
-                return
+                return None
 
-            # 放入播放缓冲区
-            self._put_audio_data_safe(self._output_buffer, audio_array)
+            return audio_array
 
         except opuslib.OpusError as e:
             logger.warning(f"Opus解码失败，丢弃此帧: {e}")
-        except Exception as e:
-            logger.warning(f"音频写入失败，丢弃此帧: {e}")
+            return None
+
+    async def _playout_loop(self):
+        """
+        播放调度：数据未到时按时检查，必要时进行预缓冲超时启动或丢帧补偿
+        """
+        interval = AudioConfig.FRAME_DURATION / 2000
+
+        while not self._is_closing:
+            try:
+                if self._jitter_buffer.is_idle:
+                    self._playout_wakeup.clear()
+                    await self._playout_wakeup.wait()
+                    continue
+
+                self._feed_playback()
+                await asyncio.sleep(interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"播放调度错误: {e}")
+                await asyncio.sleep(interval)
+
+    def get_playback_stats(self) -> dict:
+        """
+        获取下行播放统计：抖动缓冲区的欠载、迟到、补偿计数及播放缓冲区状态
+        """
+        stats = self._jitter_buffer.get_stats()
+        stats["buffered_ms"] = (
+            self._playback_buffer.available() * 1000 // self._output_sample_rate
+        )
+        stats["overflow_samples"] = self._playback_buffer.overflow_samples
+        return stats
+
+    def get_callback_stats(self) -> dict:
+        """
+        获取声卡回调耗时及输入溢出/输出欠载次数
+        """
+        return {
+            "input_overflows": self._input_overflows,
+            "output_underflows": self._output_underflows,
+            "input_callback": self.input_callback_timing.snapshot(),
+            "output_callback": self.output_callback_timing.snapshot(),
+        }
+
+    def get_pipeline_stats(self) -> dict:
+        """
+        获取录音处理流水线各阶段的耗时统计
+        """
+        if self._input_pipeline is None:
+            return {}
+        stats = self._input_pipeline.get_stats()
+        stats["capture_overflow_samples"] = self._capture_buffer.overflow_samples
+        if self._echo_aligner is not None:
+            stats["echo_reference"] = self._echo_aligner.get_stats()
+        return stats
 
     async def wait_for_audio_complete(self, timeout=10.0):
         """
@@ -413,44 +802,43 @@ class AudioCodec:
         """
         start = time.time()
         
-        # 等待播放队列清空
-        while not self._output_buffer.empty() and time.time() - start < timeout:
+        # 等待抖动缓冲区和播放缓冲区清空
+        while (
+            self._playback_buffer.available() > 0 or len(self._jitter_buffer) > 0
+        ) and time.time() - start < timeout:
             await asyncio.sleep(0.05)
         
         # 额外等待确保最后的音频播放完成
         await asyncio.sleep(0.3)
         
         # 检查超时情况
-        if not self._output_buffer.empty():
-            output_remaining = self._output_buffer.qsize()
-            logger.warning(
-                f"音频播放超时，剩余队列 - 输出: {output_remaining} 帧"
-            )
+        output_remaining = self._playback_buffer.available()
+        if output_remaining > 0:
+            remaining_ms = output_remaining * 1000 // self._output_sample_rate
+            logger.warning(f"音频播放超时，剩余缓冲 - 输出: {remaining_ms} ms")
 
     async def clear_audio_queue(self):
         """
         清空音频队列
         """
-        cleared_count = 0
-
-        # 清空所有队列
-        queues_to_clear = [
-            self._wakeword_buffer,
-            self._output_buffer,
-        ]
-
-        for queue in queues_to_clear:
-            while not queue.empty():
-                try:
-                    queue.get_nowait()
-                    cleared_count += 1
-                except asyncio.QueueEmpty:
-                    break
-
-        # 清空重采样缓冲区
-        if self._resample_input_buffer:
-            cleared_count += len(self._resample_input_buffer)
-            self._resample_input_buffer.clear()
+        cleared_count = sum(tap.clear() for tap in self._input_taps)
+
+        # 清空抖动缓冲区和播放缓冲区（按帧计数）
+        cleared_count += self._jitter_buffer.clear()
+        discarded_samples = self._playback_buffer.clear()
+        if discarded_samples > 0:
+            cleared_count += -(-discarded_samples // self._output_frame_size)
+        if self.output_resampler is not None:
+            # 丢弃重采样器中滞留的旧语音
+            self.output_resampler.clear()
+
+        # 清空待处理的录音数据，流水线内部缓存由处理线程清空
+        discarded_samples = self._capture_buffer.clear()
+        if discarded_samples > 0:
+            block_size = self._device_input_frame_size or AudioConfig.INPUT_FRAME_SIZE
+            cleared_count += -(-discarded_samples // block_size)
+        if self._input_pipeline:
+            self._input_pipeline.request_reset()
 
         # 等待正在处理的音频数据完成
         await asyncio.sleep(0.01)
@@ -551,9 +939,28 @@ class AudioCodec:
             # 清理重采样器
             await self._cleanup_resampler(self.input_resampler, "输入")
             self.input_resampler = None
+            await self._cleanup_resampler(self.output_resampler, "输出")
+            self.output_resampler = None
 
-            # 清理重采样缓冲区
-            self._resample_input_buffer.clear()
+            # 停止播放调度任务
+            if self._playout_task and not self._playout_task.done():
+                self._playout_task.cancel()
+                try:
+                    await self._playout_task
+                except asyncio.CancelledError:
+                    pass
+            self._playout_task = None
+
+            # 停止录音处理线程
+            self._capture_event.set()
+            if self._capture_thread and self._capture_thread.is_alive():
+                self._capture_thread.join(timeout=1.0)
+            self._capture_thread = None
+
+            # 释放流水线资源
+            if self._input_pipeline:
+                self._input_pipeline.close()
+                self._input_pipeline = None
 
             # 清理编解码器
             self.opus_encoder = None
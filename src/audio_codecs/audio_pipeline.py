@@ -0,0 +1,366 @@
+"""录音处理流水线.
+
+在录音线程之外按顺序执行各处理阶段：
+    重采样 → 回声消除/降噪（可选） → 自动增益（可选） → 分发给唤醒词/VAD → Opus编码
+每帧数据在预分配的NumPy数组上原地处理，每个阶段单独统计耗时，
+便于定位占用实时预算的阶段。
+"""
+
+import math
+import threading
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from src.audio_codecs.audio_buffers import FrameAssembler
+from src.utils.logging_config import get_logger
+from src.utils.metrics import LatencyHistogram
+
+logger = get_logger(__name__)
+
+# 阶段耗时分桶（毫秒），单帧处理通常远小于1ms
+STAGE_BOUNDS_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20)
+
+
+class AudioStage:
+    """流水线阶段基类.
+
+    process接收一帧int16数据（可原地修改），返回交给下一阶段的帧，
+    返回None时该帧不再向后传递。
+    """
+
+    name = "stage"
+
+    def process(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        return frame
+
+    def flush(self):
+        """
+        一批帧处理完成后调用.
+        """
+
+    def reset(self):
+        """
+        丢弃阶段内部的缓存状态.
+        """
+
+    def close(self):
+        """
+        释放资源.
+        """
+
+
+class ResampleStage(AudioStage):
+    """
+    重采样阶段：把设备采样率的数据块转换为目标采样率，输出长度不定.
+    """
+
+    name = "resample"
+
+    def __init__(self, resampler):
+        """
+        Args:
+            resampler: soxr.ResampleStream实例
+        """
+        self.resampler = resampler
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        return self.resampler.resample_chunk(block, last=False)
+
+    def reset(self):
+        # 丢弃重采样器内部滞留的旧录音
+        self.resampler.clear()
+
+
+class ApmStage(AudioStage):
+    """回声消除/降噪阶段，按处理器的子帧长度（通常10ms）切分后原地处理.
+
+    提供对齐器时，参考信号按每帧的采集时间从播放参考缓冲区取出；
+    否则沿用处理器自身的参考队列。
+    """
+
+    name = "apm"
+
+    def __init__(
+        self,
+        processor,
+        aligner=None,
+        clock: Optional[Callable[[], Optional[float]]] = None,
+    ):
+        """
+        Args:
+            processor: WebRTCProcessor实例
+            aligner: EchoAligner实例（可选）
+            clock: 返回当前帧采集时间的函数，与aligner配合使用
+        """
+        self.processor = processor
+        self.subframe_size = processor.frame_size
+        self.aligner = aligner
+        self.clock = clock
+
+    def process(self, frame: np.ndarray) -> np.ndarray:
+        reference = None
+        if self.aligner is not None:
+            frame_time = self.clock() if self.clock else None
+            reference = self.aligner.align(frame, frame_time)
+            if reference is not None and len(reference) < len(frame):
+                raise ValueError(
+                    f"参考帧长度 {len(reference)} 小于录音帧长度 {len(frame)}"
+                )
+
+        step = self.subframe_size
+        for start in range(0, len(frame) - step + 1, step):
+            segment = frame[start : start + step]
+            if self.aligner is None:
+                reference_data = self.processor.get_reference_data()
+            elif reference is not None:
+                reference_data = reference[start : start + step].tobytes()
+            else:
+                reference_data = None
+            processed = self.processor.process_capture_stream(
+                segment.tobytes(), reference_data
+            )
+            segment[:] = np.frombuffer(processed, dtype=np.int16)
+        return frame
+
+    def reset(self):
+        if self.aligner is not None:
+            self.aligner.reset()
+
+    def close(self):
+        self.processor.close()
+
+
+class AgcStage(AudioStage):
+    """数字自动增益阶段.
+
+    按帧RMS计算使电平接近目标值的增益，增益下降快、上升慢，
+    低于噪声门限的帧保持当前增益，避免放大背景噪声。
+    """
+
+    name = "agc"
+
+    def __init__(
+        self,
+        frame_size: int,
+        target_dbfs: float = -18.0,
+        max_gain_db: float = 20.0,
+        noise_gate_dbfs: float = -50.0,
+        attack: float = 0.3,
+        release: float = 0.05,
+    ):
+        self.target_rms = 32768 * 10 ** (target_dbfs / 20)
+        self.max_gain = 10 ** (max_gain_db / 20)
+        self.noise_gate_rms = 32768 * 10 ** (noise_gate_dbfs / 20)
+        self.attack = attack
+        self.release = release
+        self.gain = 1.0
+        self._work = np.zeros(frame_size, dtype=np.float32)
+
+    def process(self, frame: np.ndarray) -> np.ndarray:
+        work = self._work[: len(frame)]
+        work[:] = frame
+        rms = math.sqrt(float(np.dot(work, work)) / max(len(work), 1))
+
+        if rms > self.noise_gate_rms:
+            desired = min(self.target_rms / rms, self.max_gain)
+            rate = self.attack if desired < self.gain else self.release
+            self.gain += (desired - self.gain) * rate
+
+        if self.gain != 1.0:
+            work *= self.gain
+            np.clip(work, -32768, 32767, out=work)
+            frame[:] = work
+        return frame
+
+    def reset(self):
+        self.gain = 1.0
+
+
+class TeeStage(AudioStage):
+    """
+    分发阶段：把处理后的帧交给唤醒词检测、VAD等消费者.
+    """
+
+    name = "tee"
+
+    def __init__(self, fan_out: Callable[[np.ndarray], None]):
+        self.fan_out = fan_out
+
+    def process(self, frame: np.ndarray) -> np.ndarray:
+        self.fan_out(frame)
+        return frame
+
+
+class EncodeStage(AudioStage):
+    """
+    Opus编码阶段，一批帧编码完成后通过回调整批交付.
+    """
+
+    name = "encode"
+
+    def __init__(self, encoder, frame_size: int, get_callback: Callable):
+        """
+        Args:
+            encoder: opuslib.Encoder实例
+            frame_size: 每帧采样点数
+            get_callback: 返回当前编码回调的函数，回调为None时跳过编码
+        """
+        self.encoder = encoder
+        self.frame_size = frame_size
+        self.get_callback = get_callback
+        self._batch = []
+
+    def process(self, frame: np.ndarray) -> np.ndarray:
+        if self.get_callback() is None:
+            return frame
+        try:
+            encoded_data = self.encoder.encode(frame.tobytes(), self.frame_size)
+            if encoded_data:
+                self._batch.append(encoded_data)
+        except Exception as e:
+            logger.warning(f"实时录音编码失败: {e}")
+        return frame
+
+    def flush(self):
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        callback = self.get_callback()
+        if callback:
+            try:
+                callback(batch)
+            except Exception as e:
+                logger.error(f"编码音频回调失败: {e}")
+
+    def reset(self):
+        self._batch = []
+
+
+class AudioPipeline:
+    """录音处理流水线.
+
+    只在单个工作线程中调用process_block；其他线程通过request_reset
+    请求清空，由工作线程在下一次处理前执行。
+    """
+
+    def __init__(
+        self,
+        frame_size: int,
+        resampler: Optional[ResampleStage] = None,
+        stages: Optional[List[AudioStage]] = None,
+        sample_rate: Optional[int] = None,
+    ):
+        """初始化流水线.
+
+        Args:
+            frame_size: 目标采样率下每帧的采样点数
+            resampler: 重采样阶段，设备采样率与目标一致时为None
+            stages: 按顺序执行的逐帧处理阶段
+            sample_rate: 目标采样率，用于换算每帧的采集时间
+        """
+        self.frame_size = frame_size
+        self.sample_rate = sample_rate
+        self.resampler = resampler
+        self.stages = list(stages or [])
+        self._assembler = FrameAssembler(frame_size)
+        self._reset_requested = threading.Event()
+
+        names = ([resampler.name] if resampler else []) + [s.name for s in self.stages]
+        self._timings = {name: LatencyHistogram(STAGE_BOUNDS_MS) for name in names}
+        self._total_timing = LatencyHistogram(STAGE_BOUNDS_MS)
+        self.frames_processed = 0
+
+        # 当前处理帧第一个采样的采集时间（time.monotonic时基），未知时为None
+        self.frame_time = None
+
+    @property
+    def stage_names(self) -> list:
+        return list(self._timings)
+
+    def process_block(self, block: np.ndarray, end_time: Optional[float] = None):
+        """处理一块设备采样率的录音数据，可能产生零帧或多帧.
+
+        Args:
+            block: 设备采样率的int16数据
+            end_time: 该块末尾的采集时间，用于推算每帧的采集时间
+        """
+        if self._reset_requested.is_set():
+            self._reset_requested.clear()
+            self._reset()
+
+        if self.resampler is not None:
+            started = time.perf_counter()
+            block = self.resampler.process(block)
+            self._timings[self.resampler.name].observe(
+                (time.perf_counter() - started) * 1000
+            )
+        if len(block) == 0:
+            return
+        self._assembler.push(block)
+
+        while (frame := self._assembler.pop_frame()) is not None:
+            if end_time is not None and self.sample_rate:
+                # 帧之后还未取出的采样点都晚于该帧
+                pending = len(self._assembler) + self.frame_size
+                self.frame_time = end_time - pending / self.sample_rate
+            else:
+                self.frame_time = None
+            self._process_frame(frame)
+
+        for stage in self.stages:
+            stage.flush()
+
+    def _process_frame(self, frame: np.ndarray):
+        frame_started = time.perf_counter()
+        for stage in self.stages:
+            started = time.perf_counter()
+            try:
+                frame = stage.process(frame)
+            except Exception as e:
+                logger.error(f"录音处理阶段 {stage.name} 出错: {e}")
+            finally:
+                self._timings[stage.name].observe(
+                    (time.perf_counter() - started) * 1000
+                )
+            if frame is None:
+                break
+        self._total_timing.observe((time.perf_counter() - frame_started) * 1000)
+        self.frames_processed += 1
+
+    def request_reset(self):
+        """
+        请求丢弃未成帧的数据和各阶段缓存（可从任意线程调用）.
+        """
+        self._reset_requested.set()
+
+    def _reset(self):
+        self._assembler.clear()
+        if self.resampler is not None:
+            self.resampler.reset()
+        for stage in self.stages:
+            stage.reset()
+
+    def close(self):
+        """
+        释放各阶段资源.
+        """
+        for stage in self.stages:
+            try:
+                stage.close()
+            except Exception as e:
+                logger.warning(f"关闭录音处理阶段 {stage.name} 失败: {e}")
+
+    def get_stats(self) -> dict:
+        """
+        获取各阶段耗时统计.
+        """
+        return {
+            "stages": self.stage_names,
+            "frames_processed": self.frames_processed,
+            "frame_total": self._total_timing.snapshot(),
+            "stage_timing": {
+                name: histogram.snapshot() for name, histogram in self._timings.items()
+            },
+        }
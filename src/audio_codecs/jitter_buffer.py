@@ -0,0 +1,223 @@
+"""下行音频抖动缓冲区.
+
+在Opus解码之前缓存收到的音频包，按目标播放延迟预缓冲，并根据
+到达间隔的抖动自适应调整目标延迟。上游确认丢失的帧交给解码器用
+FEC/PLC补偿；数据暂时耗尽时只等待、不合成补偿帧，说话结束不会
+带出一段PLC尾音。
+"""
+
+from collections import deque
+from typing import Optional, Tuple
+
+# next_frame返回的动作类型
+FRAME_PACKET = "packet"
+FRAME_CONCEAL = "conceal"
+
+
+class JitterBuffer:
+    """自适应抖动缓冲区.
+
+    只在事件循环线程中使用。队列中的元素为Opus数据包，
+    None表示上游确认丢失的帧。
+    """
+
+    def __init__(
+        self,
+        frame_duration_ms: int,
+        target_delay_ms: int = 120,
+        min_delay_ms: int = 60,
+        max_delay_ms: int = 600,
+        max_hold_ms: int = 120,
+    ):
+        """初始化抖动缓冲区.
+
+        Args:
+            frame_duration_ms: 每个数据包的时长（毫秒）
+            target_delay_ms: 初始目标播放延迟（毫秒）
+            min_delay_ms: 目标延迟下限（毫秒）
+            max_delay_ms: 目标延迟上限（毫秒）
+            max_hold_ms: 播放中数据耗尽后等待后续数据包的时长（毫秒），
+                超过后视为说话结束
+        """
+        self.frame_duration_ms = frame_duration_ms
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max(max_delay_ms, min_delay_ms)
+        self.base_delay_ms = self._clamp(target_delay_ms)
+        self.target_delay_ms = self.base_delay_ms
+        self.max_hold = max(max_hold_ms, frame_duration_ms) / 1000
+
+        self._packets = deque()
+        self._playing = False
+        self._buffering_since = None
+        # 播放中数据耗尽的时间；等待期间有包到达才算欠载，
+        # 等待超时仍无数据视为说话结束
+        self._starved_since = None
+        # 当前这段说话中的欠载次数，欠载后重新预缓冲不算新的一段
+        self._segment_underruns = 0
+        self._rebuffering = False
+
+        # 到达抖动估计（RFC 3550风格的指数平滑）
+        self._last_arrival = None
+        self._jitter_ms = 0.0
+        self._underrun_bias_ms = 0
+
+        # 统计信息
+        self.received = 0
+        self.underruns = 0
+        self.concealed = 0
+        self.lost = 0
+
+    def _clamp(self, delay_ms) -> int:
+        return int(min(max(delay_ms, self.min_delay_ms), self.max_delay_ms))
+
+    def __len__(self) -> int:
+        return len(self._packets)
+
+    @property
+    def is_idle(self) -> bool:
+        """
+        既没有待播放的包也不在播放中.
+        """
+        return not self._playing and not self._packets
+
+    def put(self, payload: bytes, arrival: float):
+        """放入一个收到的数据包.
+
+        Args:
+            payload: Opus数据包
+            arrival: 到达时间（time.monotonic秒）
+        """
+        self.received += 1
+        self._update_jitter(arrival)
+
+        if self._starved_since is not None:
+            # 播放中途断流后数据才到达，说明目标延迟不足：
+            # 加大欠载偏置并重新预缓冲到目标延迟
+            self._starved_since = None
+            self.underruns += 1
+            self._segment_underruns += 1
+            self._underrun_bias_ms = min(
+                self._underrun_bias_ms + self.frame_duration_ms,
+                self.max_delay_ms,
+            )
+            self._playing = False
+            self._rebuffering = True
+
+        if not self._playing and self._buffering_since is None:
+            self._buffering_since = arrival
+
+        self._packets.append(payload)
+
+    def put_lost(self, count: int = 1):
+        """
+        记录上游确认丢失的帧，播放到该位置时进行补偿.
+        """
+        if count <= 0:
+            return
+        self.lost += count
+        if self._playing or self._packets:
+            self._packets.extend([None] * count)
+
+    def _update_jitter(self, arrival: float):
+        if self._last_arrival is not None:
+            spacing_ms = (arrival - self._last_arrival) * 1000
+            # 说话间隙不计入抖动
+            if spacing_ms < self.max_delay_ms * 4:
+                deviation = abs(spacing_ms - self.frame_duration_ms)
+                self._jitter_ms += (deviation - self._jitter_ms) / 16
+        self._last_arrival = arrival
+
+    def _start_playout(self):
+        """
+        开始一段播放时按当前抖动估计更新目标延迟.
+        """
+        self._playing = True
+        self._buffering_since = None
+        if not self._rebuffering:
+            self._segment_underruns = 0
+        self._rebuffering = False
+        self.target_delay_ms = self._clamp(
+            max(self.base_delay_ms, 3 * self._jitter_ms) + self._underrun_bias_ms
+        )
+
+    def next_frame(
+        self, buffered_ms: float, now: float
+    ) -> Optional[Tuple[str, Optional[bytes]]]:
+        """取出下一帧的播放动作.
+
+        Args:
+            buffered_ms: 播放缓冲区中尚未播放的时长（毫秒）
+            now: 当前时间（time.monotonic秒）
+
+        Returns:
+            None表示暂不播放；(FRAME_PACKET, 数据包)表示正常解码；
+            (FRAME_CONCEAL, 下一个数据包或None)表示补偿，
+            有下一个数据包时可用其FEC信息恢复当前帧。
+        """
+        if not self._playing:
+            if not self._packets:
+                return None
+            queued_ms = buffered_ms + len(self._packets) * self.frame_duration_ms
+            waited_ms = (now - self._buffering_since) * 1000
+            if queued_ms < self.target_delay_ms and waited_ms < self.target_delay_ms:
+                return None
+            self._start_playout()
+
+        if self._packets:
+            self._starved_since = None
+            payload = self._packets.popleft()
+            if payload is not None:
+                return FRAME_PACKET, payload
+            self.concealed += 1
+            next_payload = self._packets[0] if self._packets else None
+            return FRAME_CONCEAL, next_payload
+
+        # 播放缓冲区还有数据时继续等待数据包
+        if buffered_ms > 0:
+            return None
+
+        # 播放已经断流：不合成补偿帧，等待后续数据包
+        if self._starved_since is None:
+            self._starved_since = now
+            return None
+        if now - self._starved_since < self.max_hold:
+            return None
+
+        # 等待超时仍无数据，视为说话结束，停止播放并重新预缓冲
+        self._playing = False
+        self._starved_since = None
+        # 整段说话没有欠载时欠载偏置回落一帧
+        if self._segment_underruns == 0:
+            self._underrun_bias_ms = max(
+                0, self._underrun_bias_ms - self.frame_duration_ms
+            )
+        return None
+
+    def clear(self) -> int:
+        """
+        清空缓冲区并回到预缓冲状态，返回丢弃的包数.
+        """
+        discarded = sum(1 for p in self._packets if p is not None)
+        self._packets.clear()
+        self._playing = False
+        self._buffering_since = None
+        self._starved_since = None
+        self._rebuffering = False
+        self._last_arrival = None
+        # 欠载偏置逐步回落
+        self._underrun_bias_ms //= 2
+        return discarded
+
+    def get_stats(self) -> dict:
+        """
+        获取统计信息.
+        """
+        return {
+            "received": self.received,
+            "underruns": self.underruns,
+            "concealed": self.concealed,
+            "lost": self.lost,
+            "queued": len(self._packets),
+            "jitter_ms": round(self._jitter_ms, 2),
+            "target_delay_ms": self.target_delay_ms,
+        }
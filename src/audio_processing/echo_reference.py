@@ -0,0 +1,392 @@
+"""回声消除参考信号.
+
+播放回调把实际送往声卡的采样连同播放时间写入参考环形缓冲区，录音处理
+线程按每帧的采集时间取出同一时刻播放的参考信号，并重采样到录音采样率：
+    - PlaybackReference：带时间戳的参考环形缓冲区，写入O(1)且不分配数组
+    - DelayEstimator：GCC-PHAT互相关估计时间戳之外的剩余延迟（声学路径、
+      驱动报告不准的缓冲延迟等）
+    - EchoAligner：维护录音历史，周期性估计延迟，为每帧给出对齐后的参考信号
+"""
+
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from src.audio_codecs.audio_buffers import StreamClock
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class PlaybackReference:
+    """带时间戳的播放参考环形缓冲区.
+
+    单生产者（播放回调）写入，单消费者（录音处理线程）按时间读取。
+    读取时用预计算的加窗sinc权重把播放采样率的数据插值到录音采样率，
+    读取位置按整数源采样点量化，权重矩阵因此可以只计算一次。
+    """
+
+    def __init__(
+        self,
+        source_rate: int,
+        target_rate: int,
+        frame_size: int,
+        duration_ms: int = 2000,
+        half_taps: int = 16,
+    ):
+        """初始化参考缓冲区.
+
+        Args:
+            source_rate: 播放采样率
+            target_rate: 录音处理采样率
+            frame_size: 每次插值的目标采样点数（一帧）
+            duration_ms: 保留的播放历史时长
+            half_taps: 插值滤波器单侧长度（源采样点）
+        """
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.frame_size = frame_size
+        self.clock = StreamClock(source_rate)
+
+        self._capacity = source_rate * duration_ms // 1000
+        self._buffer = np.zeros(self._capacity, dtype=np.int16)
+        self._write_pos = 0
+
+        # 每帧对应的源采样点数，10ms帧在常见采样率下都是整数
+        self._ratio = source_rate / target_rate
+        self._source_step = round(frame_size * self._ratio)
+
+        offsets = np.arange(frame_size) * self._ratio
+        base = np.floor(offsets).astype(np.int64)
+        taps = np.arange(-half_taps + 1, half_taps + 1)
+        distance = taps[None, :] - (offsets - base)[:, None]
+        cutoff = min(1.0, 1 / self._ratio)
+        window = 0.5 * (1 + np.cos(np.pi * np.clip(distance / half_taps, -1, 1)))
+        weights = cutoff * np.sinc(cutoff * distance) * window
+        self._weights = (weights / weights.sum(axis=1, keepdims=True)).astype(
+            np.float32
+        )
+        # 下标相对于读取片段的起点（帧起点前half_taps-1个源采样点）
+        self._lead = half_taps - 1
+        self._indices = base[:, None] + taps[None, :] + self._lead
+        self._segment = np.zeros(int(self._indices.max()) + 1, dtype=np.float32)
+        self._gather = np.zeros(self._indices.shape, dtype=np.float32)
+        self._result = np.zeros(frame_size, dtype=np.float32)
+
+    def write(self, samples: np.ndarray, play_time: float):
+        """写入一块刚送往声卡的采样（播放回调调用）.
+
+        Args:
+            samples: 一维int16采样，长度不超过缓冲区容量
+            play_time: 第一个采样的播放时间（time.monotonic时基）
+        """
+        count = len(samples)
+        write_pos = self._write_pos
+        start = write_pos % self._capacity
+        first = min(count, self._capacity - start)
+        self._buffer[start : start + first] = samples[:first]
+        if count > first:
+            self._buffer[: count - first] = samples[first:count]
+        self._write_pos = write_pos + count
+        self.clock.mark(write_pos, play_time)
+
+    def read(self, start_time: float, out: np.ndarray) -> bool:
+        """读取从start_time开始播放的参考信号（录音处理线程调用）.
+
+        Args:
+            start_time: 第一个采样的时间（time.monotonic时基）
+            out: int16目标数组，长度为frame_size的整数倍
+
+        Returns:
+            bool: 参考信号是否有声音；没有时out填充静音
+        """
+        position = self.clock.position_at(start_time)
+        if position is None:
+            out[:] = 0
+            return False
+
+        active = False
+        source_pos = int(round(position)) - self._lead
+        for start in range(0, len(out), self.frame_size):
+            target = out[start : start + self.frame_size]
+            if self._copy_segment(source_pos):
+                np.take(self._segment, self._indices, out=self._gather)
+                self._gather *= self._weights
+                np.sum(self._gather, axis=1, out=self._result)
+                np.clip(self._result, -32768, 32767, out=self._result)
+                np.rint(self._result, out=self._result)
+                target[:] = self._result
+                active = True
+            else:
+                target[:] = 0
+            source_pos += self._source_step
+        return active
+
+    def _copy_segment(self, source_pos: int) -> bool:
+        """
+        把[source_pos, source_pos+片段长)的源采样复制到插值片段，不可用的部分补零.
+        """
+        segment = self._segment
+        write_pos = self._write_pos
+        # 留出一个回调的余量，避免读到正在被覆盖的数据
+        oldest = write_pos - self._capacity + self._source_step
+        begin = max(source_pos, oldest)
+        end = min(source_pos + len(segment), write_pos)
+        if begin >= end:
+            return False
+
+        segment[:] = 0
+        offset = begin - source_pos
+        count = end - begin
+        start = begin % self._capacity
+        first = min(count, self._capacity - start)
+        segment[offset : offset + first] = self._buffer[start : start + first]
+        if count > first:
+            segment[offset + first : offset + count] = self._buffer[: count - first]
+        return bool(segment.any())
+
+
+class DelayEstimator:
+    """GCC-PHAT回声延迟估计器.
+
+    在参考信号的[-max_lead, max_delay]延迟范围内求录音与参考的相位变换
+    加权互相关峰值。峰值显著高于其余相关值时才接受，连续估计取中位数，
+    避免双讲或噪声造成的单次误判。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        window_ms: int = 400,
+        max_delay_ms: int = 250,
+        max_lead_ms: int = 50,
+        min_confidence: float = 8.0,
+        history: int = 3,
+    ):
+        self.sample_rate = sample_rate
+        self.window = sample_rate * window_ms // 1000
+        self.max_delay = sample_rate * max_delay_ms // 1000
+        self.max_lead = sample_rate * max_lead_ms // 1000
+        self.reference_length = self.window + self.max_delay + self.max_lead
+        self.min_confidence = min_confidence
+
+        total = self.window + self.reference_length
+        self.fft_size = 1 << (total - 1).bit_length()
+        self._recent = deque(maxlen=history)
+
+        # 当前采用的延迟（采样点，正值表示回声晚于时间戳）
+        self.delay = 0
+        self.confidence = 0.0
+        self.estimates = 0
+        self.rejected = 0
+
+    def reset(self):
+        self._recent.clear()
+        self.delay = 0
+        self.confidence = 0.0
+
+    def estimate(self, capture: np.ndarray, reference: np.ndarray) -> Optional[int]:
+        """估计一次延迟并更新平滑结果.
+
+        Args:
+            capture: 录音窗口，长度window
+            reference: 参考窗口，长度reference_length，
+                起点比录音窗口早max_delay个采样点
+
+        Returns:
+            本次接受的延迟（采样点），置信度不足时返回None
+        """
+        capture_spectrum = np.fft.rfft(capture, self.fft_size)
+        reference_spectrum = np.fft.rfft(reference, self.fft_size)
+        cross = reference_spectrum * np.conj(capture_spectrum)
+        magnitude = np.abs(cross)
+        cross /= magnitude + 1e-3 * float(magnitude.mean()) + 1e-12
+
+        # corr[k] = sum(capture[n] * reference[n + k])，k = max_delay - 延迟
+        corr = np.fft.irfft(cross, self.fft_size)[: self.max_delay + self.max_lead + 1]
+        peak = int(np.argmax(corr))
+        rms = float(np.sqrt(np.mean(corr**2)))
+        self.confidence = float(corr[peak]) / rms if rms > 0 else 0.0
+
+        self.estimates += 1
+        if self.confidence < self.min_confidence:
+            self.rejected += 1
+            return None
+
+        lag = self.max_delay - peak
+        self._recent.append(lag)
+        tolerance = self.sample_rate // 500
+        if len(self._recent) >= 2 and (
+            len(self._recent) == self._recent.maxlen
+            or abs(self._recent[-1] - self._recent[-2]) <= tolerance
+        ):
+            new_delay = int(np.median(self._recent))
+            if abs(new_delay - self.delay) > tolerance:
+                logger.info(
+                    f"回声延迟更新: {self.delay * 1000 / self.sample_rate:.1f}ms -> "
+                    f"{new_delay * 1000 / self.sample_rate:.1f}ms"
+                )
+            self.delay = new_delay
+        return lag
+
+
+class EchoAligner:
+    """按录音帧的采集时间给出对齐后的参考信号.
+
+    每帧只做一次O(帧长)的历史写入和一次插值读取；延迟估计每隔
+    estimate_interval_ms执行一次，且只在最近有播放时进行。
+    """
+
+    def __init__(
+        self,
+        reference: PlaybackReference,
+        frame_size: int,
+        sample_rate: int = 16000,
+        estimator: Optional[DelayEstimator] = None,
+        estimate_interval_ms: int = 1000,
+        safety_margin_ms: int = 5,
+    ):
+        """初始化对齐器.
+
+        Args:
+            reference: 播放参考缓冲区
+            frame_size: 录音帧采样点数
+            sample_rate: 录音采样率
+            estimator: 延迟估计器，为None时只按时间戳对齐
+            estimate_interval_ms: 延迟估计间隔
+            safety_margin_ms: 参考信号相对估计延迟提前的时长，
+                保证回声路径对自适应滤波器是因果的
+        """
+        self.reference = reference
+        self.frame_size = frame_size
+        self.sample_rate = sample_rate
+        self.estimator = estimator
+        self.safety_margin = sample_rate * safety_margin_ms / 1000
+
+        self._frame_reference = np.zeros(frame_size, dtype=np.int16)
+        self._estimate_interval = max(
+            1, estimate_interval_ms * sample_rate // (1000 * frame_size)
+        )
+        self._frames_since_estimate = 0
+        self._active_frames = 0
+
+        if estimator is not None:
+            # 录音历史多保留max_lead，保证参考窗口的末尾已经播放
+            self._history = np.zeros(
+                estimator.window + estimator.max_lead, dtype=np.int16
+            )
+            self._capture_window = np.zeros(estimator.window, dtype=np.float32)
+            self._reference_window = np.zeros(
+                -(-estimator.reference_length // frame_size) * frame_size,
+                dtype=np.int16,
+            )
+        self._history_pos = 0
+
+        # 统计信息
+        self.frames = 0
+        self.reference_frames = 0
+
+    def reset(self):
+        self._history_pos = 0
+        self._frames_since_estimate = 0
+        self._active_frames = 0
+        if self.estimator is not None:
+            self.estimator.reset()
+
+    def align(self, capture: np.ndarray, frame_time: Optional[float]):
+        """给出与一帧录音对齐的参考信号.
+
+        Args:
+            capture: 原始录音帧（int16，未经回声消除）
+            frame_time: 该帧第一个采样的采集时间，未知时返回None
+
+        Returns:
+            对齐后的int16参考帧（内部缓冲区，下一次调用前有效），
+            没有播放时返回None
+        """
+        self.frames += 1
+        if frame_time is None:
+            return None
+
+        if self.estimator is not None:
+            self._push_history(capture, frame_time)
+
+        # 参考帧与录音帧等长，录音帧比构造时的帧长更长时扩大缓冲区
+        count = len(capture)
+        if len(self._frame_reference) < count:
+            step = self.reference.frame_size
+            self._frame_reference = np.zeros(-(-count // step) * step, dtype=np.int16)
+        frame_reference = self._frame_reference[:count]
+
+        delay = (self.estimator.delay if self.estimator else 0) - self.safety_margin
+        active = self.reference.read(
+            frame_time - delay / self.sample_rate, frame_reference
+        )
+        if not active:
+            return None
+        self.reference_frames += 1
+        self._active_frames += 1
+        return frame_reference
+
+    def _push_history(self, capture: np.ndarray, frame_time: float):
+        history = self._history
+        count = len(capture)
+        start = self._history_pos % len(history)
+        first = min(count, len(history) - start)
+        history[start : start + first] = capture[:first]
+        if count > first:
+            history[: count - first] = capture[first:count]
+        self._history_pos += count
+
+        self._frames_since_estimate += 1
+        if (
+            self._frames_since_estimate >= self._estimate_interval
+            and self._history_pos >= len(history)
+        ):
+            if self._active_frames:
+                end_time = frame_time + count / self.sample_rate
+                self._run_estimate(end_time)
+            self._frames_since_estimate = 0
+            self._active_frames = 0
+
+    def _run_estimate(self, history_end_time: float):
+        estimator = self.estimator
+        history = self._history
+
+        # 历史按时间顺序展开，取前window个采样点作为录音窗口
+        start = self._history_pos % len(history)
+        first = min(estimator.window, len(history) - start)
+        self._capture_window[:first] = history[start : start + first]
+        if estimator.window > first:
+            self._capture_window[first:] = history[: estimator.window - first]
+
+        capture_start = history_end_time - len(history) / self.sample_rate
+        reference_start = capture_start - estimator.max_delay / self.sample_rate
+        if not self.reference.read(reference_start, self._reference_window):
+            return
+        try:
+            estimator.estimate(
+                self._capture_window,
+                self._reference_window[: estimator.reference_length],
+            )
+        except Exception as e:
+            logger.warning(f"回声延迟估计失败: {e}")
+
+    def get_stats(self) -> dict:
+        stats = {
+            "frames": self.frames,
+            "reference_frames": self.reference_frames,
+        }
+        if self.estimator is not None:
+            stats.update(
+                {
+                    "delay_ms": round(
+                        self.estimator.delay * 1000 / self.sample_rate, 1
+                    ),
+                    "confidence": round(self.estimator.confidence, 1),
+                    "estimates": self.estimator.estimates,
+                    "rejected": self.estimator.rejected,
+                }
+            )
+        return stats
@@ -0,0 +1,215 @@
+"""纯NumPy实现的回声消除和噪声抑制.
+
+在无法加载WebRTC APM动态库的平台（如Linux ARM）上作为WebRTCProcessor的后备实现：
+    - 回声消除：分块频域自适应滤波器（PBFDAF，overlap-save），按参考信号功率
+      归一化步长并施加梯度约束
+    - 噪声抑制：决策导向的维纳滤波谱减，最小值跟踪估计噪声谱
+
+所有运算都在预分配的数组上向量化完成，每10ms帧只有少量FFT。
+"""
+
+import numpy as np
+
+
+class FrequencyDomainEchoCanceller:
+    """
+    分块频域自适应回声消除器.
+    """
+
+    def __init__(
+        self,
+        block_size: int = 160,
+        tail_ms: int = 200,
+        sample_rate: int = 16000,
+        step_size: float = 1.0,
+    ):
+        """初始化回声消除器.
+
+        Args:
+            block_size: 每次处理的采样点数（一帧）
+            tail_ms: 可消除的回声尾长（毫秒）
+            sample_rate: 采样率
+            step_size: 归一化步长（0-2，越大收敛越快、双讲时越不稳定）
+        """
+        self.block_size = block_size
+        self.partitions = max(1, -(-tail_ms * sample_rate // (1000 * block_size)))
+        self.step_size = step_size
+        self.fft_size = 2 * block_size
+        bins = block_size + 1
+
+        self._weights = np.zeros((self.partitions, bins), dtype=np.complex128)
+        self._ref_spectra = np.zeros((self.partitions, bins), dtype=np.complex128)
+        self._ref_block = np.zeros(self.fft_size, dtype=np.float64)
+        self._err_block = np.zeros(self.fft_size, dtype=np.float64)
+        self._ref_power = np.zeros(bins, dtype=np.float64)
+
+        # 参考信号低于该功率（每采样点）时不更新滤波器
+        self._min_ref_power = 1e2
+        self._regularization = 1e3 * self.fft_size
+
+    def reset(self):
+        self._weights[:] = 0
+        self._ref_spectra[:] = 0
+        self._ref_block[:] = 0
+        self._ref_power[:] = 0
+
+    def process(self, near: np.ndarray, far: np.ndarray) -> np.ndarray:
+        """处理一块数据.
+
+        Args:
+            near: 麦克风采样（float64，长度block_size）
+            far: 与麦克风对齐的扬声器参考采样（float64，长度block_size）
+
+        Returns:
+            去除回声后的采样（float64）
+        """
+        n = self.block_size
+
+        # 参考信号频谱：最近两块拼成一个FFT窗口
+        self._ref_block[:n] = self._ref_block[n:]
+        self._ref_block[n:] = far
+        ref_spectrum = np.fft.rfft(self._ref_block)
+        self._ref_spectra[1:] = self._ref_spectra[:-1]
+        self._ref_spectra[0] = ref_spectrum
+
+        # 回声估计（overlap-save取后半段）
+        echo_spectrum = np.einsum("pk,pk->k", self._weights, self._ref_spectra)
+        echo = np.fft.irfft(echo_spectrum, self.fft_size)[n:]
+        error = near - echo
+
+        # 参考信号功率谱平滑，用于归一化步长
+        self._ref_power *= 0.9
+        self._ref_power += 0.1 * (ref_spectrum.real**2 + ref_spectrum.imag**2)
+
+        far_power = float(np.dot(far, far)) / n
+        if far_power > self._min_ref_power:
+            self._err_block[n:] = error
+            error_spectrum = np.fft.rfft(self._err_block)
+            scale = self.step_size / (
+                self.partitions * self._ref_power + self._regularization
+            )
+            self._weights += np.conj(self._ref_spectra) * (error_spectrum * scale)
+
+            # 梯度约束：把各分块的时域响应截断到前半窗口，避免循环卷积混叠
+            impulse = np.fft.irfft(self._weights, self.fft_size, axis=1)
+            impulse[:, n:] = 0
+            self._weights[:] = np.fft.rfft(impulse, axis=1)
+
+            # 发散保护：残差明显大于麦克风信号时收缩滤波器
+            if float(np.dot(error, error)) > 4 * float(np.dot(near, near)) + 1e6:
+                self._weights *= 0.5
+
+        return error
+
+
+class SpectralNoiseSuppressor:
+    """决策导向维纳滤波噪声抑制器.
+
+    使用50%重叠的sqrt-Hann窗分析/合成，输出比输入延迟一块。
+    """
+
+    def __init__(self, block_size: int = 160, gain_floor_db: float = -20.0):
+        self.block_size = block_size
+        self.fft_size = 2 * block_size
+        bins = block_size + 1
+        self.gain_floor = 10 ** (gain_floor_db / 20)
+
+        self._window = np.sqrt(np.hanning(self.fft_size + 1)[:-1])
+        self._frame = np.zeros(self.fft_size, dtype=np.float64)
+        self._overlap = np.zeros(block_size, dtype=np.float64)
+        self._noise = None
+        self._smoothed = np.zeros(bins, dtype=np.float64)
+        self._prev_clean = np.zeros(bins, dtype=np.float64)
+
+    def reset(self):
+        self._frame[:] = 0
+        self._overlap[:] = 0
+        self._noise = None
+        self._smoothed[:] = 0
+        self._prev_clean[:] = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        n = self.block_size
+        self._frame[:n] = self._frame[n:]
+        self._frame[n:] = samples
+
+        spectrum = np.fft.rfft(self._frame * self._window)
+        power = spectrum.real**2 + spectrum.imag**2 + 1e-6
+
+        # 最小值跟踪：快降慢升
+        self._smoothed *= 0.8
+        self._smoothed += 0.2 * power
+        if self._noise is None:
+            self._noise = self._smoothed.copy()
+        else:
+            np.minimum(self._noise * 1.005, self._smoothed, out=self._noise)
+            np.maximum(self._noise, 1e-6, out=self._noise)
+
+        # 决策导向的先验信噪比与维纳增益
+        posterior = power / self._noise
+        prior = 0.98 * self._prev_clean / self._noise + 0.02 * np.maximum(
+            posterior - 1, 0
+        )
+        gain = np.maximum(prior / (1 + prior), self.gain_floor)
+        self._prev_clean = gain**2 * power
+
+        output = np.fft.irfft(spectrum * gain, self.fft_size) * self._window
+        result = self._overlap + output[:n]
+        self._overlap[:] = output[n:]
+        return result
+
+
+class NumpyAudioProcessor:
+    """
+    回声消除+噪声抑制的组合，接口与WebRTC APM的单帧处理一致.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_size: int = 160,
+        enable_aec: bool = True,
+        enable_ns: bool = True,
+        tail_ms: int = 200,
+    ):
+        self.frame_size = frame_size
+        self.aec = (
+            FrequencyDomainEchoCanceller(frame_size, tail_ms, sample_rate)
+            if enable_aec
+            else None
+        )
+        self.ns = SpectralNoiseSuppressor(frame_size) if enable_ns else None
+        self._near = np.zeros(frame_size, dtype=np.float64)
+        self._far = np.zeros(frame_size, dtype=np.float64)
+        self._output = np.zeros(frame_size, dtype=np.int16)
+
+    def reset(self):
+        if self.aec:
+            self.aec.reset()
+        if self.ns:
+            self.ns.reset()
+
+    def process(self, near: np.ndarray, far=None) -> np.ndarray:
+        """处理一帧.
+
+        Args:
+            near: 麦克风int16采样
+            far: 对齐后的扬声器参考int16采样，没有播放时为None
+
+        Returns:
+            处理后的int16采样（内部缓冲区，下一次调用前有效）
+        """
+        self._near[:] = near
+        samples = self._near
+        if self.aec is not None:
+            if far is None:
+                self._far[:] = 0
+            else:
+                self._far[:] = far
+            samples = self.aec.process(samples, self._far)
+        if self.ns is not None:
+            samples = self.ns.process(samples)
+
+        np.clip(samples, -32768, 32767, out=samples)
+        self._output[:] = samples
+        return self._output
@@ -0,0 +1,185 @@
+"""语音门控.
+
+在唤醒词识别器之前按帧判断是否可能有语音，静音时不调用识别器，
+降低常驻监听时的CPU占用。门打开时先补发预滚动缓存的帧，避免截掉
+唤醒词开头；语音结束后保持一段拖尾时间再关闭。
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+from src.utils.logging_config import get_logger
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+logger = get_logger(__name__)
+
+# 门控模式
+GATE_OFF = "off"
+GATE_ENERGY = "energy"
+GATE_WEBRTCVAD = "webrtcvad"
+
+
+class SpeechGate:
+    """带预滚动和拖尾的语音门控.
+
+    energy模式使用自适应噪声底的帧能量判决；webrtcvad模式把每帧切分为
+    30ms子帧交给webrtcvad，任一子帧为语音即判为语音。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        frame_duration_ms: int,
+        mode: str = GATE_ENERGY,
+        margin_db: float = 8.0,
+        min_db: float = -55.0,
+        pre_roll_ms: int = 400,
+        hangover_ms: int = 600,
+        vad_aggressiveness: int = 2,
+    ):
+        """初始化语音门控.
+
+        Args:
+            sample_rate: 采样率
+            frame_duration_ms: 每帧时长（毫秒）
+            mode: 门控模式，off/energy/webrtcvad
+            margin_db: energy模式下高出噪声底多少分贝判为语音
+            min_db: energy模式下判为语音的最低电平（dBFS）
+            pre_roll_ms: 门打开时补发的历史音频时长（毫秒）
+            hangover_ms: 最后一帧语音之后保持打开的时长（毫秒）
+            vad_aggressiveness: webrtcvad的激进程度（0-3）
+        """
+        if mode == GATE_WEBRTCVAD and webrtcvad is None:
+            logger.warning("未安装webrtcvad，语音门控改用能量判决")
+            mode = GATE_ENERGY
+        if mode not in (GATE_OFF, GATE_ENERGY, GATE_WEBRTCVAD):
+            logger.warning(f"未知的语音门控模式: {mode}，改用能量判决")
+            mode = GATE_ENERGY
+
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.hangover_frames = max(0, math.ceil(hangover_ms / frame_duration_ms))
+        self._pre_roll = deque(maxlen=max(0, math.ceil(pre_roll_ms / frame_duration_ms)))
+
+        self._vad = None
+        if mode == GATE_WEBRTCVAD:
+            self._vad = webrtcvad.Vad(int(min(max(vad_aggressiveness, 0), 3)))
+            self._vad_subframe = sample_rate * 30 // 1000
+
+        self._noise_floor_db = None
+        self._hangover_left = 0
+        self._open = mode == GATE_OFF
+
+        # 统计信息
+        self.total_frames = 0
+        self.passed_frames = 0
+        self.open_count = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._open
+
+    def _frame_db(self, frame: np.ndarray) -> float:
+        samples = frame.astype(np.float32)
+        rms = math.sqrt(float(np.dot(samples, samples)) / max(len(samples), 1))
+        return 20 * math.log10(rms / 32768 + 1e-10)
+
+    def _is_speech_energy(self, frame: np.ndarray) -> bool:
+        level_db = self._frame_db(frame)
+        if self._noise_floor_db is None:
+            self._noise_floor_db = level_db
+
+        speech = (
+            level_db >= self.min_db and level_db > self._noise_floor_db + self.margin_db
+        )
+        # 噪声底快降慢升，语音期间不更新
+        if level_db < self._noise_floor_db:
+            self._noise_floor_db += (level_db - self._noise_floor_db) * 0.2
+        elif not speech:
+            self._noise_floor_db += (level_db - self._noise_floor_db) * 0.02
+        return speech
+
+    def _is_speech_vad(self, frame: np.ndarray) -> bool:
+        step = self._vad_subframe
+        for start in range(0, len(frame) - step + 1, step):
+            if self._vad.is_speech(frame[start : start + step].tobytes(), self.sample_rate):
+                return True
+        return False
+
+    def process(self, frame: np.ndarray) -> list:
+        """判决一帧.
+
+        Args:
+            frame: int16音频帧
+
+        Returns:
+            list: 应送入识别器的帧，门刚打开时包含预滚动缓存的帧
+        """
+        self.total_frames += 1
+        if self.mode == GATE_OFF:
+            self.passed_frames += 1
+            return [frame]
+
+        if self.mode == GATE_WEBRTCVAD:
+            speech = self._is_speech_vad(frame)
+        else:
+            speech = self._is_speech_energy(frame)
+
+        if speech:
+            self._hangover_left = self.hangover_frames
+            if not self._open:
+                self._open = True
+                self.open_count += 1
+                passed = list(self._pre_roll)
+                passed.append(frame)
+                self._pre_roll.clear()
+                self.passed_frames += len(passed)
+                return passed
+        elif self._open:
+            if self._hangover_left > 0:
+                self._hangover_left -= 1
+            else:
+                self._open = False
+
+        if self._open:
+            self.passed_frames += 1
+            return [frame]
+
+        self._pre_roll.append(frame)
+        return []
+
+    def reset(self):
+        """
+        关闭门并清空预滚动缓存，保留噪声底估计.
+        """
+        self._pre_roll.clear()
+        self._hangover_left = 0
+        self._open = self.mode == GATE_OFF
+
+    def get_stats(self) -> dict:
+        """
+        获取门控统计.
+        """
+        gated = self.total_frames - self.passed_frames
+        return {
+            "mode": self.mode,
+            "total_frames": self.total_frames,
+            "passed_frames": self.passed_frames,
+            "gated_fraction": (
+                round(gated / self.total_frames, 4) if self.total_frames else 0.0
+            ),
+            "open_count": self.open_count,
+            "noise_floor_db": (
+                round(self._noise_floor_db, 1)
+                if self._noise_floor_db is not None
+                else None
+            ),
+        }
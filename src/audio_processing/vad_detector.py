@@ -1,20 +1,26 @@
-import logging
+import asyncio
+import math
 import threading
-import time
 
 import numpy as np
-import pyaudio
-import webrtcvad
 
-from src.constants.constants import AbortReason, DeviceState
+from src.constants.constants import AbortReason, AudioConfig, DeviceState
+from src.utils.config_manager import ConfigManager
+from src.utils.logging_config import get_logger
 
-# 配置日志
-logger = logging.getLogger("VADDetector")
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+logger = get_logger(__name__)
 
 
 class VADDetector:
-    """
-    基于WebRTC VAD的语音活动检测器，用于检测用户打断.
+    """基于WebRTC VAD和能量的语音活动检测器，用于检测用户打断.
+
+    通过AudioCodec的录音分发队列读取已采集的帧，不再单独打开麦克风；
+    检测线程阻塞等待新帧，跨帧维护平滑能量，连续若干帧判为语音时触发打断。
     """
 
     def __init__(self, audio_codec, protocol, app_instance, loop):
@@ -31,16 +37,35 @@ class VADDetector:
         self.app = app_instance
         self.loop = loop
 
-        # VAD设置
-        self.vad = webrtcvad.Vad()
-        self.vad.set_mode(3)  # 设置最高灵敏度
+        config = ConfigManager.get_instance()
+
+        # VAD设置，未安装webrtcvad时只用能量判决
+        self.vad = None
+        if webrtcvad is not None:
+            self.vad = webrtcvad.Vad()
+            self.vad.set_mode(
+                config.get_config("AUDIO_OPTIONS.BARGE_IN_VAD_MODE", 3)
+            )
+        else:
+            logger.warning("未安装webrtcvad，打断检测只使用能量判决")
 
         # 参数设置
-        self.sample_rate = 16000
-        self.frame_duration = 20  # 毫秒
-        self.frame_size = int(self.sample_rate * self.frame_duration / 1000)
-        self.speech_window = 5  # 连续检测到多少帧语音才触发打断
-        self.energy_threshold = 300  # 能量阈值
+        self.sample_rate = AudioConfig.INPUT_SAMPLE_RATE
+        self.frame_duration = AudioConfig.FRAME_DURATION
+        # webrtcvad只接受10/20/30ms的帧，按20ms切分
+        self.vad_frame_size = self.sample_rate * 20 // 1000
+        # 连续检测到多少帧语音才触发打断
+        self.speech_window = max(
+            1, config.get_config("AUDIO_OPTIONS.BARGE_IN_FRAMES", 5)
+        )
+        # 平滑后的RMS能量阈值
+        self.energy_threshold = config.get_config(
+            "AUDIO_OPTIONS.BARGE_IN_ENERGY_THRESHOLD", 300
+        )
+        # 能量平滑系数，越大对新帧越敏感
+        self.energy_smoothing = config.get_config(
+            "AUDIO_OPTIONS.BARGE_IN_ENERGY_SMOOTHING", 0.5
+        )
 
         # 状态变量
         self.running = False
@@ -49,12 +74,16 @@ class VADDetector:
         self.speech_count = 0
         self.silence_count = 0
         self.triggered = False
+        self.energy = 0.0
 
-        # 创建独立的PyAudio实例和流，避免与主音频流冲突
-        self.pa = None
-        self.stream = None
+        # 录音分发队列
+        self._tap = None
 
-    def start(self):
+        # 统计信息
+        self.frames_processed = 0
+        self.interrupts = 0
+
+    async def start(self):
         """
         启动VAD检测器.
         """
@@ -64,26 +93,28 @@ class VADDetector:
 
         self.running = True
         self.paused = False
-
-        # 初始化PyAudio和流
-        self._initialize_audio_stream()
+        self._tap = self.audio_codec.create_input_tap(max_frames=50)
 
         # 启动检测线程
-        self.thread = threading.Thread(target=self._detection_loop, daemon=True)
+        self.thread = threading.Thread(
+            target=self._detection_loop, name="BargeInDetector", daemon=True
+        )
         self.thread.start()
         logger.info("VAD检测器已启动")
 
-    def stop(self):
+    async def stop(self):
         """
         停止VAD检测器.
         """
         self.running = False
 
-        # 关闭音频流
-        self._close_audio_stream()
+        if self._tap is not None:
+            self.audio_codec.remove_input_tap(self._tap)
 
         if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=1.0)
+            await asyncio.to_thread(self.thread.join, 1.0)
+        self.thread = None
+        self._tap = None
 
         logger.info("VAD检测器已停止")
 
@@ -100,9 +131,7 @@ class VADDetector:
         """
         self.paused = False
         # 重置状态
-        self.speech_count = 0
-        self.silence_count = 0
-        self.triggered = False
+        self._reset_state()
         logger.info("VAD检测器已恢复")
 
     def is_running(self):
@@ -111,62 +140,6 @@ class VADDetector:
         """
         return self.running and not self.paused
 
-    def _initialize_audio_stream(self):
-        """
-        初始化独立的音频流.
-        """
-        try:
-            # 创建PyAudio实例
-            self.pa = pyaudio.PyAudio()
-
-            # 获取默认输入设备
-            device_index = None
-            for i in range(self.pa.get_device_count()):
-                device_info = self.pa.get_device_info_by_index(i)
-                if device_info["maxInputChannels"] > 0:
-                    device_index = i
-                    break
-
-            if device_index is None:
-                logger.error("找不到可用的输入设备")
-                return False
-
-            # 创建输入流
-            self.stream = self.pa.open(
-                format=pyaudio.paInt16,
-                channels=1,
-                rate=self.sample_rate,
-                input=True,
-                input_device_index=device_index,
-                frames_per_buffer=self.frame_size,
-                start=True,
-            )
-
-            logger.info(f"VAD检测器音频流已初始化，使用设备索引: {device_index}")
-            return True
-
-        except Exception as e:
-            logger.error(f"初始化VAD音频流失败: {e}")
-            return False
-
-    def _close_audio_stream(self):
-        """
-        关闭音频流.
-        """
-        try:
-            if self.stream:
-                self.stream.stop_stream()
-                self.stream.close()
-                self.stream = None
-
-            if self.pa:
-                self.pa.terminate()
-                self.pa = None
-
-            logger.info("VAD检测器音频流已关闭")
-        except Exception as e:
-            logger.error(f"关闭VAD音频流失败: {e}")
-
     def _detection_loop(self):
         """
         VAD检测主循环.
@@ -174,82 +147,55 @@ class VADDetector:
         logger.info("VAD检测循环已启动")
 
         while self.running:
-            # 如果暂停或者音频流未初始化，则跳过
-            if self.paused or not self.stream:
-                time.sleep(0.1)
+            frames = self._tap.drain(1, timeout=0.5)
+            if not frames or not self.running:
+                continue
+
+            # 只在说话状态下进行检测，其余时间丢弃帧
+            if self.paused or self.app.device_state != DeviceState.SPEAKING:
+                self._reset_state()
                 continue
 
             try:
-                # 只在说话状态下进行检测
-                if self.app.device_state == DeviceState.SPEAKING:
-                    # 读取音频帧
-                    frame = self._read_audio_frame()
-                    if not frame:
-                        time.sleep(0.01)
-                        continue
-
-                    # 检测是否是语音
-                    is_speech = self._detect_speech(frame)
-
-                    # 如果检测到语音并且达到触发条件，处理打断
-                    if is_speech:
+                for frame in frames:
+                    if self.triggered:
+                        # 已触发打断，等待离开说话状态后重新开始检测
+                        break
+                    self.frames_processed += 1
+                    if self._detect_speech(frame):
                         self._handle_speech_frame(frame)
                     else:
                         self._handle_silence_frame(frame)
-                else:
-                    # 不在说话状态，重置状态
-                    self._reset_state()
-
             except Exception as e:
                 logger.error(f"VAD检测循环出错: {e}")
 
-            time.sleep(0.01)  # 小延迟，减少CPU使用
-
         logger.info("VAD检测循环已结束")
 
-    def _read_audio_frame(self):
-        """
-        读取一帧音频数据.
-        """
-        try:
-            if not self.stream or not self.stream.is_active():
-                return None
-
-            # 读取音频数据
-            data = self.stream.read(self.frame_size, exception_on_overflow=False)
-            return data
-        except Exception as e:
-            logger.error(f"读取音频帧失败: {e}")
-            return None
-
     def _detect_speech(self, frame):
         """
         检测是否是语音.
         """
-        try:
-            # 确保帧长度正确
-            if len(frame) != self.frame_size * 2:  # 16位音频，每个样本2字节
-                return False
-
-            # 使用VAD检测
-            is_speech = self.vad.is_speech(frame, self.sample_rate)
-
-            # 计算音频能量
-            audio_data = np.frombuffer(frame, dtype=np.int16)
-            energy = np.mean(np.abs(audio_data))
+        # 跨帧平滑的RMS能量
+        samples = frame.astype(np.float32)
+        rms = math.sqrt(float(np.dot(samples, samples)) / max(len(samples), 1))
+        self.energy += (rms - self.energy) * self.energy_smoothing
+        if self.energy <= self.energy_threshold:
+            return False
 
-            # 结合VAD和能量阈值
-            is_valid_speech = is_speech and energy > self.energy_threshold
+        if self.vad is None:
+            return True
 
-            if is_valid_speech:
+        # 任一20ms子帧判为语音即为语音
+        step = self.vad_frame_size
+        for start in range(0, len(frame) - step + 1, step):
+            chunk = frame[start : start + step].tobytes()
+            if self.vad.is_speech(chunk, self.sample_rate):
                 logger.debug(
-                    f"检测到语音 [能量: {energy:.2f}] [连续语音帧: {self.speech_count+1}]"
+                    f"检测到语音 [能量: {self.energy:.2f}] "
+                    f"[连续语音帧: {self.speech_count + 1}]"
                 )
-
-            return is_valid_speech
-        except Exception as e:
-            logger.error(f"检测语音失败: {e}")
-            return False
+                return True
+        return False
 
     def _handle_speech_frame(self, frame):
         """
@@ -261,18 +207,10 @@ class VADDetector:
         # 检测到足够的连续语音帧，触发打断
         if self.speech_count >= self.speech_window and not self.triggered:
             self.triggered = True
+            self.interrupts += 1
             logger.info("检测到持续语音，触发打断！")
             self._trigger_interrupt()
 
-            # 立即暂停自己，防止重复触发
-            self.paused = True
-            logger.info("VAD检测器已自动暂停以防止重复触发")
-
-            # 重置状态
-            self.speech_count = 0
-            self.silence_count = 0
-            self.triggered = False
-
     def _handle_silence_frame(self, frame):
         """
         处理静音帧.
@@ -287,12 +225,34 @@ class VADDetector:
         self.speech_count = 0
         self.silence_count = 0
         self.triggered = False
+        self.energy = 0.0
 
     def _trigger_interrupt(self):
         """
         触发打断.
         """
+        if self.loop is None or self.loop.is_closed():
+            return
+
         # 通知应用程序中止当前语音输出
-        self.app.schedule(
-            lambda: self.app.abort_speaking(AbortReason.WAKE_WORD_DETECTED)
-        )
+        try:
+            self.loop.call_soon_threadsafe(
+                lambda: asyncio.create_task(
+                    self.app.abort_speaking(AbortReason.WAKE_WORD_DETECTED)
+                )
+            )
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def get_stats(self):
+        """
+        获取检测统计.
+        """
+        return {
+            "running": self.is_running(),
+            "frames_processed": self.frames_processed,
+            "interrupts": self.interrupts,
+            "energy": round(self.energy, 1),
+            "dropped_frames": self._tap.dropped if self._tap else 0,
+        }
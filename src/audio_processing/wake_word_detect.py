@@ -1,19 +1,25 @@
 import asyncio
-import difflib
 import json
 import os
 import re
+import threading
 import time
 from functools import lru_cache
 from pathlib import Path
 from typing import Callable, Optional
 
-from pypinyin import Style, lazy_pinyin
+import numpy as np
 from vosk import KaldiRecognizer, Model, SetLogLevel
 
+from src.audio_processing.speech_gate import SpeechGate
+from src.audio_processing.wake_word_matcher import (
+    WakeWordMatcher,
+    build_pinyin_variants,
+)
 from src.constants.constants import AudioConfig
 from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
+from src.utils.metrics import LatencyHistogram
 
 logger = get_logger(__name__)
 
@@ -26,7 +32,19 @@ class WakeWordDetector:
         self.audio_codec = None
         self.is_running_flag = False
         self.paused = False
-        self.detection_task = None
+
+        # 识别线程：直接从AudioCodec的帧队列批量取数据，Vosk识别和唤醒词匹配
+        # 都在该线程中执行，只把检测结果交回事件循环
+        self._loop = None
+        self._frame_queue = None
+        self._recognition_thread = None
+        self._reported_dropped = 0
+        self._last_drop_report = 0.0
+        self._recognize_latency = LatencyHistogram((1, 2, 5, 10, 20, 50, 100, 200))
+        self._chunks_processed = 0
+        self._frames_processed = 0
+        self._speech_gate = None
+        self._utterance_active = False
         
         # 防重复触发机制
         self.last_detection_time = 0
@@ -47,15 +65,30 @@ class WakeWordDetector:
         self.enabled = True
         self.sample_rate = AudioConfig.INPUT_SAMPLE_RATE
 
+        # 每次送入识别器的音频时长，合并多帧以摊薄每次调用的开销
+        chunk_ms = config.get_config("WAKE_WORD_OPTIONS.CHUNK_MS", 200)
+        self.chunk_frames = max(1, round(chunk_ms / AudioConfig.FRAME_DURATION))
+
+        # 语音门控：静音帧不送入识别器
+        self._speech_gate = SpeechGate(
+            self.sample_rate,
+            AudioConfig.FRAME_DURATION,
+            mode=config.get_config("WAKE_WORD_OPTIONS.GATE_MODE", "energy"),
+            margin_db=config.get_config("WAKE_WORD_OPTIONS.GATE_MARGIN_DB", 8.0),
+            min_db=config.get_config("WAKE_WORD_OPTIONS.GATE_MIN_DB", -55.0),
+            pre_roll_ms=config.get_config("WAKE_WORD_OPTIONS.GATE_PRE_ROLL_MS", 400),
+            hangover_ms=config.get_config("WAKE_WORD_OPTIONS.GATE_HANGOVER_MS", 600),
+            vad_aggressiveness=config.get_config(
+                "WAKE_WORD_OPTIONS.GATE_VAD_AGGRESSIVENESS", 2
+            ),
+        )
+
         # 唤醒词配置
         self.wake_words = config.get_config(
             "WAKE_WORD_OPTIONS.WAKE_WORDS",
             ["你好小明", "你好小智", "你好小天", "小爱同学", "贾维斯"],
         )
 
-        # 预计算拼音变体以提升性能
-        self.wake_word_patterns = self._build_wake_word_patterns()
-
         # 匹配参数
         self.similarity_threshold = config.get_config(
             "WAKE_WORD_OPTIONS.SIMILARITY_THRESHOLD", 0.85
@@ -64,6 +97,12 @@ class WakeWordDetector:
             "WAKE_WORD_OPTIONS.MAX_EDIT_DISTANCE", 1
         )
 
+        # 识别器模式：open为开放词表识别后模糊匹配，grammar为只解码唤醒词的受限语法
+        self.recognizer_mode = config.get_config(
+            "WAKE_WORD_OPTIONS.RECOGNIZER_MODE", "open"
+        )
+        self._grammar = self._build_grammar(config)
+
         # 性能优化：缓存最近的识别结果
         self._recent_texts = []
         self._max_recent_cache = 10
@@ -74,34 +113,12 @@ class WakeWordDetector:
         # 验证配置
         self._validate_config()
 
-    def _build_wake_word_patterns(self):
-        """
-        构建唤醒词的拼音模式，包括多种变体.
-        """
-        patterns = {}
-        for word in self.wake_words:
-            # 标准拼音（无音调）
-            standard_pinyin = "".join(lazy_pinyin(word, style=Style.NORMAL))
-
-            # 首字母拼音
-            initials_pinyin = "".join(lazy_pinyin(word, style=Style.FIRST_LETTER))
-
-            # 音调拼音
-            tone_pinyin = "".join(lazy_pinyin(word, style=Style.TONE))
-
-            # 韵母拼音
-            finals_pinyin = "".join(lazy_pinyin(word, style=Style.FINALS))
-
-            patterns[word] = {
-                "standard": standard_pinyin.lower(),
-                "initials": initials_pinyin.lower(),
-                "tone": tone_pinyin.lower(),
-                "finals": finals_pinyin.lower(),
-                "original": word,
-                "length": len(standard_pinyin),
-            }
-
-        return patterns
+        # 预编译全部唤醒词的拼音索引，匹配耗时不随唤醒词数量增长
+        self._matcher = None
+        if self.enabled:
+            self._matcher = WakeWordMatcher(
+                self.wake_words, self.similarity_threshold, self.max_edit_distance
+            )
 
     @lru_cache(maxsize=128)
     def _get_text_pinyin_variants(self, text):
@@ -116,14 +133,7 @@ class WakeWordDetector:
         if not cleaned_text:
             return {}
 
-        return {
-            "standard": "".join(lazy_pinyin(cleaned_text, style=Style.NORMAL)).lower(),
-            "initials": "".join(
-                lazy_pinyin(cleaned_text, style=Style.FIRST_LETTER)
-            ).lower(),
-            "tone": "".join(lazy_pinyin(cleaned_text, style=Style.TONE)).lower(),
-            "finals": "".join(lazy_pinyin(cleaned_text, style=Style.FINALS)).lower(),
-        }
+        return build_pinyin_variants(cleaned_text)
 
     def _init_model(self, config):
         """
@@ -137,14 +147,69 @@ class WakeWordDetector:
             logger.info(f"加载语音识别模型: {model_path}")
             SetLogLevel(-1)
             self.model = Model(model_path=model_path)
-            self.recognizer = KaldiRecognizer(self.model, self.sample_rate)
-            self.recognizer.SetWords(True)
-            logger.info(f"模型加载完成，已配置 {len(self.wake_words)} 个唤醒词")
+            self.recognizer = self._create_recognizer()
+            logger.info(
+                f"模型加载完成，已配置 {len(self.wake_words)} 个唤醒词，"
+                f"识别模式: {self.recognizer_mode}"
+            )
 
         except Exception as e:
             logger.error(f"初始化失败: {e}", exc_info=True)
             self.enabled = False
 
+    def _build_grammar(self, config):
+        """构建受限语法.
+
+        默认每个唤醒词同时给出整词和逐字两种写法，以适配模型词表的分词方式，
+        词表外的写法会被Vosk忽略；[unk]吸收其他所有语音。
+        """
+        phrases = config.get_config("WAKE_WORD_OPTIONS.GRAMMAR", None)
+        if not phrases:
+            phrases = []
+            for word in self.wake_words:
+                phrases.extend([word, " ".join(word)])
+        phrases = list(dict.fromkeys(phrases))
+        return json.dumps(phrases + ["[unk]"], ensure_ascii=False)
+
+    def _create_recognizer(self):
+        """
+        按识别模式创建识别器，模型不支持受限语法时回退到开放词表.
+        """
+        recognizer = None
+        if self.recognizer_mode == "grammar":
+            try:
+                recognizer = KaldiRecognizer(
+                    self.model, self.sample_rate, self._grammar
+                )
+            except Exception as e:
+                logger.warning(f"创建受限语法识别器失败，改用开放词表: {e}")
+                self.recognizer_mode = "open"
+        elif self.recognizer_mode != "open":
+            logger.warning(f"未知的识别模式: {self.recognizer_mode}，改用开放词表")
+            self.recognizer_mode = "open"
+
+        if recognizer is None:
+            recognizer = KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.SetWords(True)
+        return recognizer
+
+    def set_recognizer_mode(self, mode):
+        """切换识别模式并重建识别器.
+
+        只能在检测器未运行时调用。
+        """
+        if self.is_running_flag:
+            raise RuntimeError("检测器运行中，无法切换识别模式")
+        self.recognizer_mode = mode
+        self.recognizer = self._create_recognizer()
+
+    @staticmethod
+    def _result_text(text):
+        """
+        去掉受限语法输出的[unk]标记.
+        """
+        return text.replace("[unk]", "").strip()
+
     def _get_model_path(self, config):
         """
         获取模型路径.
@@ -191,85 +256,6 @@ class WakeWordDetector:
         logger.warning(f"未找到模型，将使用默认路径: {default_path}")
         return str(default_path)
 
-    def _calculate_similarity(self, text_variants, pattern):
-        """
-        计算文本与唤醒词模式的相似度.
-        """
-        max_similarity = 0.0
-        best_match_type = None
-
-        # 检查各种拼音变体的匹配
-        for variant_type in ["standard", "tone", "initials", "finals"]:
-            text_variant = text_variants.get(variant_type, "")
-            pattern_variant = pattern.get(variant_type, "")
-
-            if not text_variant or not pattern_variant:
-                continue
-
-            # 1. 精确匹配（最高优先级）
-            if pattern_variant in text_variant:
-                return 1.0, f"exact_{variant_type}"
-
-            # 2. 序列匹配器相似度
-            similarity = difflib.SequenceMatcher(
-                None, text_variant, pattern_variant
-            ).ratio()
-
-            # 3. 编辑距离匹配（适用于短文本）
-            if len(pattern_variant) <= 10:
-                edit_distance = self._levenshtein_distance(
-                    text_variant, pattern_variant
-                )
-                max_allowed_distance = min(
-                    self.max_edit_distance, len(pattern_variant) // 2
-                )
-                if edit_distance <= max_allowed_distance:
-                    edit_similarity = 1.0 - (edit_distance / len(pattern_variant))
-                    similarity = max(similarity, edit_similarity)
-
-            # 4. 子序列匹配（对于首字母缩写）
-            if variant_type == "initials" and len(pattern_variant) >= 2:
-                if self._is_subsequence(pattern_variant, text_variant):
-                    similarity = max(similarity, 0.80)
-
-            if similarity > max_similarity:
-                max_similarity = similarity
-                best_match_type = variant_type
-
-        return max_similarity, best_match_type
-
-    def _levenshtein_distance(self, s1, s2):
-        """
-        计算编辑距离.
-        """
-        if len(s1) < len(s2):
-            return self._levenshtein_distance(s2, s1)
-
-        if len(s2) == 0:
-            return len(s1)
-
-        previous_row = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-
-        return previous_row[-1]
-
-    def _is_subsequence(self, pattern, text):
-        """
-        检查pattern是否为text的子序列.
-        """
-        i = 0
-        for char in text:
-            if i < len(pattern) and char == pattern[i]:
-                i += 1
-        return i == len(pattern)
-
     def on_detected(self, callback: Callable):
         """
         设置检测到唤醒词的回调函数.
@@ -286,11 +272,17 @@ class WakeWordDetector:
 
         try:
             self.audio_codec = audio_codec
+            self._frame_queue = audio_codec.wakeword_queue
+            self._reported_dropped = self._frame_queue.dropped
             self.is_running_flag = True
             self.paused = False
+            self._loop = asyncio.get_running_loop()
 
-            # 启动检测任务
-            self.detection_task = asyncio.create_task(self._detection_loop())
+            # 启动识别线程
+            self._recognition_thread = threading.Thread(
+                target=self._recognition_worker, name="WakeWordRecognizer", daemon=True
+            )
+            self._recognition_thread.start()
 
             logger.info("异步唤醒词检测器启动成功")
             return True
@@ -299,107 +291,147 @@ class WakeWordDetector:
             self.enabled = False
             return False
 
-    async def _detection_loop(self):
-        """
-        检测循环.
+    def _recognition_worker(self):
+        """识别线程主循环.
+
+        阻塞等待帧队列积累到一个识别块，每次取出全部积压的帧合并后送入识别器。
         """
+        logger.info("唤醒词识别线程已启动")
         error_count = 0
         MAX_ERRORS = 5
 
         while self.is_running_flag:
-            try:
-                if self.paused:
-                    await asyncio.sleep(0.1)
-                    continue
-
-                if not self.audio_codec:
-                    await asyncio.sleep(0.5)
-                    continue
-
-                # 从音频编解码器获取数据并处理
-                await self._process_audio()
+            frames = self._frame_queue.drain(self.chunk_frames, timeout=0.5)
+            self._report_dropped_frames()
+            if not frames or not self.is_running_flag:
+                continue
+            if self.paused:
+                # 暂停期间的音频直接丢弃，恢复后不处理过期数据
+                continue
 
-                # 短暂延迟避免过度占用CPU
-                await asyncio.sleep(0.02)
+            try:
+                self.process_frames(frames)
                 error_count = 0
-
-            except asyncio.CancelledError:
-                break
             except Exception as e:
                 error_count += 1
-                logger.error(f"唤醒词检测循环错误({error_count}/{MAX_ERRORS}): {e}")
-                if self.on_error:
-                    try:
-                        if asyncio.iscoroutinefunction(self.on_error):
-                            await self.on_error(e)
-                        else:
-                            self.on_error(e)
-                    except Exception as callback_error:
-                        logger.error(f"执行错误回调时失败: {callback_error}")
-
+                logger.error(f"唤醒词识别错误({error_count}/{MAX_ERRORS}): {e}")
+                self._post_error(e)
                 if error_count >= MAX_ERRORS:
                     logger.critical("达到最大错误次数，停止检测")
                     break
+                time.sleep(1)  # 错误后延迟重试
 
-                await asyncio.sleep(1)  # 错误后延迟重试
+        logger.info("唤醒词识别线程已停止")
 
-    async def _process_audio(self):
+    def process_frames(self, frames):
+        """经过语音门控后识别一批音频帧（识别线程）.
+
+        门关闭期间不调用识别器；门关闭时取出识别器中未结束语句的最终结果，
+        避免唤醒词恰好在语句末尾时因后续静音被门控而漏检。
         """
-        处理音频数据 - 使用旧版本的完整处理逻辑.
+        passed = []
+        for frame in frames:
+            passed.extend(self._speech_gate.process(frame))
+
+        if passed:
+            started = time.perf_counter()
+            self._process_audio_data(np.concatenate(passed).tobytes())
+            self._recognize_latency.observe((time.perf_counter() - started) * 1000)
+            self._chunks_processed += 1
+            self._frames_processed += len(passed)
+            self._utterance_active = True
+
+        if self._utterance_active and not self._speech_gate.is_open:
+            self._utterance_active = False
+            self._finalize_utterance()
+
+    def _finalize_utterance(self):
+        """
+        门关闭时结束当前语句并检查最终结果（识别线程）.
         """
         try:
-            # 使用AudioCodec的公开接口获取音频数据
-            if not self.audio_codec:
-                return
+            result = json.loads(self.recognizer.FinalResult())
+            text = self._result_text(result.get("text", ""))
+            if len(text) >= 3:
+                self._check_wake_word_text(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"JSON解析错误: {e}")
+
+    def reset_state(self):
+        """
+        重置识别器、语音门控和防重复状态，用于离线评估时逐条处理录音.
+        """
+        self.recognizer.Reset()
+        self._speech_gate.reset()
+        self._utterance_active = False
+        self._recent_texts.clear()
+        self.last_detection_time = 0
 
-            # 获取原始音频数据用于唤醒词检测
-            data = await self.audio_codec.get_raw_audio_for_detection()
-            if not data:
-                return
+    def _report_dropped_frames(self):
+        """
+        识别跟不上实时音频时报告被丢弃的帧数（最多每5秒一次）.
+        """
+        dropped = self._frame_queue.dropped
+        if dropped == self._reported_dropped:
+            return
+        now = time.monotonic()
+        if now - self._last_drop_report < 5.0:
+            return
+        logger.warning(
+            f"唤醒词识别跟不上实时音频，丢弃 {dropped - self._reported_dropped} 帧"
+        )
+        self._reported_dropped = dropped
+        self._last_drop_report = now
 
-            # 处理音频数据
-            await self._process_audio_data(data)
+    def _post_error(self, error):
+        """
+        把识别错误交给事件循环中的错误回调.
+        """
+        if not self.on_error or self._loop is None or self._loop.is_closed():
+            return
 
-        except Exception as e:
-            logger.debug(f"音频处理错误: {e}")
+        def call_error_callback():
+            try:
+                if asyncio.iscoroutinefunction(self.on_error):
+                    asyncio.create_task(self.on_error(error))
+                else:
+                    self.on_error(error)
+            except Exception as callback_error:
+                logger.error(f"执行错误回调时失败: {callback_error}")
+
+        try:
+            self._loop.call_soon_threadsafe(call_error_callback)
+        except RuntimeError:
+            pass
 
-    async def _process_audio_data(self, data):
+    def _process_audio_data(self, data):
         """
-        异步处理音频数据.
+        识别一个音频块（识别线程）.
         """
         try:
             # 处理完整识别结果
             if self.recognizer.AcceptWaveform(data):
                 result = json.loads(self.recognizer.Result())
-                if text := result.get("text", "").strip():
+                if text := self._result_text(result.get("text", "")):
                     # 过滤过短的文本以减少误触发
                     if len(text) >= 3:
-                        await self._check_wake_word_text(text)
-
-            # 处理部分识别结果（降低频率）
-            if hasattr(self, "_partial_check_counter"):
-                self._partial_check_counter += 1
+                        self._check_wake_word_text(text)
             else:
-                self._partial_check_counter = 0
-
-            # 每3次才检查一次部分结果
-            if self._partial_check_counter % 3 == 0:
-                partial = (
-                    json.loads(self.recognizer.PartialResult())
-                    .get("partial", "")
-                    .strip()
+                # 每个识别块检查一次部分结果
+                partial = self._result_text(
+                    json.loads(self.recognizer.PartialResult()).get("partial", "")
                 )
                 if partial and len(partial) >= 3:
-                    await self._check_wake_word_text(partial)
+                    self._check_wake_word_text(partial)
 
         except json.JSONDecodeError as e:
             logger.warning(f"JSON解析错误: {e}")
         except Exception as e:
             logger.error(f"音频数据处理错误: {e}")
 
-    async def _check_wake_word_text(self, text):
+    def _check_wake_word_text(self, text):
         """
-        检查文本中的唤醒词.
+        检查文本中的唤醒词（识别线程）.
         """
         if not text or not text.strip():
             return
@@ -423,31 +455,36 @@ class WakeWordDetector:
         if not text_variants or not any(text_variants.values()):
             return
 
-        best_match = None
-        best_similarity = 0.0
-        best_match_info = None
-
-        # 检查每个唤醒词模式
-        for wake_word, pattern in self.wake_word_patterns.items():
-            similarity, match_type = self._calculate_similarity(text_variants, pattern)
-
-            if similarity > best_similarity and similarity >= self.similarity_threshold:
-                best_similarity = similarity
-                best_match = wake_word
-                best_match_info = match_type
+        # 一次匹配全部唤醒词
+        match = self._matcher.match(text_variants)
 
         # 触发检测
-        if best_match:
+        if match:
             self.last_detection_time = current_time
             logger.info(
-                f"检测到唤醒词 '{best_match}' "
-                f"(相似度: {best_similarity:.3f}, 匹配类型: {best_match_info})"
+                f"检测到唤醒词 '{match.wake_word}' "
+                f"(相似度: {match.similarity:.3f}, 匹配类型: {match.match_type})"
             )
 
-            await self._trigger_callbacks(best_match, text)
             self.recognizer.Reset()
             # 清空缓存避免重复触发
             self._recent_texts.clear()
+            self._post_detection(match.wake_word, text)
+
+    def _post_detection(self, wake_word, text):
+        """
+        把检测结果交回事件循环.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(
+                lambda: asyncio.create_task(self._trigger_callbacks(wake_word, text))
+            )
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
 
     async def _trigger_callbacks(self, wake_word, text):
         """
@@ -470,12 +507,11 @@ class WakeWordDetector:
         """
         self.is_running_flag = False
 
-        if self.detection_task:
-            self.detection_task.cancel()
-            try:
-                await self.detection_task
-            except asyncio.CancelledError:
-                pass
+        # 唤醒识别线程并等待其退出
+        if self._recognition_thread and self._recognition_thread.is_alive():
+            self._frame_queue.wakeup()
+            await asyncio.to_thread(self._recognition_thread.join, 2.0)
+        self._recognition_thread = None
 
         logger.info("唤醒词检测器已停止")
 
@@ -549,6 +585,16 @@ class WakeWordDetector:
             "cache_misses": cache_info.misses,
             "cache_size": cache_info.currsize,
             "recent_texts_count": len(self._recent_texts),
+            "chunk_frames": self.chunk_frames,
+            "chunks_processed": self._chunks_processed,
+            "frames_processed": self._frames_processed,
+            "pending_frames": len(self._frame_queue) if self._frame_queue else 0,
+            "dropped_frames": self._frame_queue.dropped if self._frame_queue else 0,
+            "recognizer_mode": self.recognizer_mode,
+            "recognize_latency": self._recognize_latency.snapshot(),
+            "speech_gate": (
+                self._speech_gate.get_stats() if self._speech_gate else None
+            ),
         }
 
     def clear_cache(self):
@@ -0,0 +1,265 @@
+"""唤醒词拼音匹配器.
+
+启动时把全部唤醒词的拼音变体编译为索引结构，每段识别文本只需一次遍历
+即可得到最佳匹配，耗时基本不随唤醒词数量增长：
+    - 精确包含：拼音前缀树，从文本每个位置向下走一次
+    - 编辑距离：在同一前缀树上做带状编辑距离，距离超限的分支整体剪枝
+    - 序列相似度：字符直方图矩阵一次向量化计算所有唤醒词的相似度上界，
+      只对可能超过阈值的唤醒词计算SequenceMatcher
+    - 首字母子序列：基于“下一次出现位置”表在前缀树上深度优先搜索
+匹配结果与逐个唤醒词计算的旧实现一致。
+"""
+
+import difflib
+from typing import NamedTuple, Optional
+
+import numpy as np
+from pypinyin import Style, lazy_pinyin
+
+# 按匹配优先级排列的拼音变体
+VARIANT_STYLES = {
+    "standard": Style.NORMAL,
+    "tone": Style.TONE,
+    "initials": Style.FIRST_LETTER,
+    "finals": Style.FINALS,
+}
+
+# 参与编辑距离匹配的最大拼音长度
+MAX_EDIT_PATTERN_LENGTH = 10
+# 首字母子序列匹配给出的相似度
+SUBSEQUENCE_SIMILARITY = 0.80
+
+_TERMINAL = ""
+
+
+class WakeWordMatch(NamedTuple):
+    wake_word: str
+    similarity: float
+    match_type: str
+
+
+def build_pinyin_variants(text: str) -> dict:
+    """
+    生成文本的各种拼音变体.
+    """
+    return {
+        variant: "".join(lazy_pinyin(text, style=style)).lower()
+        for variant, style in VARIANT_STYLES.items()
+    }
+
+
+class _VariantIndex:
+    """
+    单一拼音变体下全部唤醒词的索引.
+    """
+
+    def __init__(self, patterns: list, max_edit_distance: int):
+        self.patterns = patterns
+        self.max_edit_distance = max_edit_distance
+        self.exact_trie = self._build_trie(
+            (index, pattern) for index, pattern in enumerate(patterns) if pattern
+        )
+        self.edit_trie = self._build_trie(
+            (index, pattern)
+            for index, pattern in enumerate(patterns)
+            if pattern and len(pattern) <= MAX_EDIT_PATTERN_LENGTH
+        )
+        self.edit_limits = np.array(
+            [min(max_edit_distance, len(pattern) // 2) for pattern in patterns]
+        )
+
+        # 字符直方图矩阵，用于向量化计算SequenceMatcher.quick_ratio
+        alphabet = sorted({char for pattern in patterns for char in pattern})
+        self.char_index = {char: i for i, char in enumerate(alphabet)}
+        self.histograms = np.zeros((len(patterns), len(alphabet) + 1), np.int32)
+        for row, pattern in enumerate(patterns):
+            for char in pattern:
+                self.histograms[row, self.char_index[char]] += 1
+        self.lengths = np.array([len(pattern) for pattern in patterns])
+
+    @staticmethod
+    def _build_trie(items) -> dict:
+        root = {}
+        for index, pattern in items:
+            node = root
+            for char in pattern:
+                node = node.setdefault(char, {})
+            node.setdefault(_TERMINAL, []).append(index)
+        return root
+
+    def exact_matches(self, text: str) -> set:
+        """
+        返回拼音被文本包含的唤醒词下标.
+        """
+        found = set()
+        for start in range(len(text)):
+            node = self.exact_trie
+            for char in text[start:]:
+                node = node.get(char)
+                if node is None:
+                    break
+                if _TERMINAL in node:
+                    found.update(node[_TERMINAL])
+        return found
+
+    def edit_distances(self, text: str) -> dict:
+        """返回编辑距离在允许范围内的唤醒词下标及其距离.
+
+        在前缀树上逐层计算与整段文本的编辑距离，只计算对角线两侧
+        max_edit_distance宽的带状区域，整行都超限时剪掉该分支。
+        """
+        limit = self.max_edit_distance
+        if limit < 0 or not self.edit_trie:
+            return {}
+        width = len(text)
+        overflow = limit + 1
+        first_row = [min(j, overflow) for j in range(width + 1)]
+        distances = {}
+        stack = [
+            (child, char, first_row, 1)
+            for char, child in self.edit_trie.items()
+            if char
+        ]
+
+        while stack:
+            node, char, previous, depth = stack.pop()
+            row = [overflow] * (width + 1)
+            row[0] = min(depth, overflow)
+            for j in range(max(1, depth - limit), min(width, depth + limit) + 1):
+                cost = previous[j - 1] + (text[j - 1] != char)
+                cost = min(cost, previous[j] + 1, row[j - 1] + 1)
+                row[j] = min(cost, overflow)
+
+            if _TERMINAL in node and row[width] <= limit:
+                for index in node[_TERMINAL]:
+                    if row[width] <= self.edit_limits[index]:
+                        distances[index] = row[width]
+            if min(row) <= limit:
+                stack.extend(
+                    (child, next_char, row, depth + 1)
+                    for next_char, child in node.items()
+                    if next_char
+                )
+        return distances
+
+    def quick_ratios(self, text: str) -> np.ndarray:
+        """
+        向量化计算全部唤醒词的SequenceMatcher相似度上界.
+        """
+        counts = np.zeros(self.histograms.shape[1], np.int32)
+        other = len(self.char_index)
+        for char in text:
+            counts[self.char_index.get(char, other)] += 1
+        counts[other] = 0
+        common = np.minimum(self.histograms, counts).sum(axis=1)
+        return 2.0 * common / np.maximum(self.lengths + len(text), 1)
+
+    def subsequence_matches(self, text: str) -> set:
+        """
+        返回拼音是文本子序列且长度不小于2的唤醒词下标.
+        """
+        # next_pos[i][char]: 位置i及之后char第一次出现的位置
+        next_pos = [None] * (len(text) + 1)
+        next_pos[len(text)] = {}
+        for i in range(len(text) - 1, -1, -1):
+            next_pos[i] = dict(next_pos[i + 1])
+            next_pos[i][text[i]] = i
+
+        found = set()
+        stack = [(self.exact_trie, 0, 0)]
+        while stack:
+            node, position, depth = stack.pop()
+            if depth >= 2 and _TERMINAL in node:
+                found.update(node[_TERMINAL])
+            for char, child in node.items():
+                if char == _TERMINAL:
+                    continue
+                hit = next_pos[position].get(char)
+                if hit is not None:
+                    stack.append((child, hit + 1, depth + 1))
+        return found
+
+
+class WakeWordMatcher:
+    """
+    编译后的唤醒词匹配器.
+    """
+
+    def __init__(
+        self,
+        wake_words: list,
+        similarity_threshold: float = 0.85,
+        max_edit_distance: int = 1,
+    ):
+        self.wake_words = list(wake_words)
+        self.similarity_threshold = similarity_threshold
+        self.max_edit_distance = max_edit_distance
+
+        word_variants = [build_pinyin_variants(word) for word in self.wake_words]
+        self._indexes = {
+            variant: _VariantIndex(
+                [variants[variant] for variants in word_variants], max_edit_distance
+            )
+            for variant in VARIANT_STYLES
+        }
+
+    def match(self, text_variants: dict) -> Optional[WakeWordMatch]:
+        """查找与识别文本最相似的唤醒词.
+
+        Args:
+            text_variants: build_pinyin_variants生成的文本拼音变体
+
+        Returns:
+            相似度不低于阈值的最佳匹配，没有时返回None
+        """
+        count = len(self.wake_words)
+        if not count:
+            return None
+        threshold = self.similarity_threshold
+        best = np.zeros(count)
+        best_type = [None] * count
+
+        for variant, index in self._indexes.items():
+            text = text_variants.get(variant, "")
+            if not text:
+                continue
+
+            scores = np.zeros(count)
+            exact = index.exact_matches(text)
+            for word_index in exact:
+                scores[word_index] = 1.0
+
+            # 只对相似度上界可能超过阈值的唤醒词计算SequenceMatcher
+            candidates = np.nonzero(index.quick_ratios(text) >= threshold)[0]
+            for word_index in candidates:
+                if word_index in exact:
+                    continue
+                pattern = index.patterns[word_index]
+                if pattern:
+                    scores[word_index] = difflib.SequenceMatcher(
+                        None, text, pattern
+                    ).ratio()
+
+            for word_index, distance in index.edit_distances(text).items():
+                if word_index not in exact:
+                    similarity = 1.0 - distance / index.lengths[word_index]
+                    scores[word_index] = max(scores[word_index], similarity)
+
+            if variant == "initials" and SUBSEQUENCE_SIMILARITY >= threshold:
+                for word_index in index.subsequence_matches(text):
+                    scores[word_index] = max(
+                        scores[word_index], SUBSEQUENCE_SIMILARITY
+                    )
+
+            for word_index in np.nonzero(scores > best)[0]:
+                best[word_index] = scores[word_index]
+                best_type[word_index] = (
+                    f"exact_{variant}" if word_index in exact else variant
+                )
+
+        winner = int(np.argmax(best))
+        if best[winner] < threshold or best[winner] <= 0:
+            return None
+        return WakeWordMatch(
+            self.wake_words[winner], float(best[winner]), best_type[winner]
+        )
@@ -9,6 +9,9 @@
 3. 增益控制(AGC) - 自动调整音频增益
 4. 高通滤波 - 移除低频噪声
 
+当前平台没有可用的APM动态库时（如Linux ARM），使用纯NumPy实现的
+回声消除和噪声抑制（见numpy_apm.py），接口保持不变。
+
 用法:
     processor = WebRTCProcessor()
     processed_audio = processor.process_capture_stream(input_audio, reference_audio)
@@ -17,42 +20,60 @@
 import ctypes
 import os
 import threading
+from collections import deque
 from ctypes import POINTER, Structure, byref, c_bool, c_float, c_int, c_short, c_void_p
 
 import numpy as np
 
+from src.audio_processing.numpy_apm import NumpyAudioProcessor
 from src.utils.logging_config import get_logger
-from src.utils.path_resolver import find_resource
+from src.utils.opus_loader import LINUX, MACOS, WINDOWS, get_system_info
+from src.utils.resource_finder import find_file
 
 logger = get_logger(__name__)
 
+# 各平台APM库的相对路径
+APM_LIB_PATHS = {
+    WINDOWS: "libs/webrtc_apm/win/{arch}/libwebrtc_apm.dll",
+    MACOS: "libs/webrtc_apm/mac/{arch}/libwebrtc_apm.dylib",
+    LINUX: "libs/webrtc_apm/linux/{arch}/libwebrtc_apm.so",
+}
+
 
 # 获取DLL文件的绝对路径
 def get_webrtc_dll_path():
     """
-    获取WebRTC APM库的路径.
+    获取当前平台WebRTC APM库的路径，没有对应的库时返回None.
     """
-    dll_path = find_resource("libs/webrtc_apm/win/x86_64/libwebrtc_apm.dll")
+    system, arch = get_system_info()
+    relative_path = APM_LIB_PATHS.get(system)
+    if relative_path is None:
+        return None
+
+    dll_path = find_file(relative_path.format(arch=arch))
     if dll_path:
         return str(dll_path)
 
-    # 备用方案：使用原有逻辑
+    # 备用方案：相对于项目根目录查找
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(os.path.dirname(current_dir))
-    fallback_path = os.path.join(
-        project_root, "libs", "webrtc_apm", "win", "x86_64", "libwebrtc_apm.dll"
-    )
-    logger.warning(f"未找到WebRTC库，使用备用路径: {fallback_path}")
-    return fallback_path
+    fallback_path = os.path.join(project_root, relative_path.format(arch=arch))
+    if os.path.exists(fallback_path):
+        return fallback_path
+    return None
 
 
 # 加载WebRTC APM库
 try:
     dll_path = get_webrtc_dll_path()
-    apm_lib = ctypes.CDLL(dll_path)
-    logger.info(f"成功加载WebRTC APM库: {dll_path}")
+    if dll_path:
+        apm_lib = ctypes.CDLL(dll_path)
+        logger.info(f"成功加载WebRTC APM库: {dll_path}")
+    else:
+        logger.info("当前平台没有WebRTC APM库，将使用NumPy实现")
+        apm_lib = None
 except Exception as e:
-    logger.error(f"加载WebRTC APM库失败: {e}")
+    logger.warning(f"加载WebRTC APM库失败，将使用NumPy实现: {e}")
     apm_lib = None
 
 
@@ -338,17 +359,25 @@ class WebRTCProcessor:
     WebRTC音频处理器，提供实时回声消除和音频增强功能.
     """
 
-    def __init__(self, sample_rate=16000, channels=1, frame_size=160):
+    def __init__(
+        self, sample_rate=16000, channels=1, frame_size=160, backend="auto"
+    ):
         """初始化WebRTC处理器.
 
         Args:
             sample_rate: 采样率，默认16000Hz
             channels: 声道数，默认1（单声道）
             frame_size: 帧大小，默认160样本（10ms @ 16kHz）
+            backend: auto优先使用APM库、不可用时使用NumPy实现；
+                webrtc只使用APM库；numpy只使用NumPy实现
         """
         self.sample_rate = sample_rate
         self.channels = channels
         self.frame_size = frame_size
+        self.backend = None
+
+        # NumPy后备实现
+        self._numpy_processor = None
 
         # WebRTC APM实例
         self.apm = None
@@ -361,12 +390,14 @@ class WebRTCProcessor:
         # 初始化状态
         self._initialized = False
 
-        # 参考信号缓冲区（用于回声消除）
-        self._reference_buffer = []
+        # 参考信号缓冲区（用于回声消除），最多保留约1秒，超出时自动丢弃最旧的帧
+        self._reference_buffer = deque(maxlen=max(1, sample_rate // frame_size))
         self._reference_lock = threading.Lock()
 
-        # 初始化WebRTC APM
-        self._initialize()
+        # 初始化WebRTC APM，不可用时改用NumPy实现
+        use_native = backend == "webrtc" or (backend == "auto" and apm_lib is not None)
+        if not (use_native and self._initialize()) and backend != "webrtc":
+            self._initialize_numpy()
 
     def _initialize(self):
         """
@@ -402,6 +433,7 @@ class WebRTCProcessor:
                 apm_lib.WebRTC_APM_SetStreamDelayMs(self.apm, 50)
 
                 self._initialized = True
+                self.backend = "webrtc"
                 logger.info("WebRTC处理器初始化成功")
                 return True
 
@@ -409,6 +441,45 @@ class WebRTCProcessor:
             logger.error(f"初始化WebRTC处理器失败: {e}")
             return False
 
+    def _initialize_numpy(self):
+        """
+        初始化NumPy实现的回声消除和噪声抑制.
+        """
+        if self.channels != 1:
+            logger.error("NumPy回声消除只支持单声道")
+            return False
+
+        self._numpy_processor = NumpyAudioProcessor(
+            sample_rate=self.sample_rate, frame_size=self.frame_size
+        )
+        self._initialized = True
+        self.backend = "numpy"
+        logger.info("使用NumPy回声消除/降噪处理器")
+        return True
+
+    def _process_numpy(self, input_data, reference_data):
+        """
+        使用NumPy实现处理一帧.
+        """
+        input_array = np.frombuffer(input_data, dtype=np.int16)
+        if len(input_array) != self.frame_size:
+            logger.warning(
+                f"输入数据长度不匹配，期望{self.frame_size}，实际{len(input_array)}"
+            )
+            return input_data
+
+        ref_array = None
+        if reference_data:
+            ref_array = np.frombuffer(reference_data, dtype=np.int16)
+            if len(ref_array) != self.frame_size:
+                padded = np.zeros(self.frame_size, dtype=np.int16)
+                count = min(len(ref_array), self.frame_size)
+                padded[:count] = ref_array[:count]
+                ref_array = padded
+
+        with self._lock:
+            return self._numpy_processor.process(input_array, ref_array).tobytes()
+
     def process_capture_stream(self, input_data, reference_data=None):
         """处理捕获流（麦克风输入）
 
@@ -419,6 +490,13 @@ class WebRTCProcessor:
         Returns:
             处理后的音频数据（bytes），失败返回原始数据
         """
+        if self._numpy_processor is not None:
+            try:
+                return self._process_numpy(input_data, reference_data)
+            except Exception as e:
+                logger.error(f"处理捕获流失败: {e}")
+                return input_data
+
         if not self._initialized or not self.apm:
             logger.warning("WebRTC处理器未初始化，返回原始数据")
             return input_data
@@ -516,10 +594,6 @@ class WebRTCProcessor:
         """
         with self._reference_lock:
             self._reference_buffer.append(reference_data)
-            # 保持缓冲区大小合理（约1秒的数据）
-            max_buffer_size = self.sample_rate // self.frame_size
-            if len(self._reference_buffer) > max_buffer_size:
-                self._reference_buffer = self._reference_buffer[-max_buffer_size:]
 
     def get_reference_data(self):
         """获取并移除最旧的参考数据.
@@ -529,7 +603,7 @@ class WebRTCProcessor:
         """
         with self._reference_lock:
             if self._reference_buffer:
-                return self._reference_buffer.pop(0)
+                return self._reference_buffer.popleft()
             return None
 
     def close(self):
@@ -539,6 +613,14 @@ class WebRTCProcessor:
         if not self._initialized:
             return
 
+        if self._numpy_processor is not None:
+            with self._reference_lock:
+                self._reference_buffer.clear()
+            self._numpy_processor = None
+            self._initialized = False
+            logger.info("NumPy回声消除/降噪处理器已关闭")
+            return
+
         try:
             with self._lock:
                 # 清理参考缓冲区
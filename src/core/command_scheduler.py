@@ -0,0 +1,188 @@
+"""按优先级通道调度的命令执行器.
+
+取代单个FIFO命令队列：命令按类别进入不同通道，每个通道有自己的并发上限，
+所有通道共享一个总并发上限，空位按通道优先级分配。
+    - control：设备状态切换、开始/停止监听等，串行执行保证顺序
+    - speech：TTS/STT/LLM消息，串行执行保证句子顺序
+    - tools：MCP/IoT调用，允许并发，耗时的工具不再阻塞对话
+
+调度只在提交命令和命令结束时进行，不需要轮询。
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Optional, Sequence, Tuple
+
+from src.utils.logging_config import get_logger
+from src.utils.metrics import LatencyHistogram
+
+logger = get_logger(__name__)
+
+LANE_CONTROL = "control"
+LANE_SPEECH = "speech"
+LANE_TOOLS = "tools"
+
+# 排队等待时间分桶（毫秒）
+WAIT_BOUNDS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+class _Lane:
+    """
+    单个通道的队列、并发计数和统计.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_depth: Optional[int]):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_depth = None if max_depth is None else max(1, max_depth)
+        self.queue = deque()
+        self.running = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_depth_seen = 0
+        self.wait_timing = LatencyHistogram(WAIT_BOUNDS_MS)
+
+    def get_stats(self) -> dict:
+        return {
+            "depth": len(self.queue),
+            "max_depth": self.max_depth_seen,
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "wait": self.wait_timing.snapshot(),
+        }
+
+
+class CommandScheduler:
+    """优先级命令调度器.
+
+    只在事件循环线程中使用。命令为无参可调用对象，返回协程时等待其完成。
+    """
+
+    def __init__(
+        self,
+        lanes: Sequence[Tuple[str, int, Optional[int]]],
+        max_total: int = 6,
+    ):
+        """初始化调度器.
+
+        Args:
+            lanes: (通道名, 并发上限, 队列上限)，按优先级从高到低排列；
+                队列上限为None时不限长度，不会丢弃命令
+            max_total: 所有通道合计的并发上限
+        """
+        self._lanes = [_Lane(*spec) for spec in lanes]
+        self._lanes_by_name = {lane.name: lane for lane in self._lanes}
+        self.max_total = max(1, max_total)
+        self._tasks = set()
+        self._closed = False
+
+    def submit(self, command: Callable, lane: str = LANE_CONTROL) -> bool:
+        """提交命令.
+
+        有队列上限的通道已满时丢弃该通道最旧的命令；必须按顺序完整执行的
+        通道应不设上限。
+
+        Returns:
+            bool: 是否已接受
+        """
+        if self._closed:
+            logger.warning("命令调度器已关闭，丢弃命令")
+            return False
+        if not callable(command):
+            logger.warning(f"收到非可调用命令: {type(command)}, 跳过执行")
+            return False
+
+        target = self._lanes_by_name.get(lane)
+        if target is None:
+            logger.warning(f"未知的命令通道 {lane}，使用 {LANE_CONTROL}")
+            target = self._lanes_by_name[LANE_CONTROL]
+
+        if target.max_depth is not None and len(target.queue) >= target.max_depth:
+            target.queue.popleft()
+            target.dropped += 1
+            logger.warning(f"命令通道 {target.name} 已满，丢弃最旧的命令")
+
+        target.queue.append((command, time.perf_counter()))
+        target.submitted += 1
+        if len(target.queue) > target.max_depth_seen:
+            target.max_depth_seen = len(target.queue)
+
+        self._dispatch()
+        return True
+
+    def _dispatch(self):
+        """
+        按优先级为空闲的并发名额分配命令.
+        """
+        for lane in self._lanes:
+            while (
+                lane.queue
+                and lane.running < lane.max_concurrency
+                and len(self._tasks) < self.max_total
+            ):
+                command, queued_at = lane.queue.popleft()
+                lane.wait_timing.observe((time.perf_counter() - queued_at) * 1000)
+                lane.running += 1
+                task = asyncio.create_task(
+                    self._execute(lane, command), name=f"命令-{lane.name}"
+                )
+                self._tasks.add(task)
+                task.add_done_callback(self._on_task_done)
+
+    async def _execute(self, lane: _Lane, command: Callable):
+        try:
+            result = command()
+            if asyncio.iscoroutine(result):
+                await result
+            lane.completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            lane.failed += 1
+            logger.error(f"命令处理错误 [{lane.name}]: {e}", exc_info=True)
+        finally:
+            lane.running -= 1
+
+    def _on_task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not self._closed:
+            self._dispatch()
+
+    def pending(self) -> int:
+        """
+        所有通道中排队和执行中的命令数.
+        """
+        return len(self._tasks) + sum(len(lane.queue) for lane in self._lanes)
+
+    async def close(self, timeout: float = 2.0):
+        """
+        停止调度：丢弃排队的命令并取消执行中的命令.
+        """
+        self._closed = True
+        for lane in self._lanes:
+            lane.queue.clear()
+
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        self._tasks.clear()
+
+    def get_stats(self) -> dict:
+        """
+        获取各通道的队列深度、并发和排队等待统计.
+        """
+        return {
+            "running": len(self._tasks),
+            "max_total": self.max_total,
+            "lanes": {lane.name: lane.get_stats() for lane in self._lanes},
+        }
@@ -5,18 +5,28 @@ Reference: https://modelcontextprotocol.io/specification/2024-11-05
 
 import asyncio
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from src.constants.system import SystemConstants
+from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
+from src.utils.metrics import LatencyHistogram
 
 logger = get_logger(__name__)
 
 # 返回值类型
 ReturnValue = Union[bool, int, str]
 
+# tools/list单页的最大负载（字节）
+TOOLS_LIST_MAX_PAYLOAD = 8000
+
+# 工具调用耗时分桶（毫秒）
+TOOL_LATENCY_BOUNDS_MS = (10, 50, 100, 500, 1000, 5000, 10000, 30000, 60000)
+
 
 class PropertyType(Enum):
     """
@@ -154,6 +164,10 @@ class McpTool:
     description: str
     properties: PropertyList
     callback: Callable[[Dict[str, Any]], ReturnValue]
+    # 超时时间（秒），None时使用服务器默认值
+    timeout: Optional[float] = None
+    # 同步回调会阻塞（IO、子进程等），在线程池中执行
+    blocking: bool = False
 
     def to_json(self) -> Dict[str, Any]:
         """
@@ -169,9 +183,14 @@ class McpTool:
             },
         }
 
-    async def call(self, arguments: Dict[str, Any]) -> str:
-        """
-        调用工具.
+    async def call(
+        self, arguments: Dict[str, Any], executor: Optional[ThreadPoolExecutor] = None
+    ) -> str:
+        """调用工具.
+
+        Args:
+            arguments: 调用参数
+            executor: 声明为blocking的同步回调使用的线程池，None时使用默认线程池
         """
         try:
             # 解析参数
@@ -180,6 +199,11 @@ class McpTool:
             # 调用回调函数
             if asyncio.iscoroutinefunction(self.callback):
                 result = await self.callback(parsed_args)
+            elif self.blocking:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    executor, self.callback, parsed_args
+                )
             else:
                 result = self.callback(parsed_args)
 
@@ -202,9 +226,35 @@ class McpTool:
             )
 
 
-class McpServer:
+class _ToolCallStats:
     """
-    MCP服务器实现.
+    单个工具的调用计数和耗时统计.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.in_flight = 0
+        self.timing = LatencyHistogram(TOOL_LATENCY_BOUNDS_MS)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "in_flight": self.in_flight,
+            "latency": self.timing.snapshot(),
+        }
+
+
+class McpServer:
+    """MCP服务器实现.
+
+    工具调用在独立任务中执行，不阻塞消息处理：每个调用有超时，
+    可被服务端的notifications/cancelled或会话关闭取消。
     """
 
     _instance = None
@@ -220,9 +270,26 @@ class McpServer:
 
     def __init__(self):
         self.tools: List[McpTool] = []
+        # 按名称索引的工具和预先序列化的描述（JSON, 序列化长度）
+        self._tools_by_name: Dict[str, McpTool] = {}
+        self._tool_descriptors: Dict[str, Tuple[Dict[str, Any], int]] = {}
+        # 按cursor缓存的tools/list分页结果，工具列表变化时清空
+        self._tools_list_pages: Dict[str, Dict[str, Any]] = {}
         self._send_callback: Optional[Callable] = None
         self._camera = None
 
+        config = ConfigManager.get_instance()
+        self._default_timeout = config.get_config(
+            "SYSTEM_OPTIONS.MCP.TOOL_TIMEOUT_S", 60
+        )
+        self._tool_timeouts = config.get_config("SYSTEM_OPTIONS.MCP.TOOL_TIMEOUTS", {})
+        self._tool_threads = config.get_config("SYSTEM_OPTIONS.MCP.TOOL_THREADS", 4)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # 执行中的工具调用：请求ID -> 任务
+        self._calls: Dict[Any, asyncio.Task] = {}
+        self._tool_stats: Dict[str, _ToolCallStats] = {}
+
     def set_send_callback(self, callback: Callable):
         """
         设置发送消息的回调函数.
@@ -239,12 +306,22 @@ class McpServer:
             tool = McpTool(name, description, properties, callback)
 
         # 检查是否已存在
-        if any(t.name == tool.name for t in self.tools):
+        if tool.name in self._tools_by_name:
             logger.warning(f"Tool {tool.name} already added")
             return
 
         logger.info(f"Add tool: {tool.name}")
+        self._register_tool(tool)
+
+    def _register_tool(self, tool: McpTool):
+        """
+        加入工具列表和索引，预先序列化工具描述.
+        """
+        descriptor = tool.to_json()
         self.tools.append(tool)
+        self._tools_by_name[tool.name] = tool
+        self._tool_descriptors[tool.name] = (descriptor, len(json.dumps(descriptor)))
+        self._tools_list_pages.clear()
 
     def add_common_tools(self):
         """
@@ -253,6 +330,9 @@ class McpServer:
         # 备份原有工具列表
         original_tools = self.tools.copy()
         self.tools.clear()
+        self._tools_by_name.clear()
+        self._tool_descriptors.clear()
+        self._tools_list_pages.clear()
 
         # 添加系统工具
         from src.mcp.tools.system import get_system_tools_manager
@@ -307,6 +387,7 @@ class McpServer:
                 "拍照并分析图像内容。可以进行物体识别、文字识别、场景分析、问题解答等。适用于：看看这是什么、拍照识别、读取文字、分析场景、解答问题等需求。Take photo and analyze image content including object recognition, text recognition, scene analysis, and question answering.",
                 properties,
                 take_photo,
+                blocking=True,
             )
         )
 
@@ -328,8 +409,10 @@ class McpServer:
         robot_manager = get_robot_manager()
         robot_manager.init_tools(self.add_tool, PropertyList, Property, PropertyType)
 
-        # 恢复原有工具
-        self.tools.extend(original_tools)
+        # 恢复原有工具，与通用工具同名的保留通用工具
+        for tool in original_tools:
+            if tool.name not in self._tools_by_name:
+                self._register_tool(tool)
 
     async def parse_message(self, message: Union[str, Dict[str, Any]]):
         """
@@ -355,9 +438,11 @@ class McpServer:
                 logger.error("Missing method")
                 return
 
-            # 忽略通知
             if method.startswith("notifications"):
-                logger.info(f"[MCP] 忽略通知消息: {method}")
+                if method == "notifications/cancelled":
+                    self._handle_cancelled(data.get("params", {}))
+                else:
+                    logger.info(f"[MCP] 忽略通知消息: {method}")
                 return
 
             params = data.get("params", {})
@@ -410,26 +495,37 @@ class McpServer:
         处理工具列表请求.
         """
         cursor = params.get("cursor", "")
-        max_payload_size = 8000
+
+        result = self._tools_list_pages.get(cursor)
+        if result is None:
+            result = self._build_tools_page(cursor)
+            # cursor只可能是工具名，缓存大小以工具数为上限
+            if not cursor or cursor in self._tools_by_name:
+                self._tools_list_pages[cursor] = result
+
+        await self._reply_result(id, result)
+
+    def _build_tools_page(self, cursor: str) -> Dict[str, Any]:
+        """
+        从cursor指定的工具开始，按负载上限构建一页工具列表.
+        """
+        if not cursor:
+            start = 0
+        elif cursor in self._tools_by_name:
+            start = next(
+                index for index, tool in enumerate(self.tools) if tool.name == cursor
+            )
+        else:
+            start = len(self.tools)
 
         tools_json = []
         total_size = 0
-        found_cursor = not cursor
         next_cursor = ""
 
-        for tool in self.tools:
-            # 如果还没找到起始位置，继续搜索
-            if not found_cursor:
-                if tool.name == cursor:
-                    found_cursor = True
-                else:
-                    continue
-
-            # 检查大小
-            tool_json = tool.to_json()
-            tool_size = len(json.dumps(tool_json))
+        for tool in self.tools[start:]:
+            tool_json, tool_size = self._tool_descriptors[tool.name]
 
-            if total_size + tool_size + 100 > max_payload_size:
+            if total_size + tool_size + 100 > TOOLS_LIST_MAX_PAYLOAD:
                 next_cursor = tool.name
                 break
 
@@ -439,8 +535,7 @@ class McpServer:
         result = {"tools": tools_json}
         if next_cursor:
             result["nextCursor"] = next_cursor
-
-        await self._reply_result(id, result)
+        return result
 
     async def _handle_tool_call(self, id: int, params: Dict[str, Any]):
         """
@@ -456,29 +551,135 @@ class McpServer:
         logger.info(f"[MCP] 尝试调用工具: {tool_name}")
 
         # 查找工具
-        tool = None
-        for t in self.tools:
-            if t.name == tool_name:
-                tool = t
-                break
-
+        tool = self._tools_by_name.get(tool_name)
         if not tool:
             await self._reply_error(id, f"Unknown tool: {tool_name}")
             return
 
+        if id in self._calls:
+            await self._reply_error(id, f"Duplicate request id: {id}")
+            return
+
         # 获取参数
         arguments = params.get("arguments", {})
 
         logger.info(f"[MCP] 开始执行工具 {tool_name}, 参数: {arguments}")
 
-        # 异步调用工具
+        # 在独立任务中执行，消息处理立即返回
+        task = asyncio.create_task(
+            self._run_tool_call(id, tool, arguments), name=f"MCP工具-{tool_name}"
+        )
+        self._calls[id] = task
+        task.add_done_callback(lambda t, call_id=id: self._on_call_done(call_id, t))
+
+    async def _run_tool_call(self, id: Any, tool: McpTool, arguments: Dict[str, Any]):
+        """
+        执行一次工具调用并回复结果，超时时回复错误，被取消时不回复.
+        """
+        stats = self._tool_stats.get(tool.name)
+        if stats is None:
+            stats = self._tool_stats[tool.name] = _ToolCallStats()
+        timeout = self._get_tool_timeout(tool)
+
+        stats.calls += 1
+        stats.in_flight += 1
+        started = time.perf_counter()
         try:
-            result = await tool.call(arguments)
-            logger.info(f"[MCP] 工具 {tool_name} 执行成功，结果: {result}")
-            await self._reply_result(id, json.loads(result))
-        except Exception as e:
-            logger.error(f"[MCP] 工具 {tool_name} 执行失败: {e}", exc_info=True)
-            await self._reply_error(id, str(e))
+            result = await asyncio.wait_for(
+                tool.call(arguments, self._get_executor()), timeout
+            )
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logger.warning(f"[MCP] 工具 {tool.name} 执行超时（{timeout}秒）")
+            await self._reply_error(id, f"Tool {tool.name} timed out after {timeout}s")
+            return
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            logger.info(f"[MCP] 工具 {tool.name} 调用已取消, ID={id}")
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.timing.observe((time.perf_counter() - started) * 1000)
+
+        response = json.loads(result)
+        if response.get("isError"):
+            stats.errors += 1
+        logger.info(f"[MCP] 工具 {tool.name} 执行完成，结果: {result}")
+        await self._reply_result(id, response)
+
+    def _on_call_done(self, id: Any, task: asyncio.Task):
+        if self._calls.get(id) is task:
+            del self._calls[id]
+        if not task.cancelled() and task.exception():
+            logger.error(f"[MCP] 工具调用 {id} 异常结束: {task.exception()}")
+
+    def _get_tool_timeout(self, tool: McpTool) -> Optional[float]:
+        """
+        工具超时：配置中的单独设置 > 工具声明 > 默认值，0表示不限制.
+        """
+        timeout = self._tool_timeouts.get(tool.name)
+        if timeout is None:
+            timeout = tool.timeout
+        if timeout is None:
+            timeout = self._default_timeout
+        return timeout or None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, self._tool_threads), thread_name_prefix="mcp-tool"
+            )
+        return self._executor
+
+    def _handle_cancelled(self, params: Dict[str, Any]):
+        """
+        处理服务端的取消通知，按规范被取消的请求不再回复.
+        """
+        request_id = params.get("requestId")
+        task = self._calls.get(request_id)
+        if task is None:
+            logger.info(f"[MCP] 取消的请求 {request_id} 不在执行中")
+            return
+        logger.info(f"[MCP] 取消工具调用 {request_id}: {params.get('reason', '')}")
+        task.cancel()
+
+    def cancel_all(self, reason: str = "") -> int:
+        """取消所有执行中的工具调用.
+
+        已进入线程池的同步回调无法中断，只是不再等待其结果。
+
+        Returns:
+            int: 取消的调用数
+        """
+        tasks = list(self._calls.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            logger.info(f"[MCP] 取消 {len(tasks)} 个执行中的工具调用: {reason}")
+        return len(tasks)
+
+    async def close(self, timeout: float = 2.0):
+        """
+        取消执行中的工具调用并关闭线程池.
+        """
+        tasks = list(self._calls.values())
+        self.cancel_all("服务器关闭")
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取执行中的调用数和各工具的调用统计.
+        """
+        return {
+            "in_flight": len(self._calls),
+            "tools": {
+                name: stats.get_stats() for name, stats in self._tool_stats.items()
+            },
+        }
 
     async def _parse_capabilities(self, capabilities):
         """
@@ -502,13 +703,12 @@ class McpServer:
         """
         发送成功响应.
         """
-        payload = {"jsonrpc": "2.0", "id": id, "result": result}
+        payload = json.dumps({"jsonrpc": "2.0", "id": id, "result": result})
 
-        result_len = len(json.dumps(result))
-        logger.info(f"[MCP] 发送成功响应: ID={id}, 结果长度={result_len}")
+        logger.info(f"[MCP] 发送成功响应: ID={id}, 响应长度={len(payload)}")
 
         if self._send_callback:
-            await self._send_callback(json.dumps(payload))
+            await self._send_callback(payload)
         else:
             logger.error("[MCP] 发送回调未设置!")
 
@@ -0,0 +1,211 @@
+"""UDP音频包重排序.
+
+服务器在每个UDP音频包的16字节nonce中携带序列号，本模块按序列号
+在一个小窗口内重排数据包，丢弃重复和过晚到达的包，并把确认丢失的
+帧以None的形式交给播放层进行补偿。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+_SEQUENCE_MOD = 1 << 32
+
+
+def sequence_delta(sequence: int, reference: int) -> int:
+    """
+    计算32位回绕序列号之间的有符号差值.
+    """
+    delta = (sequence - reference) % _SEQUENCE_MOD
+    if delta >= _SEQUENCE_MOD // 2:
+        delta -= _SEQUENCE_MOD
+    return delta
+
+
+class AudioReorderBuffer:
+    """按序列号重排的音频包窗口.
+
+    push/flush返回按序排列的输出列表，元素为数据包或None（一帧丢失）。
+    UDP接收线程、事件循环和MQTT回调线程都会访问窗口，状态由锁保护。
+    """
+
+    def __init__(self, window: int = 4, max_wait_ms: int = 120):
+        """初始化重排序窗口.
+
+        Args:
+            window: 等待缺失包时最多缓存的乱序包数
+            max_wait_ms: 缺失包的最长等待时间（毫秒）
+        """
+        self.window = max(1, window)
+        self.max_wait = max_wait_ms / 1000
+        self._lock = threading.Lock()
+
+        self._expected: Optional[int] = None
+        # 序列号 -> (到达时间, 数据包)
+        self._pending: Dict[int, Tuple[float, bytes]] = {}
+        # 最近交付的序列号，用于识别重复包
+        self._recent = deque(maxlen=64)
+        self._recent_set = set()
+
+        # 统计信息
+        self.received = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self.late = 0
+        self.lost = 0
+        self.reordered = 0
+        self.max_reorder_depth = 0
+        self._reorder_depth_total = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def last_sequence(self) -> Optional[int]:
+        """
+        最近交付的序列号.
+        """
+        if self._expected is None:
+            return None
+        return (self._expected - 1) % _SEQUENCE_MOD
+
+    def _remember(self, sequence: int):
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_set.discard(self._recent[0])
+        self._recent.append(sequence)
+        self._recent_set.add(sequence)
+
+    def push(self, sequence: int, payload: bytes, now: float = None) -> List:
+        """放入一个数据包.
+
+        Args:
+            sequence: 包序列号
+            payload: 解密后的音频数据
+            now: 到达时间（time.monotonic秒）
+
+        Returns:
+            list: 可以按序交付的数据包，None表示该位置的帧已丢失
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._push(sequence, payload, now)
+
+    def _push(self, sequence: int, payload: bytes, now: float) -> List:
+        self.received += 1
+
+        if self._expected is None:
+            self._expected = sequence
+
+        delta = sequence_delta(sequence, self._expected)
+        if delta < 0:
+            if sequence in self._recent_set:
+                self.duplicates += 1
+            else:
+                self.late += 1
+            return []
+
+        if sequence in self._pending:
+            self.duplicates += 1
+            return []
+
+        output = []
+        if delta == 0:
+            self._deliver(sequence, payload, output)
+            self._drain(output)
+        else:
+            self.reordered += 1
+            self._reorder_depth_total += delta
+            self.max_reorder_depth = max(self.max_reorder_depth, delta)
+            self._pending[sequence] = (now, payload)
+
+        self._flush_expired(now, output)
+        return output
+
+    def flush(self, now: float = None, force: bool = False) -> List:
+        """处理等待超时的缺失包.
+
+        Args:
+            now: 当前时间（time.monotonic秒）
+            force: 为True时不再等待，立即交付所有缓存的包
+
+        Returns:
+            list: 可以按序交付的数据包，None表示该位置的帧已丢失
+        """
+        now = time.monotonic() if now is None else now
+        output = []
+        with self._lock:
+            if force:
+                while self._pending:
+                    self._skip_gap(output)
+            else:
+                self._flush_expired(now, output)
+        return output
+
+    def _deliver(self, sequence: int, payload: bytes, output: List):
+        output.append(payload)
+        self.delivered += 1
+        self._remember(sequence)
+        self._expected = (sequence + 1) % _SEQUENCE_MOD
+
+    def _drain(self, output: List):
+        """
+        交付从期望序列号开始连续的缓存包.
+        """
+        while self._expected in self._pending:
+            sequence = self._expected
+            _, payload = self._pending.pop(sequence)
+            self._deliver(sequence, payload, output)
+
+    def _flush_expired(self, now: float, output: List):
+        while self._pending:
+            oldest = min(arrival for arrival, _ in self._pending.values())
+            if len(self._pending) <= self.window and now - oldest < self.max_wait:
+                break
+            self._skip_gap(output)
+
+    def _skip_gap(self, output: List):
+        """
+        放弃等待当前缺口，跳到最小的缓存序列号.
+        """
+        next_sequence = min(
+            self._pending, key=lambda seq: sequence_delta(seq, self._expected)
+        )
+        missing = sequence_delta(next_sequence, self._expected)
+        self.lost += missing
+        # 只为窗口内的缺口生成补偿帧，过大的跳变视为重新同步
+        output.extend([None] * min(missing, self.window))
+        self._expected = next_sequence
+        self._drain(output)
+
+    def reset(self):
+        """
+        新会话开始时重置状态.
+        """
+        with self._lock:
+            self._expected = None
+            self._pending.clear()
+            self._recent.clear()
+            self._recent_set.clear()
+
+    def get_stats(self) -> dict:
+        """
+        获取重排序和丢包统计.
+        """
+        expected_total = self.delivered + self.lost
+        return {
+            "received": self.received,
+            "delivered": self.delivered,
+            "duplicates": self.duplicates,
+            "late": self.late,
+            "lost": self.lost,
+            "loss_rate": round(self.lost / expected_total, 4) if expected_total else 0.0,
+            "reordered": self.reordered,
+            "max_reorder_depth": self.max_reorder_depth,
+            "avg_reorder_depth": (
+                round(self._reorder_depth_total / self.reordered, 2)
+                if self.reordered
+                else 0.0
+            ),
+            "pending": len(self._pending),
+        }
@@ -5,18 +5,40 @@ import threading
 import time
 
 import paho.mqtt.client as mqtt
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
 from src.constants.constants import AudioConfig
+from src.protocols.audio_reorder import AudioReorderBuffer
 from src.protocols.protocol import Protocol
+from src.protocols.udp_crypto import AesCtrPacketCipher
 from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
+from src.utils.metrics import LatencyHistogram
 
 # 配置日志
 logger = get_logger(__name__)
 
 
+class _UdpAudioProtocol(asyncio.DatagramProtocol):
+    """
+    事件循环中的UDP音频接收端点.
+    """
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    def datagram_received(self, data, addr):
+        self._owner._on_udp_datagram(data)
+
+    def error_received(self, exc):
+        logger.warning(f"UDP接收错误: {exc}")
+
+    def connection_lost(self, exc):
+        if exc:
+            logger.warning(f"UDP数据报端点异常关闭: {exc}")
+        else:
+            logger.info("UDP数据报端点已关闭")
+
+
 class MqttProtocol(Protocol):
     def __init__(self, loop):
         super().__init__()
@@ -26,6 +48,7 @@ class MqttProtocol(Protocol):
         self.udp_socket = None
         self.udp_thread = None
         self.udp_running = False
+        self.udp_transport = None
         self.connected = False
 
         # 连接状态监控
@@ -53,6 +76,31 @@ class MqttProtocol(Protocol):
         self.aes_nonce = None
         self.local_sequence = 0
         self.remote_sequence = 0
+        # 每个会话解析一次的加解密器
+        self._udp_cipher = None
+
+        # 下行音频按序列号重排
+        self._audio_reorder = AudioReorderBuffer(
+            window=self.config.get_config("AUDIO_OPTIONS.UDP_REORDER_WINDOW", 4),
+            max_wait_ms=self.config.get_config(
+                "AUDIO_OPTIONS.UDP_REORDER_WAIT_MS", AudioConfig.FRAME_DURATION * 2
+            ),
+        )
+        self._malformed_packets = 0
+        self._udp_packet_count = 0
+        self._reorder_flush_handle = None
+        # UDP接收方式: "thread" 阻塞接收线程, "asyncio" 事件循环数据报端点
+        self._udp_receiver_mode = self.config.get_config(
+            "SYSTEM_OPTIONS.NETWORK.MQTT_UDP_RECEIVER", "thread"
+        )
+
+        # 发布确认: mid -> (Future或None, 发布时间)，由on_publish回调完成
+        self._publish_lock = threading.Lock()
+        self._pending_publishes = {}
+        # on_publish先于登记到达的mid -> 完成时间
+        self._early_publishes = {}
+        self._publish_timeout = 10.0
+        self._publish_latency = LatencyHistogram()
 
         # 事件
         self.server_hello_event = asyncio.Event()
@@ -219,6 +267,9 @@ class MqttProtocol(Protocol):
                 was_connected = self.connected
                 self.connected = False
 
+                # 断开后未完成的发布不会再收到确认
+                self.loop.call_soon_threadsafe(self._fail_pending_publishes)
+
                 # 通知连接状态变化
                 if self._on_connection_state_changed and was_connected:
                     reason = "正常断开" if rc == 0 else f"异常断开(rc={rc})"
@@ -269,6 +320,7 @@ class MqttProtocol(Protocol):
             MQTT消息发布回调.
             """
             self._last_activity_time = time.time()  # 更新活动时间
+            self._complete_publish(mid)
 
         def on_subscribe_callback(client, userdata, mid, granted_qos):
             """
@@ -331,23 +383,12 @@ class MqttProtocol(Protocol):
                     await self._on_network_error("等待响应超时")
                 return False
 
-            # 创建UDP套接字
+            # 创建UDP套接字并启动接收
             try:
-                if self.udp_socket:
-                    self.udp_socket.close()
-
-                self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                self.udp_socket.settimeout(0.5)
-
-                # 启动UDP接收线程
-                if self.udp_thread and self.udp_thread.is_alive():
-                    self.udp_running = False
-                    self.udp_thread.join(1.0)
-
-                self.udp_running = True
-                self.udp_thread = threading.Thread(target=self._udp_receive_thread)
-                self.udp_thread.daemon = True
-                self.udp_thread.start()
+                if self._udp_receiver_mode == "asyncio":
+                    await self._start_udp_endpoint()
+                else:
+                    self._start_udp_thread()
 
                 self.connected = True
                 self._reconnect_attempts = 0  # 重置重连计数
@@ -406,10 +447,16 @@ class MqttProtocol(Protocol):
                 self.udp_port = udp.get("port")
                 self.aes_key = udp.get("key")
                 self.aes_nonce = udp.get("nonce")
+                try:
+                    self._udp_cipher = AesCtrPacketCipher(self.aes_key, self.aes_nonce)
+                except (TypeError, ValueError) as e:
+                    logger.error(f"UDP加密参数无效: {e}")
+                    return
 
                 # 重置序列号
                 self.local_sequence = 0
                 self.remote_sequence = 0
+                self._audio_reorder.reset()
 
                 logger.info(
                     f"收到服务器hello响应，UDP服务器: {self.udp_server}:{self.udp_port}"
@@ -442,6 +489,41 @@ class MqttProtocol(Protocol):
         except Exception as e:
             logger.error(f"处理MQTT消息时出错: {e}")
 
+    def _start_udp_thread(self):
+        """
+        创建阻塞UDP套接字并启动接收线程.
+        """
+        if self.udp_socket:
+            self.udp_socket.close()
+
+        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_socket.settimeout(0.5)
+
+        if self.udp_thread and self.udp_thread.is_alive():
+            self.udp_running = False
+            self.udp_thread.join(1.0)
+
+        self.udp_running = True
+        self.udp_thread = threading.Thread(target=self._udp_receive_thread)
+        self.udp_thread.daemon = True
+        self.udp_thread.start()
+
+    async def _start_udp_endpoint(self):
+        """
+        在事件循环中创建UDP数据报端点，解密和分发都在循环线程完成.
+        """
+        self._close_udp_transport()
+        transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: _UdpAudioProtocol(self),
+            local_addr=("0.0.0.0", 0),
+            family=socket.AF_INET,
+        )
+        self.udp_transport = transport
+        self.udp_running = True
+        logger.info(
+            f"UDP数据报端点已创建，接收来自 {self.udp_server}:{self.udp_port} 的数据"
+        )
+
     def _udp_receive_thread(self):
         """UDP接收线程.
 
@@ -452,54 +534,19 @@ class MqttProtocol(Protocol):
         )
 
         self.udp_running = True
-        debug_counter = 0
 
         while self.udp_running:
             try:
                 data, addr = self.udp_socket.recvfrom(4096)
-                debug_counter += 1
-
                 try:
-                    # 验证数据包
-                    if len(data) < 16:  # 至少需要16字节的nonce
-                        logger.error(f"无效的音频数据包大小: {len(data)}")
-                        continue
-
-                    # 分离nonce和加密数据
-                    received_nonce = data[:16]
-                    encrypted_audio = data[16:]
-
-                    # 使用AES-CTR解密
-                    decrypted = self.aes_ctr_decrypt(
-                        bytes.fromhex(self.aes_key), received_nonce, encrypted_audio
-                    )
-
-                    # 调试信息
-                    if debug_counter % 100 == 0:
-                        logger.debug(
-                            f"已解密音频数据包 #{debug_counter}, 大小: {len(decrypted)} 字节"
-                        )
-
-                    # 处理解密后的音频数据
-                    if self._on_incoming_audio:
-
-                        def process_audio(audio_data=decrypted):
-                            if asyncio.iscoroutinefunction(self._on_incoming_audio):
-                                coro = self._on_incoming_audio(audio_data)
-                                if coro is not None:
-                                    asyncio.create_task(coro)
-                            else:
-                                self._on_incoming_audio(audio_data)
-
-                        self.loop.call_soon_threadsafe(process_audio)
-
+                    self._dispatch_audio(self._handle_udp_packet(data))
                 except Exception as e:
                     logger.error(f"处理音频数据包错误: {e}")
                     continue
 
             except socket.timeout:
-                # 超时是正常的，继续循环
-                pass
+                # 超时是正常的，放弃等待迟迟未到的缺失包
+                self._dispatch_audio(self._audio_reorder.flush(time.monotonic()))
             except Exception as e:
                 logger.error(f"UDP接收线程错误: {e}")
                 if not self.udp_running:
@@ -508,53 +555,266 @@ class MqttProtocol(Protocol):
 
         logger.info("UDP接收线程已停止")
 
-    async def send_text(self, message):
+    def _handle_udp_packet(self, data):
+        """验证、解密UDP音频包并放入重排序窗口.
+
+        Returns:
+            list: 可以按序交付的数据包，None表示该位置的帧已丢失
         """
-        发送文本消息.
+        self._udp_packet_count += 1
+
+        # 验证数据包
+        if len(data) < 16:  # 至少需要16字节的nonce
+            logger.error(f"无效的音频数据包大小: {len(data)}")
+            return []
+
+        # 分离nonce和加密数据
+        received_nonce = data[:16]
+        encrypted_audio = data[16:]
+
+        # nonce中携带数据长度(2-4字节)和序列号(12-16字节)
+        payload_length = int.from_bytes(received_nonce[2:4], "big")
+        sequence = int.from_bytes(received_nonce[12:16], "big")
+        if payload_length != len(encrypted_audio):
+            self._malformed_packets += 1
+            logger.debug(
+                f"音频数据包长度不匹配: 声明 {payload_length}，"
+                f"实际 {len(encrypted_audio)}"
+            )
+            return []
+
+        # 使用AES-CTR解密
+        decrypted = self._udp_cipher.decrypt(received_nonce, encrypted_audio)
+
+        # 调试信息
+        if self._udp_packet_count % 100 == 0:
+            logger.debug(
+                f"已解密音频数据包 #{self._udp_packet_count}, 大小: {len(decrypted)} 字节"
+            )
+
+        return self._audio_reorder.push(sequence, decrypted, time.monotonic())
+
+    def _on_udp_datagram(self, data):
+        """
+        数据报端点收到数据包（事件循环线程）.
+        """
+        try:
+            self._deliver_audio(self._handle_udp_packet(data))
+        except Exception as e:
+            logger.error(f"处理音频数据包错误: {e}")
+        self._schedule_reorder_flush()
+
+    def _schedule_reorder_flush(self):
+        """
+        重排序窗口中有等待的包时，按最长等待时间安排一次超时处理.
+        """
+        if len(self._audio_reorder) and self._reorder_flush_handle is None:
+            self._reorder_flush_handle = self.loop.call_later(
+                self._audio_reorder.max_wait, self._on_reorder_timeout
+            )
+
+    def _on_reorder_timeout(self):
+        self._reorder_flush_handle = None
+        if self.udp_transport is None:
+            return
+        self._deliver_audio(self._audio_reorder.flush(time.monotonic()))
+        self._schedule_reorder_flush()
+
+    def _dispatch_audio(self, items):
+        """
+        从接收线程把重排后的音频交给事件循环处理.
+        """
+        if items:
+            self.loop.call_soon_threadsafe(self._deliver_audio, items)
+
+    def _deliver_audio(self, items):
+        """将重排后的音频交给上层（事件循环线程）.
+
+        Args:
+            items: 按序排列的数据包列表，None表示该位置的帧已丢失
+        """
+        if not items:
+            return
+
+        self.remote_sequence = self._audio_reorder.last_sequence or 0
+
+        # 有批量回调时，两个丢帧位置之间的连续数据包整批交付
+        batch = [] if self._on_incoming_audio_batch else None
+        lost = 0
+        for audio_data in items:
+            if audio_data is None:
+                lost += 1
+                continue
+            if lost:
+                if batch:
+                    self._on_incoming_audio_batch(batch)
+                    batch = []
+                self._notify_audio_lost(lost)
+                lost = 0
+            if batch is not None:
+                batch.append(audio_data)
+                continue
+            if not self._on_incoming_audio:
+                continue
+            if asyncio.iscoroutinefunction(self._on_incoming_audio):
+                coro = self._on_incoming_audio(audio_data)
+                if coro is not None:
+                    asyncio.create_task(coro)
+            else:
+                self._on_incoming_audio(audio_data)
+        if batch:
+            self._on_incoming_audio_batch(batch)
+        if lost:
+            self._notify_audio_lost(lost)
+
+    def _notify_audio_lost(self, count):
+        """通知播放层补偿丢失的帧.
+
+        音频回调是协程时，之前的数据包在各自的任务中写入，丢帧通知也经
+        call_soon排到这些任务之后，保证丢帧标记落在缺口的正确位置。
+        """
+        if not self._on_incoming_audio_lost:
+            return
+        if self._on_incoming_audio_batch is None and asyncio.iscoroutinefunction(
+            self._on_incoming_audio
+        ):
+            self.loop.call_soon(self._on_incoming_audio_lost, count)
+        else:
+            self._on_incoming_audio_lost(count)
+
+    async def send_text(self, message):
+        """发送文本消息.
+
+        发布确认通过on_publish回调桥接到Future，等待期间不阻塞事件循环。
         """
         if not self.mqtt_client:
             logger.error("MQTT客户端未初始化")
             return False
 
+        mid = None
         try:
-            result = self.mqtt_client.publish(self.publish_topic, message)
-            result.wait_for_publish()
+            future = self.loop.create_future()
+            mid = self._publish(message, future)
+            if mid is None:
+                return False
+            await asyncio.wait_for(future, timeout=self._publish_timeout)
             return True
+        except asyncio.TimeoutError:
+            logger.error(f"等待MQTT消息发布确认超时 ({self._publish_timeout}秒)")
+            with self._publish_lock:
+                self._pending_publishes.pop(mid, None)
+            return False
+        except ConnectionError as e:
+            # 断开由on_disconnect统一处理
+            logger.warning(f"MQTT消息未能发布: {e}")
+            return False
         except Exception as e:
             logger.error(f"发送MQTT消息失败: {e}")
             if self._on_network_error:
                 await self._on_network_error(f"发送MQTT消息失败: {e}")
             return False
 
+    def send_text_nowait(self, message) -> bool:
+        """
+        发布文本消息但不等待确认，仍记录发布往返延迟.
+        """
+        if not self.mqtt_client:
+            logger.error("MQTT客户端未初始化")
+            return False
+
+        try:
+            return self._publish(message, None) is not None
+        except Exception as e:
+            logger.error(f"发送MQTT消息失败: {e}")
+            return False
+
+    def _publish(self, message, future):
+        """发布消息并登记等待确认.
+
+        Args:
+            message: 消息内容
+            future: 确认后完成的Future，为None时只统计延迟
+
+        Returns:
+            消息ID，发布失败时返回None
+        """
+        started = time.monotonic()
+        result = self.mqtt_client.publish(self.publish_topic, message)
+        if result.rc != mqtt.MQTT_ERR_SUCCESS:
+            logger.error(f"MQTT消息发布失败: {mqtt.error_string(result.rc)}")
+            return None
+
+        with self._publish_lock:
+            completed = self._early_publishes.pop(result.mid, None)
+            if completed is None:
+                self._pending_publishes[result.mid] = (future, started)
+
+        if completed is not None:
+            # 确认在登记之前已经到达
+            self._publish_latency.observe((completed - started) * 1000)
+            if future is not None and not future.done():
+                future.set_result(True)
+        return result.mid
+
+    def _complete_publish(self, mid):
+        """
+        处理发布确认（MQTT网络线程）.
+        """
+        now = time.monotonic()
+        with self._publish_lock:
+            entry = self._pending_publishes.pop(mid, None)
+            if entry is None:
+                # 防止异常情况下无限增长
+                if len(self._early_publishes) > 1000:
+                    self._early_publishes.clear()
+                self._early_publishes[mid] = now
+                return
+
+        future, started = entry
+        self._publish_latency.observe((now - started) * 1000)
+        if future is not None:
+            self.loop.call_soon_threadsafe(self._resolve_publish, future)
+
+    @staticmethod
+    def _resolve_publish(future):
+        if not future.done():
+            future.set_result(True)
+
+    def _fail_pending_publishes(self):
+        """
+        连接断开时结束所有等待中的发布.
+        """
+        with self._publish_lock:
+            pending = list(self._pending_publishes.values())
+            self._pending_publishes.clear()
+            self._early_publishes.clear()
+
+        for future, _ in pending:
+            if future is not None and not future.done():
+                future.set_exception(ConnectionError("MQTT连接已断开"))
+
     async def send_audio(self, audio_data):
         """发送音频数据.
 
         参考 audio_sender.py 的实现方式
         """
-        if not self.udp_socket or not self.udp_server or not self.udp_port:
+        cipher = self._udp_cipher
+        udp_ready = self.udp_socket or self.udp_transport
+        if not udp_ready or not self.udp_server or not self.udp_port or not cipher:
             logger.error("UDP通道未初始化")
             return False
 
         try:
-            # 生成新的nonce (类似于 audio_sender.py 中的实现)
-            # 格式: 0x01 (1字节) + 0x00 (3字节) + 长度 (2字节) + 原始nonce (8字节) + 序列号 (8字节)
+            # nonce格式: 前缀 (2字节) + 长度 (2字节) + 原始nonce (8字节) + 序列号 (4字节)
             self.local_sequence = (self.local_sequence + 1) & 0xFFFFFFFF
-            new_nonce = (
-                self.aes_nonce[:4]  # 固定前缀
-                + format(len(audio_data), "04x")  # 数据长度
-                + self.aes_nonce[8:24]  # 原始nonce
-                + format(self.local_sequence, "08x")  # 序列号
-            )
-
-            encrypt_encoded_data = self.aes_ctr_encrypt(
-                bytes.fromhex(self.aes_key), bytes.fromhex(new_nonce), bytes(audio_data)
-            )
-
-            # 拼接nonce和密文
-            packet = bytes.fromhex(new_nonce) + encrypt_encoded_data
+            packet = cipher.encrypt_packet(self.local_sequence, audio_data)
 
             # 发送数据包
-            self.udp_socket.sendto(packet, (self.udp_server, self.udp_port))
+            if self.udp_transport is not None:
+                self.udp_transport.sendto(packet, (self.udp_server, self.udp_port))
+            else:
+                self.udp_socket.sendto(packet, (self.udp_server, self.udp_port))
+            self._note_audio_sent()
 
             # 每发送10个包打印一次日志
             if self.local_sequence % 10 == 0:
@@ -563,7 +823,6 @@ class MqttProtocol(Protocol):
                     f"{self.udp_server}:{self.udp_port}"
                 )
 
-            self.local_sequence += 1
             return True
         except Exception as e:
             logger.error(f"发送音频数据失败: {e}")
@@ -615,39 +874,10 @@ class MqttProtocol(Protocol):
             return False
 
         # 检查UDP连接状态
+        if self.udp_transport is not None:
+            return not self.udp_transport.is_closing()
         return self.udp_socket is not None and self.udp_running
 
-    def aes_ctr_encrypt(self, key, nonce, plaintext):
-        """AES-CTR模式加密函数
-        Args:
-            key: bytes格式的加密密钥
-            nonce: bytes格式的初始向量
-            plaintext: 待加密的原始数据
-        Returns:
-            bytes格式的加密数据
-        """
-        cipher = Cipher(
-            algorithms.AES(key), modes.CTR(nonce), backend=default_backend()
-        )
-        encryptor = cipher.encryptor()
-        return encryptor.update(plaintext) + encryptor.finalize()
-
-    def aes_ctr_decrypt(self, key, nonce, ciphertext):
-        """AES-CTR模式解密函数
-        Args:
-            key: bytes格式的解密密钥
-            nonce: bytes格式的初始向量（需要与加密时使用的相同）
-            ciphertext: bytes格式的加密数据
-        Returns:
-            bytes格式的解密后的原始数据
-        """
-        cipher = Cipher(
-            algorithms.AES(key), modes.CTR(nonce), backend=default_backend()
-        )
-        decryptor = cipher.decryptor()
-        plaintext = decryptor.update(ciphertext) + decryptor.finalize()
-        return plaintext
-
     async def _handle_goodbye(self):
         """
         处理goodbye消息.
@@ -660,6 +890,9 @@ class MqttProtocol(Protocol):
                 self.udp_thread = None
             logger.info("UDP接收线程已停止")
 
+            # 关闭UDP数据报端点
+            self._close_udp_transport()
+
             # 关闭UDP套接字
             if self.udp_socket:
                 try:
@@ -677,6 +910,7 @@ class MqttProtocol(Protocol):
                 except Exception as e:
                     logger.error(f"断开MQTT连接失败: {e}")
                 self.mqtt_client = None
+            self._fail_pending_publishes()
 
             # 重置所有状态
             self.connected = False
@@ -687,6 +921,7 @@ class MqttProtocol(Protocol):
             self.udp_port = 0
             self.aes_key = None
             self.aes_nonce = None
+            self._udp_cipher = None
 
             # 调用音频通道关闭回调
             if self._on_audio_channel_closed:
@@ -718,6 +953,38 @@ class MqttProtocol(Protocol):
             except Exception as e:
                 logger.error(f"关闭UDP套接字失败: {e}")
 
+        # 关闭UDP数据报端点
+        self._close_udp_transport()
+
+    def _close_udp_transport(self):
+        """关闭UDP数据报端点.
+
+        端点关闭是即时的，不需要像接收线程那样等待超时。
+        可能从MQTT回调线程调用，此时转交事件循环执行。
+        """
+        transport = getattr(self, "udp_transport", None)
+        self.udp_transport = None
+        handle = getattr(self, "_reorder_flush_handle", None)
+        self._reorder_flush_handle = None
+        if handle is not None:
+            handle.cancel()
+        if transport is None:
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        try:
+            if running_loop is self.loop:
+                transport.close()
+            else:
+                self.loop.call_soon_threadsafe(transport.close)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
     def __del__(self):
         """
         析构函数，清理资源.
@@ -903,6 +1170,12 @@ class MqttProtocol(Protocol):
                 f"{self.udp_server}:{self.udp_port}" if self.udp_server else None
             ),
             "session_id": self.session_id,
+            "pending_publishes": len(self._pending_publishes),
+            "publish_latency": self._publish_latency.snapshot(),
+            "udp_audio": {
+                **self._audio_reorder.get_stats(),
+                "malformed": self._malformed_packets,
+            },
         }
 
     async def _cleanup_connection(self):
@@ -929,6 +1202,7 @@ class MqttProtocol(Protocol):
                 self.mqtt_client.disconnect()
             except Exception as e:
                 logger.error(f"断开MQTT连接时出错: {e}")
+        self._fail_pending_publishes()
 
         # 重置时间戳
         self._last_activity_time = None
@@ -1,7 +1,10 @@
+import asyncio
 import json
+import time
 
 from src.constants.constants import AbortReason, ListeningMode
 from src.utils.logging_config import get_logger
+from src.utils.metrics import LatencyHistogram
 
 logger = get_logger(__name__)
 
@@ -12,12 +15,21 @@ class Protocol:
         # 初始化回调函数为None
         self._on_incoming_json = None
         self._on_incoming_audio = None
+        self._on_incoming_audio_batch = None
+        self._on_incoming_audio_lost = None
         self._on_audio_channel_opened = None
         self._on_audio_channel_closed = None
         self._on_network_error = None
         # 新增连接状态变化回调
         self._on_connection_state_changed = None
         self._on_reconnecting = None
+        # 不等待完成的后台发送任务，保持引用直到结束
+        self._background_sends = set()
+        # 唤醒到首个音频包发出的延迟
+        self._wake_time = None
+        self._wake_to_first_byte = LatencyHistogram(
+            (50, 100, 200, 300, 500, 800, 1000, 1500, 2000, 3000, 5000)
+        )
 
     def on_incoming_json(self, callback):
         """
@@ -31,6 +43,25 @@ class Protocol:
         """
         self._on_incoming_audio = callback
 
+    def on_incoming_audio_batch(self, callback):
+        """设置批量音频数据接收回调函数.
+
+        设置后，协议一次交付多个按序数据包时整批调用该回调，
+        未设置时逐包调用on_incoming_audio的回调。
+
+        Args:
+            callback: 回调函数，接收参数 (packets: list[bytes])
+        """
+        self._on_incoming_audio_batch = callback
+
+    def on_incoming_audio_lost(self, callback):
+        """设置音频丢帧回调函数.
+
+        Args:
+            callback: 回调函数，接收参数 (count: int)，表示按序列号确认丢失的帧数
+        """
+        self._on_incoming_audio_lost = callback
+
     def on_audio_channel_opened(self, callback):
         """
         设置音频通道打开回调函数.
@@ -71,6 +102,45 @@ class Protocol:
         """
         raise NotImplementedError("send_text方法必须由子类实现")
 
+    def mark_wake_time(self, timestamp: float = None):
+        """记录唤醒时间，下一次发出音频包时统计唤醒到首包的延迟.
+
+        Args:
+            timestamp: time.monotonic()时间，默认为当前时间
+        """
+        self._wake_time = time.monotonic() if timestamp is None else timestamp
+
+    def _note_audio_sent(self):
+        """
+        音频包写出后调用，统计唤醒到首包的延迟.
+        """
+        if self._wake_time is None:
+            return
+        latency_ms = (time.monotonic() - self._wake_time) * 1000
+        self._wake_time = None
+        self._wake_to_first_byte.observe(latency_ms)
+        logger.info(f"唤醒到首个音频包发出耗时: {latency_ms:.0f}ms")
+
+    def get_wake_latency_stats(self) -> dict:
+        """
+        获取唤醒到首个音频包发出的延迟统计.
+        """
+        return self._wake_to_first_byte.snapshot()
+
+    def send_text_nowait(self, message) -> bool:
+        """发送文本消息但不等待发送完成.
+
+        适合IoT状态变化等高频、可丢失的消息。默认在后台任务中调用send_text，
+        子类可以提供更轻量的实现。
+
+        Returns:
+            bool: 消息是否已提交发送
+        """
+        task = asyncio.create_task(self.send_text(message))
+        self._background_sends.add(task)
+        task.add_done_callback(self._background_sends.discard)
+        return True
+
     async def send_audio(self, data: bytes):
         """
         发送音频数据的抽象方法，需要在子类中实现.
@@ -197,7 +267,8 @@ class Protocol:
             "update": True,
             "states": states_data,
         }
-        await self.send_text(json.dumps(message))
+        # 状态上报频率高，不等待发送完成
+        self.send_text_nowait(json.dumps(message))
 
     async def send_mcp_message(self, payload):
         """
@@ -0,0 +1,90 @@
+"""UDP音频包的AES-CTR加解密.
+
+每个会话只解析一次密钥和nonce模板，发送时把长度和序列号直接写入
+预分配的数据包缓冲区，并用update_into把密文写到nonce之后，
+避免逐包的十六进制转换、字符串拼接和bytes拷贝。
+"""
+
+import struct
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+NONCE_SIZE = 16
+# update_into要求输出缓冲区比输入多出 block_size - 1 字节
+_UPDATE_INTO_SLACK = algorithms.AES.block_size // 8 - 1
+
+_LENGTH = struct.Struct(">H")
+_SEQUENCE = struct.Struct(">I")
+
+
+class AesCtrPacketCipher:
+    """UDP音频包加解密器.
+
+    nonce布局: 前缀(2字节) + 数据长度(2字节) + 会话nonce(8字节) + 序列号(4字节)，
+    其中前缀和会话nonce直接取自服务器下发的nonce。
+    """
+
+    def __init__(self, key_hex: str, nonce_hex: str, max_payload: int = 4096):
+        """初始化加解密器.
+
+        Args:
+            key_hex: 十六进制AES密钥
+            nonce_hex: 十六进制nonce模板（16字节）
+            max_payload: 预分配的最大音频数据长度
+        """
+        nonce = bytes.fromhex(nonce_hex)
+        if len(nonce) != NONCE_SIZE:
+            raise ValueError(f"nonce长度必须为{NONCE_SIZE}字节: {len(nonce)}")
+
+        # AES对象只保存密钥，可以在多个线程的Cipher之间共享
+        self._algorithm = algorithms.AES(bytes.fromhex(key_hex))
+
+        self._packet = bytearray(NONCE_SIZE + max_payload + _UPDATE_INTO_SLACK)
+        self._packet[:NONCE_SIZE] = nonce
+        self._view = memoryview(self._packet)
+
+    def _ensure_capacity(self, payload_size: int):
+        needed = NONCE_SIZE + payload_size + _UPDATE_INTO_SLACK
+        if needed > len(self._packet):
+            packet = bytearray(needed)
+            packet[:NONCE_SIZE] = self._packet[:NONCE_SIZE]
+            self._packet = packet
+            self._view = memoryview(packet)
+
+    def encrypt_packet(self, sequence: int, payload) -> memoryview:
+        """加密一个音频包.
+
+        只在发送协程中调用。返回的视图指向内部缓冲区，
+        在下一次调用前有效，应立即发送。
+
+        Args:
+            sequence: 包序列号
+            payload: 音频数据
+
+        Returns:
+            memoryview: nonce + 密文
+        """
+        size = len(payload)
+        self._ensure_capacity(size)
+        _LENGTH.pack_into(self._packet, 2, size)
+        _SEQUENCE.pack_into(self._packet, 12, sequence & 0xFFFFFFFF)
+
+        nonce = bytes(self._view[:NONCE_SIZE])
+        encryptor = Cipher(self._algorithm, modes.CTR(nonce)).encryptor()
+        written = encryptor.update_into(payload, self._view[NONCE_SIZE:])
+        return self._view[: NONCE_SIZE + written]
+
+    def decrypt(self, nonce: bytes, ciphertext: bytes) -> bytes:
+        """解密一个音频包.
+
+        CTR模式没有填充，finalize不产生数据，因此省略。
+
+        Args:
+            nonce: 数据包携带的16字节nonce
+            ciphertext: 密文
+
+        Returns:
+            bytes: 明文音频数据
+        """
+        decryptor = Cipher(self._algorithm, modes.CTR(nonce)).decryptor()
+        return decryptor.update(ciphertext)
@@ -2,6 +2,7 @@ import asyncio
 import json
 import ssl
 import time
+from collections import deque
 
 import websockets
 
@@ -9,6 +10,7 @@ from src.constants.constants import AudioConfig
 from src.protocols.protocol import Protocol
 from src.utils.config_manager import ConfigManager
 from src.utils.logging_config import get_logger
+from src.utils.metrics import LatencyHistogram
 
 ssl_context = ssl._create_unverified_context()
 
@@ -38,6 +40,37 @@ class WebsocketProtocol(Protocol):
         self._max_reconnect_attempts = 0  # 默认不重连
         self._auto_reconnect_enabled = False  # 默认关闭自动重连
 
+        # 发送队列：由单个写协程按序发送，控制消息优先于音频
+        self._control_queue = deque()
+        self._audio_queue = deque()
+        self._audio_queue_size = max(
+            1,
+            self.config.get_config(
+                "SYSTEM_OPTIONS.NETWORK.WEBSOCKET_AUDIO_QUEUE_SIZE", 50
+            ),
+        )
+        # 音频积压满时的丢弃策略: "oldest" 丢弃最旧的帧, "newest" 丢弃新到的帧
+        self._audio_drop_policy = self.config.get_config(
+            "SYSTEM_OPTIONS.NETWORK.WEBSOCKET_AUDIO_DROP_POLICY", "oldest"
+        )
+        self._send_event = None
+        self._writer_task = None
+        self._audio_dropped = 0
+        self._audio_max_depth = 0
+        self._control_max_depth = 0
+        self._control_send_latency = LatencyHistogram()
+        self._audio_send_latency = LatencyHistogram()
+
+        # 连接预热：会话结束后在后台重新建立已完成hello的连接，
+        # 音频通道打开回调推迟到连接真正被使用时
+        self.prewarm_enabled = self.config.get_config(
+            "SYSTEM_OPTIONS.NETWORK.WEBSOCKET_PREWARM", False
+        )
+        self._warm = False
+        self._dialing_warm = False
+        self._prewarm_task = None
+        self._prewarm_failures = 0
+
         self.WEBSOCKET_URL = self.config.get_config(
             "SYSTEM_OPTIONS.NETWORK.WEBSOCKET_URL"
         )
@@ -55,13 +88,37 @@ class WebsocketProtocol(Protocol):
         }
 
     async def connect(self) -> bool:
-        """
-        连接到WebSocket服务器.
+        """连接到WebSocket服务器.
+
+        已有预热好的连接时直接启用该连接，不再重新握手。
         """
         if self._is_closing:
             logger.warning("连接正在关闭中，取消新的连接尝试")
             return False
 
+        # 预热拨号进行中时等待其完成，避免重复建立连接
+        prewarm_task = self._prewarm_task
+        if prewarm_task and not prewarm_task.done():
+            await asyncio.wait({prewarm_task})
+
+        if self._warm:
+            if self._socket_open():
+                return await self._activate_warm_connection()
+            await self._cleanup_connection()
+        elif self.prewarm_enabled and self.is_audio_channel_opened():
+            # 预热模式下复用仍然打开的连接
+            return True
+
+        return await self._dial(warm=False)
+
+    async def _dial(self, warm: bool) -> bool:
+        """建立WebSocket连接并完成hello握手.
+
+        Args:
+            warm: 为True时作为预热连接建立，失败不通知上层，
+                  音频通道打开回调推迟到连接被使用时
+        """
+        self._dialing_warm = warm
         try:
             # 在连接时创建 Event，确保在正确的事件循环中
             self.hello_received = asyncio.Event()
@@ -97,8 +154,9 @@ class WebsocketProtocol(Protocol):
                     compression=None,  # 禁用压缩
                 )
 
-            # 启动消息处理循环
+            # 启动消息处理循环和发送协程
             asyncio.create_task(self._message_handler())
+            self._start_writer()
 
             # 注释掉自定义心跳，使用websockets内置的心跳机制
             # self._start_heartbeat()
@@ -130,24 +188,98 @@ class WebsocketProtocol(Protocol):
                 self._reconnect_attempts = 0  # 重置重连计数
                 logger.info("已连接到WebSocket服务器")
 
-                # 通知连接状态变化
-                if self._on_connection_state_changed:
+                # 通知连接状态变化（预热连接在被使用时通知）
+                if self._on_connection_state_changed and not warm:
                     self._on_connection_state_changed(True, "连接成功")
 
                 return True
             except asyncio.TimeoutError:
                 logger.error("等待服务器hello响应超时")
                 await self._cleanup_connection()
-                if self._on_network_error:
+                if self._on_network_error and not warm:
                     self._on_network_error("等待响应超时")
                 return False
 
         except Exception as e:
             logger.error(f"WebSocket连接失败: {e}")
             await self._cleanup_connection()
-            if self._on_network_error:
+            if self._on_network_error and not warm:
                 self._on_network_error(f"无法连接服务: {str(e)}")
             return False
+        finally:
+            self._dialing_warm = False
+
+    async def _activate_warm_connection(self) -> bool:
+        """
+        启用预热连接，补发推迟的音频通道打开回调.
+        """
+        self._warm = False
+        logger.info("使用预热的WebSocket连接")
+        if self._on_connection_state_changed:
+            self._on_connection_state_changed(True, "连接成功")
+        if self._on_audio_channel_opened:
+            await self._on_audio_channel_opened()
+        return True
+
+    def enable_prewarm(self, enabled: bool = True):
+        """启用或禁用连接预热.
+
+        Args:
+            enabled: 是否在空闲时保持一条预热连接
+        """
+        self.prewarm_enabled = enabled
+        if enabled:
+            logger.info("启用WebSocket连接预热")
+            self.schedule_prewarm()
+            return
+
+        if self._prewarm_task and not self._prewarm_task.done():
+            self._prewarm_task.cancel()
+        self._prewarm_task = None
+        if self._warm:
+            asyncio.create_task(self._cleanup_connection())
+        logger.info("禁用WebSocket连接预热")
+
+    def schedule_prewarm(self, delay: float = 0.0):
+        """
+        在后台建立预热连接（已连接或正在拨号时忽略）.
+        """
+        if not self.prewarm_enabled or self._is_closing or self.websocket:
+            return
+        if self._prewarm_task and not self._prewarm_task.done():
+            return
+        self._prewarm_task = asyncio.create_task(self._prewarm(delay))
+
+    async def _prewarm(self, delay: float):
+        """
+        预热拨号，失败时按指数退避重试.
+        """
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not self.prewarm_enabled or self.websocket:
+                return
+
+            started = time.monotonic()
+            if await self._dial(warm=True):
+                self._prewarm_failures = 0
+                elapsed_ms = (time.monotonic() - started) * 1000
+                logger.info(f"WebSocket预热连接就绪，耗时 {elapsed_ms:.0f}ms")
+                return
+
+            self._prewarm_failures += 1
+            retry_delay = min(2 ** self._prewarm_failures, 30)
+            logger.warning(f"WebSocket预热失败，{retry_delay}秒后重试")
+            self._prewarm_task = None
+            self.schedule_prewarm(retry_delay)
+        except asyncio.CancelledError:
+            logger.debug("预热任务被取消")
+
+    def _socket_open(self) -> bool:
+        try:
+            return self.websocket is not None and not self.websocket.closed
+        except Exception:
+            return False
 
     def _start_heartbeat(self):
         """
@@ -228,6 +360,13 @@ class WebsocketProtocol(Protocol):
         """
         处理连接丢失.
         """
+        if self._warm:
+            # 预热连接尚未被使用，上层不需要感知，重新预热即可
+            logger.info(f"预热连接已断开: {reason}，稍后重新预热")
+            await self._cleanup_connection()
+            self.schedule_prewarm(delay=1.0)
+            return
+
         logger.warning(f"连接丢失: {reason}")
 
         # 更新连接状态
@@ -345,6 +484,10 @@ class WebsocketProtocol(Protocol):
             "last_ping_time": self._last_ping_time,
             "last_pong_time": self._last_pong_time,
             "websocket_url": self.WEBSOCKET_URL,
+            "send_queue": self.get_send_queue_stats(),
+            "prewarm_enabled": self.prewarm_enabled,
+            "warm_connection_ready": self._warm,
+            "wake_to_first_byte": self.get_wake_latency_stats(),
         }
 
     async def _message_handler(self):
@@ -399,59 +542,153 @@ class WebsocketProtocol(Protocol):
             logger.error(f"消息处理循环异常: {e}", exc_info=True)
             await self._handle_connection_loss(f"消息处理异常: {str(e)}")
 
-    async def send_audio(self, data: bytes):
+    def _start_writer(self):
         """
-        发送音频数据.
+        启动发送协程.
         """
-        if not self.is_audio_channel_opened():
-            return
+        self._send_event = asyncio.Event()
+        self._control_queue.clear()
+        self._audio_queue.clear()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def _writer_loop(self):
+        """发送协程.
 
+        连接上所有出站消息都由这里按序发送，避免并发send交错。
+        每次先取控制消息，没有控制消息时才发送音频。
+        """
+        future = None
         try:
-            await self.websocket.send(data)
-        except websockets.ConnectionClosed as e:
-            logger.warning(f"发送音频时连接已关闭: {e}")
-            await self._handle_connection_loss(f"发送音频失败: {e.code} {e.reason}")
-        except websockets.ConnectionClosedError as e:
-            logger.warning(f"发送音频时连接错误: {e}")
-            await self._handle_connection_loss(f"发送音频错误: {e.code} {e.reason}")
-        except Exception as e:
-            logger.error(f"发送音频数据失败: {e}")
-            # 不要在这里调用网络错误回调，让连接处理器处理
-            await self._handle_connection_loss(f"发送音频异常: {str(e)}")
+            while True:
+                future = None
+                if self._control_queue:
+                    message, future, enqueued = self._control_queue.popleft()
+                    latency = self._control_send_latency
+                elif self._audio_queue:
+                    message, enqueued = self._audio_queue.popleft()
+                    latency = self._audio_send_latency
+                else:
+                    self._send_event.clear()
+                    await self._send_event.wait()
+                    continue
 
-    async def send_text(self, message: str):
+                websocket = self.websocket
+                if websocket is None:
+                    self._resolve_send(future, False)
+                    continue
+
+                try:
+                    await websocket.send(message)
+                except Exception as e:
+                    self._resolve_send(future, False)
+                    if isinstance(e, websockets.ConnectionClosed):
+                        logger.warning(f"发送消息时连接已关闭: {e}")
+                        reason = f"发送失败: {e.code} {e.reason}"
+                    else:
+                        logger.error(f"发送消息失败: {e}")
+                        reason = f"发送异常: {str(e)}"
+                    # 连接清理会取消本协程，放到独立任务中执行
+                    asyncio.create_task(self._handle_connection_loss(reason))
+                    return
+
+                latency.observe((time.monotonic() - enqueued) * 1000)
+                if latency is self._audio_send_latency:
+                    self._note_audio_sent()
+                self._resolve_send(future, True)
+        except asyncio.CancelledError:
+            # 正在发送的文本消息以失败结束
+            self._resolve_send(future, False)
+            logger.debug("发送协程被取消")
+            raise
+
+    @staticmethod
+    def _resolve_send(future, result: bool):
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def _enqueue_control(self, message, future=None) -> bool:
+        if not self.websocket or self._is_closing or self._send_event is None:
+            logger.warning("WebSocket未连接或正在关闭，无法发送消息")
+            return False
+
+        self._control_queue.append((message, future, time.monotonic()))
+        self._control_max_depth = max(
+            self._control_max_depth, len(self._control_queue)
+        )
+        self._send_event.set()
+        return True
+
+    async def send_audio(self, data: bytes):
+        """发送音频数据.
+
+        只放入有界的音频队列，积压超过上限时按丢弃策略丢帧。
         """
-        发送文本消息.
+        if not self.is_audio_channel_opened() or self._send_event is None:
+            return
+
+        if len(self._audio_queue) >= self._audio_queue_size:
+            self._audio_dropped += 1
+            if self._audio_drop_policy == "newest":
+                return
+            self._audio_queue.popleft()
+
+        self._audio_queue.append((data, time.monotonic()))
+        self._audio_max_depth = max(self._audio_max_depth, len(self._audio_queue))
+        self._send_event.set()
+
+    async def send_text(self, message: str):
+        """发送文本消息.
+
+        放入控制队列优先发送，并等待实际写出.
         """
-        if not self.websocket or self._is_closing:
-            logger.warning("WebSocket未连接或正在关闭，无法发送消息")
+        future = asyncio.get_running_loop().create_future()
+        if not self._enqueue_control(message, future):
             return
+        await future
 
-        try:
-            await self.websocket.send(message)
-        except websockets.ConnectionClosed as e:
-            logger.warning(f"发送文本时连接已关闭: {e}")
-            await self._handle_connection_loss(f"发送文本失败: {e.code} {e.reason}")
-        except websockets.ConnectionClosedError as e:
-            logger.warning(f"发送文本时连接错误: {e}")
-            await self._handle_connection_loss(f"发送文本错误: {e.code} {e.reason}")
-        except Exception as e:
-            logger.error(f"发送文本消息失败: {e}")
-            await self._handle_connection_loss(f"发送文本异常: {str(e)}")
+    def send_text_nowait(self, message) -> bool:
+        """
+        放入控制队列后立即返回，不等待写出.
+        """
+        return self._enqueue_control(message)
+
+    def _clear_send_queues(self):
+        """
+        清空发送队列，等待中的文本消息以失败结束.
+        """
+        for _, future, _ in self._control_queue:
+            self._resolve_send(future, False)
+        self._control_queue.clear()
+        self._audio_queue.clear()
+
+    def get_send_queue_stats(self) -> dict:
+        """
+        获取发送队列深度和发送延迟统计.
+        """
+        return {
+            "control_depth": len(self._control_queue),
+            "control_max_depth": self._control_max_depth,
+            "audio_depth": len(self._audio_queue),
+            "audio_max_depth": self._audio_max_depth,
+            "audio_queue_size": self._audio_queue_size,
+            "audio_dropped": self._audio_dropped,
+            "control_send_latency": self._control_send_latency.snapshot(),
+            "audio_send_latency": self._audio_send_latency.snapshot(),
+        }
 
     def is_audio_channel_opened(self) -> bool:
         """检查音频通道是否打开.
 
         更准确地检查连接状态，包括WebSocket的实际状态
         """
+        # 预热连接在被使用前不视为已打开
         if not self.websocket or not self.connected or self._is_closing:
             return False
+        if self._warm:
+            return False
 
         # 检查WebSocket的实际状态
-        try:
-            return not self.websocket.closed
-        except Exception:
-            return False
+        return self._socket_open()
 
     async def open_audio_channel(self) -> bool:
         """建立 WebSocket 连接.
@@ -479,8 +716,10 @@ class WebsocketProtocol(Protocol):
             # 设置 hello 接收事件
             self.hello_received.set()
 
-            # 通知音频通道已打开
-            if self._on_audio_channel_opened:
+            # 预热连接推迟到被使用时再通知
+            if self._dialing_warm:
+                self._warm = True
+            elif self._on_audio_channel_opened:
                 await self._on_audio_channel_opened()
 
             logger.info("成功处理服务器 hello 消息")
@@ -512,6 +751,21 @@ class WebsocketProtocol(Protocol):
             except asyncio.CancelledError:
                 pass
 
+        # 停止发送协程，丢弃未发送的消息
+        writer_task, self._writer_task = self._writer_task, None
+        self._send_event = None
+        if (
+            writer_task
+            and not writer_task.done()
+            and writer_task is not asyncio.current_task()
+        ):
+            writer_task.cancel()
+            try:
+                await writer_task
+            except asyncio.CancelledError:
+                pass
+        self._clear_send_queues()
+
         # 关闭WebSocket连接
         if self.websocket and not self.websocket.closed:
             try:
@@ -520,6 +774,7 @@ class WebsocketProtocol(Protocol):
                 logger.error(f"关闭WebSocket连接时出错: {e}")
 
         self.websocket = None
+        self._warm = False
         self._last_ping_time = None
         self._last_pong_time = None
 
@@ -539,3 +794,6 @@ class WebsocketProtocol(Protocol):
             logger.error(f"关闭音频通道失败: {e}")
         finally:
             self._is_closing = False
+
+        # 会话结束后立即在后台准备下一条连接
+        self.schedule_prewarm()
@@ -0,0 +1,390 @@
+"""运行时性能指标工具.
+
+提供线程安全的延迟直方图，用于统计网络往返、处理耗时等延迟分布；
+以及应用级的运行指标：事件循环延迟采样、按名称的任务计数、
+汇总各模块统计的注册表和周期日志/本机HTTP导出。
+"""
+
+import asyncio
+import bisect
+import functools
+import json
+import threading
+import time
+from typing import Callable, Optional, Sequence
+
+from src.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class LatencyHistogram:
+    """延迟直方图（毫秒）.
+
+    按固定分桶累计计数，分位数取所在分桶的上界，
+    开销只有一次二分查找，可以在实时路径中使用。
+    """
+
+    DEFAULT_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, bounds_ms: Optional[Sequence[float]] = None):
+        """初始化直方图.
+
+        Args:
+            bounds_ms: 递增的分桶上界（毫秒），超过最后一个上界的计入溢出桶
+        """
+        self.bounds_ms = tuple(bounds_ms or self.DEFAULT_BOUNDS_MS)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        清空统计.
+        """
+        with self._lock:
+            self._counts = [0] * (len(self.bounds_ms) + 1)
+            self._count = 0
+            self._total_ms = 0.0
+            self._max_ms = 0.0
+
+    def observe(self, value_ms: float):
+        """
+        记录一次延迟.
+        """
+        index = bisect.bisect_left(self.bounds_ms, value_ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._total_ms += value_ms
+            if value_ms > self._max_ms:
+                self._max_ms = value_ms
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def percentile(self, q: float) -> Optional[float]:
+        """获取分位数.
+
+        Args:
+            q: 0-100之间的百分位
+
+        Returns:
+            所在分桶的上界（毫秒），溢出桶返回最大值，没有数据时返回None
+        """
+        with self._lock:
+            return self._percentile_locked(q)
+
+    def _percentile_locked(self, q: float) -> Optional[float]:
+        if self._count == 0:
+            return None
+        rank = max(1, int(self._count * q / 100 + 0.5))
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= rank:
+                if index < len(self.bounds_ms):
+                    return min(self.bounds_ms[index], self._max_ms)
+                return self._max_ms
+        return self._max_ms
+
+    def snapshot(self) -> dict:
+        """
+        获取统计快照.
+        """
+        with self._lock:
+            buckets = {
+                f"<={bound:g}ms": count
+                for bound, count in zip(self.bounds_ms, self._counts)
+            }
+            buckets[f">{self.bounds_ms[-1]:g}ms"] = self._counts[-1]
+            return {
+                "count": self._count,
+                "avg_ms": (
+                    round(self._total_ms / self._count, 2) if self._count else None
+                ),
+                "max_ms": round(self._max_ms, 2) if self._count else None,
+                "p50_ms": self._percentile_locked(50),
+                "p90_ms": self._percentile_locked(90),
+                "p99_ms": self._percentile_locked(99),
+                "buckets": buckets,
+            }
+
+
+class TaskCounters:
+    """按名称统计后台任务的创建、完成、失败和取消次数.
+
+    只在事件循环线程中更新和读取。
+    """
+
+    def __init__(self):
+        # name -> [created, completed, failed, cancelled]
+        self._counts = {}
+
+    def track(self, task: asyncio.Task, name: str):
+        """
+        记录任务创建，任务结束时自动计数.
+        """
+        counts = self._counts.get(name)
+        if counts is None:
+            counts = self._counts[name] = [0, 0, 0, 0]
+        counts[0] += 1
+        task.add_done_callback(functools.partial(self._on_done, counts))
+
+    @staticmethod
+    def _on_done(counts: list, task: asyncio.Task):
+        if task.cancelled():
+            counts[3] += 1
+        elif task.exception() is not None:
+            counts[2] += 1
+        else:
+            counts[1] += 1
+
+    def in_flight(self) -> int:
+        return sum(c[0] - c[1] - c[2] - c[3] for c in self._counts.values())
+
+    def created(self) -> int:
+        return sum(c[0] for c in self._counts.values())
+
+    def snapshot(self) -> dict:
+        return {
+            name: {
+                "created": created,
+                "completed": completed,
+                "failed": failed,
+                "cancelled": cancelled,
+                "in_flight": created - completed - failed - cancelled,
+            }
+            for name, (created, completed, failed, cancelled) in sorted(
+                self._counts.items()
+            )
+        }
+
+
+class LoopLagMonitor:
+    """事件循环延迟采样器.
+
+    按固定间隔休眠，实际唤醒时间比预期晚多少即为这段时间内事件循环被
+    阻塞的程度。除累计直方图外还记录最近一个统计窗口内的最大值，
+    便于在周期日志中定位卡顿发生的时间段。
+    """
+
+    LAG_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    def __init__(self, interval_ms: int = 100, stall_threshold_ms: float = 200):
+        """
+        Args:
+            interval_ms: 采样间隔
+            stall_threshold_ms: 超过该延迟记为一次卡顿并输出警告
+        """
+        self.interval_ms = interval_ms
+        self.stall_threshold_ms = stall_threshold_ms
+        self.histogram = LatencyHistogram(self.LAG_BOUNDS_MS)
+        self.stalls = 0
+        self.window_max_ms = 0.0
+        self.window_stalls = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        interval = self.interval_ms / 1000
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.histogram.observe(lag_ms)
+            if lag_ms > self.window_max_ms:
+                self.window_max_ms = lag_ms
+            if lag_ms >= self.stall_threshold_ms:
+                self.stalls += 1
+                self.window_stalls += 1
+                logger.warning(f"事件循环卡顿 {lag_ms:.0f}ms")
+
+    def take_window(self) -> tuple:
+        """
+        取出并清空当前统计窗口（最大延迟，卡顿次数）.
+        """
+        window = (self.window_max_ms, self.window_stalls)
+        self.window_max_ms = 0.0
+        self.window_stalls = 0
+        return window
+
+    def snapshot(self) -> dict:
+        return {
+            "interval_ms": self.interval_ms,
+            "stalls": self.stalls,
+            "lag": self.histogram.snapshot(),
+        }
+
+
+class MetricsRegistry:
+    """应用运行指标的汇总入口.
+
+    各模块可以在这里创建命名直方图，或注册返回统计字典的数据源，
+    snapshot汇总为可JSON序列化的字典。
+    """
+
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.loop_lag = LoopLagMonitor()
+        self.tasks = TaskCounters()
+        self._histograms = {}
+        self._sources = {}
+
+    def histogram(
+        self, name: str, bounds_ms: Optional[Sequence[float]] = None
+    ) -> LatencyHistogram:
+        """
+        获取（不存在时创建）命名直方图.
+        """
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = LatencyHistogram(bounds_ms)
+        return histogram
+
+    def register_histogram(self, name: str, histogram: LatencyHistogram):
+        """
+        登记由其他模块持有的直方图.
+        """
+        self._histograms[name] = histogram
+
+    def register_source(self, name: str, source: Callable[[], dict]):
+        """
+        注册统计数据源，snapshot时调用.
+        """
+        self._sources[name] = source
+
+    def unregister_source(self, name: str):
+        self._sources.pop(name, None)
+
+    def snapshot(self) -> dict:
+        sources = {}
+        for name, source in list(self._sources.items()):
+            try:
+                sources[name] = source()
+            except Exception as e:
+                sources[name] = {"error": str(e)}
+        return {
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+            "loop": self.loop_lag.snapshot(),
+            "tasks": self.tasks.snapshot(),
+            "histograms": {
+                name: histogram.snapshot()
+                for name, histogram in sorted(self._histograms.items())
+            },
+            "sources": sources,
+        }
+
+    def summary_line(self) -> str:
+        """
+        生成一行摘要，用于周期日志.
+        """
+        lag_max, stalls = self.loop_lag.take_window()
+        parts = [
+            f"循环延迟 p99={_fmt_ms(self.loop_lag.histogram.percentile(99))} "
+            f"窗口最大={lag_max:.0f}ms 卡顿={stalls}",
+            f"任务 进行中={self.tasks.in_flight()} 累计={self.tasks.created()}",
+        ]
+        for name, histogram in sorted(self._histograms.items()):
+            if histogram.count:
+                parts.append(
+                    f"{name} p99={_fmt_ms(histogram.percentile(99))} "
+                    f"n={histogram.count}"
+                )
+        return " | ".join(parts)
+
+
+def _fmt_ms(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.2f}ms" if value < 1 else f"{value:.0f}ms"
+
+
+class MetricsExporter:
+    """运行指标导出.
+
+    运行事件循环延迟采样，按间隔输出摘要日志；配置了端口时在本机提供
+    HTTP JSON接口（GET任意路径返回完整快照）。
+    """
+
+    def __init__(
+        self,
+        registry: MetricsRegistry,
+        log_interval_s: float = 60,
+        http_host: str = "127.0.0.1",
+        http_port: int = 0,
+    ):
+        self.registry = registry
+        self.log_interval_s = log_interval_s
+        self.http_host = http_host
+        self.http_port = http_port
+        self._tasks = []
+        self._server = None
+
+    async def start(self):
+        self._tasks.append(
+            asyncio.create_task(self.registry.loop_lag.run(), name="指标-循环延迟")
+        )
+        if self.log_interval_s and self.log_interval_s > 0:
+            self._tasks.append(
+                asyncio.create_task(self._log_loop(), name="指标-周期日志")
+            )
+        if self.http_port:
+            try:
+                self._server = await asyncio.start_server(
+                    self._handle_http, self.http_host, self.http_port
+                )
+                logger.info(
+                    f"运行指标接口: http://{self.http_host}:{self.http_port}/metrics"
+                )
+            except OSError as e:
+                logger.warning(f"运行指标接口启动失败: {e}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _log_loop(self):
+        while True:
+            await asyncio.sleep(self.log_interval_s)
+            try:
+                logger.info(f"运行指标: {self.registry.summary_line()}")
+            except Exception as e:
+                logger.warning(f"生成运行指标摘要失败: {e}")
+
+    async def _handle_http(self, reader, writer):
+        try:
+            # 只需读完请求头，不区分路径
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if not line or line in (b"\r\n", b"\n"):
+                    break
+            body = json.dumps(
+                self.registry.snapshot(), ensure_ascii=False, default=str
+            ).encode("utf-8")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/json; charset=utf-8\r\n"
+                + f"Content-Length: {len(body)}\r\n".encode()
+                + b"Connection: close\r\n\r\n"
+                + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug(f"运行指标请求处理失败: {e}")
+        finally:
+            writer.close()